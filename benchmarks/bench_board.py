@@ -0,0 +1,239 @@
+#!/usr/local/bin/python3
+
+''' Micro-benchmarks for the Board engines and serialization.
+
+    Run from the repository root:
+        python -m benchmarks.bench_board                      # print results
+        python -m benchmarks.bench_board --save baseline.json  # record a baseline
+        python -m benchmarks.bench_board --scale 0.1 --compare benchmarks/baseline.json
+
+    benchmarks/baseline.json was recorded with --scale 0.1 --repeats 3.
+    --compare exits with status 1 if any benchmark got slower than the
+    baseline by more than --threshold, so it can gate CI. Baselines are only
+    comparable when recorded on the same machine.
+'''
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+from lib import board as board_module
+from lib import codec
+from lib.board import Board, ENGINES
+from benchmarks.workloads import Workload, workloads
+
+FORMAT_VERSION = 1
+# every sample repeats what it times until it has taken at least this long,
+# as timeit's autorange does, so calls of a few microseconds aren't lost in
+# timer resolution and scheduling noise
+MIN_SAMPLE_SECONDS = 0.1
+
+
+class _SteppingBoard(Board):
+    ''' A board that never detects cycles, so periodic workloads are stepped
+        generation by generation instead of skipped ahead.
+    '''
+    def _record_cycle(self, family: str, key, x: int, y: int) -> bool:
+        return False
+
+
+def _run_once(workload: Workload, engine: str) -> tuple[float, Board]:
+    ''' Time a single run of a workload from a cold start. The board's
+        generation is the number of generations actually stepped, which is
+        fewer than requested if it finished early.
+    '''
+    # the hashlife memo is shared between boards, so clear it or every
+    # repeat after the first would only measure cache lookups
+    board_module._hashlife.clear()
+    board = _SteppingBoard(workload.coordinates, max_iterations=workload.generations, engine=engine)
+    start = time.perf_counter()
+    # not run_iterations(), which counts a finished board as reaching the target
+    board._run(workload.generations, stop_on_cycle=False)
+    return time.perf_counter() - start, board
+
+
+def _sample(workload: Workload, engine: str) -> tuple[float, Board]:
+    ''' Time cold-start runs of a workload until they add up to at least
+        MIN_SAMPLE_SECONDS. Returns the mean time per run and the last board.
+    '''
+    elapsed = 0.0
+    runs = 0
+    while elapsed < MIN_SAMPLE_SECONDS:
+        seconds, board = _run_once(workload, engine)
+        elapsed += seconds
+        runs += 1
+    return elapsed / runs, board
+
+
+def _peak_memory(workload: Workload, engine: str) -> int:
+    ''' Peak bytes allocated by a single run of a workload. '''
+    tracemalloc.start()
+    try:
+        _run_once(workload, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_engine(workload: Workload, engine: str, repeats: int) -> dict:
+    ''' Benchmark running a workload with one engine.
+        Rates are per generation actually stepped, since a workload may
+        finish early. cells_per_sec counts cell updates, estimated as the
+        number of generations times the mean of the starting and final
+        population. seconds and median_seconds are the best and median
+        per-run time over repeats samples (see _sample).
+    '''
+    times = []
+    for _ in range(repeats):
+        elapsed, board = _sample(workload, engine)
+        times.append(elapsed)
+
+    best = max(min(times), 1e-9)
+    stepped = board.generation
+    population = len(board.to_dict()["coordinates"])
+    mean_population = (len(workload.coordinates) + population) / 2
+    return {
+        "workload": workload.name,
+        "engine": engine,
+        "generations": workload.generations,
+        "stepped_generations": stepped,
+        "seconds": best,
+        "median_seconds": statistics.median(times),
+        "generations_per_sec": stepped / best,
+        "cells_per_sec": stepped * mean_population / best,
+        "final_population": population,
+        "peak_memory_bytes": _peak_memory(workload, engine),
+    }
+
+
+def _time(fn, repeats: int) -> float:
+    ''' Best time per call of fn over repeats samples of MIN_SAMPLE_SECONDS. '''
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < MIN_SAMPLE_SECONDS:
+        number *= 2
+    return min(timer.repeat(repeats, number)) / number
+
+
+def bench_serialization(workload: Workload, repeats: int) -> dict:
+    ''' Benchmark serializing a workload's starting board in the legacy JSON
+        format and the binary storage format.
+    '''
+    board = Board(workload.coordinates)
+    text = board.to_string()
+    data = board.to_bytes()
+    return {
+        "workload": workload.name,
+        "cells": len(workload.coordinates),
+        "json_bytes": len(text.encode()),
+        "json_encode_seconds": _time(board.to_string, repeats),
+        "json_decode_seconds": _time(lambda: codec.decode(text), repeats),
+        "binary_bytes": len(data),
+        "binary_encode_seconds": _time(board.to_bytes, repeats),
+        "binary_decode_seconds": _time(lambda: codec.decode(data), repeats),
+    }
+
+
+def run(selected: list[Workload], engines: list[str], repeats: int, scale: float = 1.0) -> dict:
+    ''' Run every benchmark, returning the machine-readable results. '''
+    results = {
+        "format_version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": scale,
+        "repeats": repeats,
+        "engines": [],
+        "serialization": [],
+    }
+    for workload in selected:
+        for engine in engines:
+            result = bench_engine(workload, engine, repeats)
+            results["engines"].append(result)
+            print(f"{workload.name:<24} {engine:<12} {result['generations_per_sec']:>12.1f} gen/s "
+                  f"{result['cells_per_sec']:>14.0f} cells/s {result['peak_memory_bytes'] / 1024:>10.0f} KiB",
+                  file=sys.stderr)
+        result = bench_serialization(workload, repeats)
+        results["serialization"].append(result)
+        print(f"{workload.name:<24} {'serialize':<12} json {result['json_bytes']:>9} B "
+              f"{result['json_encode_seconds'] * 1e3:>8.3f} ms, binary {result['binary_bytes']:>9} B "
+              f"{result['binary_encode_seconds'] * 1e3:>8.3f} ms", file=sys.stderr)
+    return results
+
+
+# (section, identifying fields, metric, True if larger is better)
+_METRICS = (
+    ("engines", ("workload", "engine"), "generations_per_sec", True),
+    ("engines", ("workload", "engine"), "peak_memory_bytes", False),
+    ("serialization", ("workload",), "json_encode_seconds", False),
+    ("serialization", ("workload",), "binary_encode_seconds", False),
+    ("serialization", ("workload",), "binary_decode_seconds", False),
+    ("serialization", ("workload",), "binary_bytes", False),
+)
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    ''' Return a description of every metric in current that is worse than
+        in baseline by more than threshold (a fraction, e.g. 0.2 for 20%).
+        Benchmarks missing from either side are ignored.
+    '''
+    if baseline.get("scale") != current.get("scale"):
+        raise ValueError(f"Baseline was recorded with --scale {baseline.get('scale')}, not {current.get('scale')}")
+
+    regressions = []
+    for section, fields, metric, higher_is_better in _METRICS:
+        previous = {tuple(entry[f] for f in fields): entry for entry in baseline.get(section, [])}
+        for entry in current.get(section, []):
+            name = tuple(entry[f] for f in fields)
+            before = previous.get(name, {}).get(metric)
+            after = entry.get(metric)
+            if not before or after is None:
+                continue
+            change = (before - after) / before if higher_is_better else (after - before) / before
+            if change > threshold:
+                regressions.append(f"{'/'.join(name)} {metric}: {before:.6g} -> {after:.6g} ({change:.0%} worse)")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Board engines and serialization.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--workloads", nargs="+", metavar="NAME",
+                        help="only run workloads whose name starts with one of these")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every workload's generation count, e.g. 0.1 for a quick run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fraction a metric may worsen before it counts as a regression")
+    args = parser.parse_args(argv)
+
+    selected = workloads(args.scale)
+    if args.workloads:
+        selected = [w for w in selected if w.name.startswith(tuple(args.workloads))]
+
+    results = run(selected, args.engines, args.repeats, args.scale)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions")
+    elif not args.save:
+        json.dump(results, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+#!/usr/local/bin/python3
+
+''' In-memory stand-in for the async valkey client, for running the app
+    offline (e.g. under the load test) without a valkey server.
+
+    Only the commands the app uses are implemented. The Lua scripts in
+    lib.storage are recognized and executed in Python with the same
+    semantics. Values come back as bytes, like a real client without
+    decode_responses. Every command yields to the event loop once, standing
+    in for a network round trip.
+'''
+
+import asyncio
+import itertools
+import time
+from lib import storage
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return str(value).encode()
+
+
+class FakeValkey:
+    def __init__(self, latency: float = 0):
+        ''' latency adds a delay in seconds to every round trip. '''
+        self._latency = latency
+        self._values = {}
+        self._sorted_sets = {}
+        self._hashes = {}
+        # stream key to a list of (id, fields), and (stream, group) to
+        # the group's read position and pending entries
+        self._streams = {}
+        self._groups = {}
+        self._stream_ids = itertools.count(1)
+        # seconds each key was last set to expire in; keys never actually expire here
+        self.ttls = {}
+        self.commands = 0
+
+    async def _round_trip(self):
+        self.commands += 1
+        await asyncio.sleep(self._latency)
+
+    async def get(self, key):
+        await self._round_trip()
+        return self._get(key)
+
+    async def set(self, key, value, ex=None):
+        await self._round_trip()
+        return self._set(key, value, ex)
+
+    async def mget(self, *keys):
+        await self._round_trip()
+        return self._mget(*keys)
+
+    async def mset(self, mapping):
+        await self._round_trip()
+        return self._mset(mapping)
+
+    async def eval(self, script, numkeys, *args):
+        await self._round_trip()
+        return self._eval(script, numkeys, *args)
+
+    async def zrevrangebyscore(self, key, max, min, start=None, num=None):
+        await self._round_trip()
+        return self._zrevrangebyscore(key, max, min, start, num)
+
+    async def exists(self, *keys):
+        await self._round_trip()
+        return self._exists(*keys)
+
+    async def expire(self, key, seconds):
+        await self._round_trip()
+        return self._expire(key, seconds)
+
+    async def hset(self, key, mapping):
+        await self._round_trip()
+        return self._hset(key, mapping)
+
+    async def hgetall(self, key):
+        await self._round_trip()
+        return self._hgetall(key)
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        await self._round_trip()
+        return self._xadd(key, fields, maxlen, approximate)
+
+    async def xgroup_create(self, key, group, id="$", mkstream=False):
+        await self._round_trip()
+        return self._xgroup_create(key, group, id, mkstream)
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        await self._round_trip()
+        replies = self._xreadgroup(group, consumer, streams, count)
+        if not replies and block:
+            # nothing new, so wait a little rather than the whole block
+            await asyncio.sleep(min(block / 1000, 0.01))
+        return replies
+
+    async def xautoclaim(self, key, group, consumer, min_idle_time, start_id="0-0", count=None):
+        await self._round_trip()
+        return self._xautoclaim(key, group, consumer, min_idle_time, start_id, count)
+
+    async def xclaim(self, key, group, consumer, min_idle_time, message_ids, justid=False):
+        await self._round_trip()
+        return self._xclaim(key, group, consumer, min_idle_time, message_ids, justid)
+
+    async def xack(self, key, group, *message_ids):
+        await self._round_trip()
+        return self._xack(key, group, *message_ids)
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+    def _get(self, key):
+        return self._values.get(_to_bytes(key))
+
+    def _set(self, key, value, ex=None) -> bool:
+        # like valkey, setting a value clears its TTL
+        self.ttls.pop(_to_bytes(key), None)
+        self._values[_to_bytes(key)] = _to_bytes(value)
+        if ex:
+            self.ttls[_to_bytes(key)] = int(ex)
+        return True
+
+    def _mget(self, *keys) -> list:
+        return [self._get(key) for key in keys]
+
+    def _mset(self, mapping) -> bool:
+        for key, value in mapping.items():
+            self._set(key, value)
+        return True
+
+    def _exists(self, *keys) -> int:
+        return sum(_to_bytes(key) in self._values or _to_bytes(key) in self._hashes for key in keys)
+
+    def _expire(self, key, seconds) -> bool:
+        key = _to_bytes(key)
+        if key not in self._values and key not in self._hashes and key not in self._sorted_sets:
+            return False
+        self.ttls[key] = int(seconds)
+        return True
+
+    def _hset(self, key, mapping) -> int:
+        fields = self._hashes.setdefault(_to_bytes(key), {})
+        added = sum(_to_bytes(name) not in fields for name in mapping)
+        fields.update((_to_bytes(name), _to_bytes(value)) for name, value in mapping.items())
+        return added
+
+    def _hgetall(self, key) -> dict:
+        return dict(self._hashes.get(_to_bytes(key), {}))
+
+    def _xadd(self, key, fields, maxlen=None, approximate=True) -> bytes:
+        entries = self._streams.setdefault(_to_bytes(key), [])
+        message_id = f"{next(self._stream_ids)}-0".encode()
+        entries.append((message_id, {_to_bytes(name): _to_bytes(value) for name, value in fields.items()}))
+        if maxlen is not None and len(entries) > maxlen:
+            del entries[:len(entries) - maxlen]
+        return message_id
+
+    def _xgroup_create(self, key, group, id="$", mkstream=False) -> bool:
+        key = _to_bytes(key)
+        if key not in self._streams:
+            if not mkstream:
+                raise ValueError("ERR The XGROUP subcommand requires the key to exist")
+            self._streams[key] = []
+        if (key, _to_bytes(group)) in self._groups:
+            raise ValueError("BUSYGROUP Consumer Group name already exists")
+        # entries are only read by position here, so "0" or "$" is all that matters
+        read = 0 if id == "0" else len(self._streams[key])
+        self._groups[(key, _to_bytes(group))] = {"read": read, "pending": {}}
+        return True
+
+    def _group(self, key, group) -> dict:
+        try:
+            return self._groups[(_to_bytes(key), _to_bytes(group))]
+        except KeyError:
+            raise ValueError("NOGROUP No such key or consumer group") from None
+
+    def _xreadgroup(self, group, consumer, streams, count=None) -> list:
+        replies = []
+        for key, position in streams.items():
+            if position != ">":
+                raise ValueError("Only reading new entries is supported")
+            state = self._group(key, group)
+            entries = self._streams[_to_bytes(key)]
+            # an entry's id is its sequence number, so find where reading stopped
+            new = [entry for entry in entries if int(entry[0].split(b"-")[0]) > state["read"]]
+            new = new[:count] if count else new
+            if not new:
+                continue
+            state["read"] = int(new[-1][0].split(b"-")[0])
+            for message_id, _ in new:
+                state["pending"][message_id] = (_to_bytes(consumer), time.monotonic())
+            replies.append([_to_bytes(key), new])
+        return replies
+
+    def _xautoclaim(self, key, group, consumer, min_idle_time, start_id="0-0", count=None) -> list:
+        state = self._group(key, group)
+        entries = dict(self._streams[_to_bytes(key)])
+        now = time.monotonic()
+        claimed = []
+        deleted = []
+        for message_id, (_, since) in sorted(state["pending"].items(), key=lambda item: int(item[0].split(b"-")[0])):
+            if count and len(claimed) + len(deleted) >= count:
+                break
+            if (now - since) * 1000 < min_idle_time:
+                continue
+            if message_id not in entries:
+                # like valkey, trimmed entries are dropped from the pending list
+                del state["pending"][message_id]
+                deleted.append(message_id)
+                continue
+            state["pending"][message_id] = (_to_bytes(consumer), now)
+            claimed.append((message_id, entries[message_id]))
+        return [b"0-0", claimed, deleted]
+
+    def _xclaim(self, key, group, consumer, min_idle_time, message_ids, justid=False) -> list:
+        ''' Only the justid form, returning the ids of the claimed entries. '''
+        state = self._group(key, group)
+        now = time.monotonic()
+        claimed = []
+        for message_id in map(_to_bytes, message_ids):
+            if message_id in state["pending"] and (now - state["pending"][message_id][1]) * 1000 >= min_idle_time:
+                state["pending"][message_id] = (_to_bytes(consumer), now)
+                claimed.append(message_id)
+        return claimed
+
+    def _xack(self, key, group, *message_ids) -> int:
+        pending = self._group(key, group)["pending"]
+        return sum(pending.pop(_to_bytes(message_id), None) is not None for message_id in message_ids)
+
+    def _zrevrangebyscore(self, key, max, min, start=None, num=None) -> list[bytes]:
+        scores = self._sorted_sets.get(_to_bytes(key), {})
+        high = float(max)
+        low = float(min)
+        members = sorted((member for member, score in scores.items() if low <= score <= high),
+                         key=lambda member: (scores[member], member), reverse=True)
+        if start is not None:
+            members = members[start:start + num if num is not None and num >= 0 else None]
+        return members
+
+    def _eval(self, script, numkeys, *args):
+        keys = [_to_bytes(key) for key in args[:numkeys]]
+        argv = args[numkeys:]
+        if script == storage._COMPARE_AND_SET:
+            board_key, version_key = keys
+            current = self._values.get(version_key, b"0")
+            if current != _to_bytes(argv[0]):
+                return 0
+            self._set(board_key, argv[1], int(argv[2]))
+            self._set(version_key, int(current) + 1, int(argv[2]))
+            return 1
+        if script == storage._COMPARE_AND_SET_TILES:
+            board_key, version_key, tiles_key = keys
+            current = self._values.get(version_key, b"0")
+            if current != _to_bytes(argv[0]):
+                return 0
+            ttl = int(argv[2])
+            self._set(board_key, argv[1], ttl)
+            self._set(version_key, int(current) + 1, ttl)
+            if argv[3] == "1":
+                self._hashes.pop(tiles_key, None)
+            tiles = self._hashes.setdefault(tiles_key, {})
+            first = 5 + int(argv[4])
+            for name in argv[5:first]:
+                tiles.pop(_to_bytes(name), None)
+            for i in range(first, len(argv), 2):
+                tiles[_to_bytes(argv[i])] = _to_bytes(argv[i + 1])
+            if not tiles:
+                # like valkey, a hash with no fields doesn't exist
+                del self._hashes[tiles_key]
+            elif ttl:
+                self._expire(tiles_key, ttl)
+            return 1
+        if script == storage._LOAD_TILED:
+            board_key, version_key, tiles_key = keys
+            fields = []
+            for name, value in self._hashes.get(tiles_key, {}).items():
+                fields.extend((name, value))
+            return [self._values.get(board_key), self._values.get(version_key), fields]
+        if script == storage._LOAD_REGION:
+            board_key, tiles_key = keys
+            tiles = self._hashes.get(tiles_key, {})
+            return [self._values.get(board_key)] + [tiles.get(_to_bytes(name)) for name in argv]
+        if script == storage._SAVE_CHECKPOINTS:
+            index = self._sorted_sets.setdefault(keys[0], {})
+            retention, ttl = int(argv[0]), int(argv[1])
+            for i in range(2, len(argv), 3):
+                member = _to_bytes(argv[i + 1])
+                self._set(member, argv[i + 2], ttl)
+                index[member] = float(argv[i])
+            if ttl:
+                self._expire(keys[0], ttl)
+            excess = len(index) - retention - 1
+            if excess <= 0:
+                return 0
+            # same as ZRANGE 1..excess: keep the lowest scored checkpoint
+            evicted = sorted(index, key=lambda member: (index[member], member))[1:excess + 1]
+            for member in evicted:
+                self._values.pop(member, None)
+                self.ttls.pop(member, None)
+                del index[member]
+            return excess
+        if script == storage._TOUCH:
+            for key in keys + list(self._sorted_sets.get(keys[3], {})):
+                self._expire(key, argv[0])
+            return 1
+        raise ValueError("Unsupported script")
+
+
+class FakePipeline:
+    ''' Queues commands and runs them in one round trip on execute(). '''
+    def __init__(self, client: FakeValkey):
+        self._client = client
+        self._queued = []
+
+    def __getattr__(self, name):
+        command = getattr(self._client, f"_{name}")
+
+        def queue(*args, **kwargs):
+            self._queued.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        await self._client._round_trip()
+        queued, self._queued = self._queued, []
+        return [command(*args, **kwargs) for command, args, kwargs in queued]
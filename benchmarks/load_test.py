@@ -0,0 +1,192 @@
+#!/usr/local/bin/python3
+
+''' Concurrent load generator for the API.
+
+    Run from the repository root:
+        python -m benchmarks.load_test                       # in-process, fake valkey
+        python -m benchmarks.load_test --url http://localhost:8000
+
+    In-process mode drives main.app directly through httpx's ASGI transport,
+    with valkey replaced by benchmarks.fake_valkey, so it works offline and
+    measures the app alone. Simulations then share the event loop with the
+    load generator, like a single-worker server with BOARD_EXECUTOR=inline.
+    With --url, requests go to a running server and its real valkey.
+
+    Each of --concurrency clients repeatedly picks an endpoint according to
+    --mix and a random board from those created so far, for --duration
+    seconds or --requests requests in total. Per-endpoint RPS and latency
+    percentiles are printed at the end.
+'''
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import httpx
+from benchmarks.workloads import soup
+
+ENDPOINTS = ("create", "next", "iterate", "final")
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    ''' Parse "create=1,next=4" into endpoint weights. Missing endpoints get weight 0. '''
+    mix = dict.fromkeys(ENDPOINTS, 0.0)
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"Unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("Mix must give at least one endpoint a positive weight")
+    return mix
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ''' Nearest-rank percentile of values, which must be sorted. '''
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, mix: dict[str, float], board_size: int, density: float,
+                 iterations: int, final_iterations: int, seed: int = 0):
+        self._client = client
+        self._names = list(mix)
+        self._weights = list(mix.values())
+        self._board_size = board_size
+        self._density = density
+        self._iterations = iterations
+        self._final_iterations = final_iterations
+        self._rng = random.Random(seed)
+        self.board_ids = []
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = dict.fromkeys(ENDPOINTS, 0)
+
+    def _coordinates(self) -> list[tuple[int, int]]:
+        return soup(self._board_size, self._density, seed=self._rng.randrange(1 << 30))
+
+    async def request(self, name: str):
+        ''' Send one request to an endpoint and record its latency. '''
+        if name == "create" or not self.board_ids:
+            name = "create"
+            send = self._client.post("/boards/", json={"coordinates": self._coordinates()})
+        else:
+            board_id = self._rng.choice(self.board_ids)
+            path = {
+                "next": f"/boards/{board_id}/next",
+                "iterate": f"/boards/{board_id}/iterate/{self._iterations}",
+                "final": f"/boards/{board_id}/final/{self._final_iterations}",
+            }[name]
+            send = self._client.get(path)
+
+        start = time.perf_counter()
+        try:
+            response = await send
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return
+        elapsed = time.perf_counter() - start
+
+        # a board that doesn't settle within final_iterations is a valid
+        # outcome of the final endpoint, not a failure of the server
+        if response.status_code >= 500 or (response.status_code >= 400 and name != "final"):
+            self.errors[name] += 1
+            return
+        self.latencies[name].append(elapsed)
+        if name == "create":
+            self.board_ids.append(response.json()["board_id"])
+
+    async def worker(self, deadline: float, budget: list[float]):
+        while time.perf_counter() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            await self.request(self._rng.choices(self._names, self._weights)[0])
+
+    async def run(self, concurrency: int, duration: float, requests: int | None, boards: int) -> float:
+        ''' Create the initial boards, then run the load. Returns the elapsed seconds. '''
+        await asyncio.gather(*(self.request("create") for _ in range(boards)))
+        self.latencies["create"].clear()
+        self.errors["create"] = 0
+
+        budget = [requests if requests is not None else float("inf")]
+        start = time.perf_counter()
+        await asyncio.gather(*(self.worker(start + duration, budget) for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        ''' Summarize RPS and latency percentiles (in milliseconds) per endpoint. '''
+        summary = {}
+        everything = []
+        for name in ENDPOINTS:
+            latencies = sorted(self.latencies[name])
+            everything.extend(latencies)
+            if latencies or self.errors[name]:
+                summary[name] = _summarize(latencies, self.errors[name], elapsed)
+        summary["total"] = _summarize(sorted(everything), sum(self.errors.values()), elapsed)
+        return summary
+
+
+def _summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+def _client(url: str | None) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+
+    import main
+    from benchmarks.fake_valkey import FakeValkey
+    main.v = FakeValkey()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test", timeout=60)
+
+
+async def run(args) -> dict:
+    async with _client(args.url) as client:
+        load_test = LoadTest(client, parse_mix(args.mix), args.board_size, args.density,
+                             args.iterations, args.final_iterations, args.seed)
+        elapsed = await load_test.run(args.concurrency, args.duration, args.requests, args.boards)
+    return load_test.report(elapsed)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the Game of Life API.")
+    parser.add_argument("--url", help="base url of a running server; omit to run in-process with a fake valkey")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run for")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--mix", default="create=1,next=4,iterate=4,final=1",
+                        help="relative endpoint weights, e.g. next=3,iterate=1")
+    parser.add_argument("--boards", type=int, default=32, help="boards created before the load starts")
+    parser.add_argument("--board-size", type=int, default=16, help="side of the random soup each board starts as")
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--iterations", type=int, default=10, help="num_iters for the iterate endpoint")
+    parser.add_argument("--final-iterations", type=int, default=100, help="max_iterations for the final endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return 0
+
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report.items():
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
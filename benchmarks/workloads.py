@@ -0,0 +1,82 @@
+#!/usr/local/bin/python3
+
+''' Canonical workloads for the benchmark suite.
+
+    Each workload is a named starting pattern and the number of generations
+    to run it for. Random soups are seeded so every run sees the same cells.
+'''
+
+import random
+from typing import NamedTuple
+
+
+class Workload(NamedTuple):
+    name: str
+    coordinates: list[tuple[int, int]]
+    generations: int
+
+
+def parse(rows: list[str]) -> list[tuple[int, int]]:
+    ''' Convert a picture of a pattern ("O" alive, anything else dead)
+        to (row, col) coordinates.
+    '''
+    return [(x, y) for x, row in enumerate(rows) for y, cell in enumerate(row) if cell == "O"]
+
+
+def soup(size: int, density: float, seed: int = 0) -> list[tuple[int, int]]:
+    ''' A size x size square of random cells, each alive with the given probability. '''
+    rng = random.Random(seed)
+    return [(x, y) for x in range(size) for y in range(size) if rng.random() < density]
+
+
+# the patterns exercised by tests/functional_test.py
+FUNCTIONAL = {
+    "glider": [(1, 2), (2, 3), (3, 1), (3, 2), (3, 3)],
+    "block": [(0, 0), (0, 1), (1, 0), (1, 1)],
+    "blinker": [(0, 0), (1, 0), (2, 0)],
+    "toad": [(1, 1), (1, 2), (1, 3), (2, 0), (2, 1), (2, 2)],
+    "beacon": [(0, 0), (0, 1), (1, 0), (1, 1), (2, 2), (2, 3), (3, 2), (3, 3)],
+    "large_sparse": [(0, 0), (100, 100), (200, 200), (300, 300), (400, 400)],
+    "dense_10x10": [(i, j) for i in range(10) for j in range(10)],
+}
+# functional patterns that are finished within a generation, so running them
+# would only time creating the board
+SETTLED = ("block", "large_sparse")
+
+# small patterns that take thousands of generations to settle
+METHUSELAHS = {
+    "r_pentomino": parse([".OO", "OO.", ".O."]),
+    "acorn": parse([".O.....", "...O...", "OO..OOO"]),
+    "diehard": parse(["......O.", "OO......", ".O...OOO"]),
+}
+
+GOSPER_GLIDER_GUN = parse([
+    "........................O...........",
+    "......................O.O...........",
+    "............OO......OO............OO",
+    "...........O...O....OO............OO",
+    "OO........O.....O...OO..............",
+    "OO........O...O.OO....O.O...........",
+    "..........O.....O.......O...........",
+    "...........O...O....................",
+    "............OO......................",
+])
+
+SOUP_SIZES = (32, 64, 128)
+SOUP_DENSITIES = (0.1, 0.3, 0.5)
+
+
+def workloads(scale: float = 1.0) -> list[Workload]:
+    ''' Return every canonical workload. scale multiplies the generation
+        counts, e.g. 0.1 for a quick smoke run.
+    '''
+    def generations(count: int) -> int:
+        return max(1, int(count * scale))
+
+    result = [Workload(name, coords, generations(1000)) for name, coords in FUNCTIONAL.items() if name not in SETTLED]
+    result += [Workload(name, coords, generations(5000)) for name, coords in METHUSELAHS.items()]
+    result.append(Workload("gosper_glider_gun", GOSPER_GLIDER_GUN, generations(1000)))
+    for size in SOUP_SIZES:
+        for density in SOUP_DENSITIES:
+            result.append(Workload(f"soup_{size}_{density}", soup(size, density, seed=size), generations(200)))
+    return result
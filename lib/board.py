@@ -1,13 +1,76 @@
 #!/usr/local/bin/python3
 
 import json
+import numpy as np
+from lib import codec, cycles, dense, metrics, parallel
+from lib.hashlife import HashLife
+
+# "sparse" steps one generation at a time over a set of live cells.
+# "dense" steps a numpy array covering the bounding box, which is much
+# faster once a meaningful fraction of the box is alive.
+# "incremental" only re-evaluates cells next to last generation's changes,
+# so settled debris costs nothing and work scales with activity.
+# "parallel" is dense split across several worker processes, one stripe
+# of rows each, for boards too large for one core.
+# "auto" picks between sparse, incremental, dense and parallel based on the board.
+# "hashlife" jumps straight to the requested generation using a shared
+# memoized quadtree, which is far cheaper for large iteration counts.
+ENGINES = ("auto", "sparse", "incremental", "dense", "parallel", "hashlife")
+
+# thresholds for auto engine selection; below these the numpy overhead
+# outweighs the savings, above DENSE_MAX_AREA the array gets too large
+DENSE_MIN_POPULATION = 64
+DENSE_MIN_DENSITY = 0.02
+DENSE_MAX_AREA = 1 << 24
+# auto only uses the parallel engine on boxes this large, where a
+# generation takes long enough to be worth starting processes for
+PARALLEL_MIN_AREA = 1 << 22
+# auto re-checks its choice this often, since patterns spread and settle
+AUTO_RESELECT_INTERVAL = 100
+# number of generations remembered for cycle detection, i.e. the longest
+# oscillator or spaceship period that will be recognized
+CYCLE_HISTORY = 64
+# hashlife jumps over the generations cycles are detected in, so runs that
+# stop on a cycle step this many generations at the start and the end of
+# the run with the auto engine, and only jump over the middle
+HASHLIFE_CYCLE_PROBE = 2 * CYCLE_HISTORY
+# largest coordinate accepted from clients. cells are stored and stepped as
+# int64, so this leaves room for patterns to grow for a very long time
+MAX_COORDINATE = 1 << 62
+
+# shared between boards so identical structure is only ever computed once
+_hashlife = HashLife()
+
+_ENGINE_SECONDS = metrics.histogram(
+    "gol_engine_duration_seconds", "Time spent stepping boards, by engine", ("engine",))
+_ENGINE_GENERATIONS = metrics.counter(
+    "gol_engine_generations_total", "Generations stepped, by engine (excluding skipped cycles)", ("engine",))
 
 class Board:
-    def __init__(self, coordinates: set[tuple[int,int]]|list[tuple[int,int]], max_iterations: int = 1000, is_finished=False):
+    def __init__(self, coordinates: set[tuple[int,int]]|list[tuple[int,int]], max_iterations: int = 1000, is_finished=False, engine: str = "auto",
+                 period: int|None = None, displacement: tuple[int,int]|list[int]|None = None, generation: int = 0,
+                 workers: int = 1):
         ''' Initialize the board with a list of live cell coordinates.
             Coordinates should be a list of (row, col) tuples.
+            period and displacement describe a previously detected cycle:
+            every `period` generations the board repeats, shifted by `displacement`.
+            generation is the number of iterations since the board was created.
+            workers is the number of processes the parallel engine uses; auto
+            only considers it if there is more than one.
         '''     
         self.is_finished = is_finished
+        self.generation = generation
+        # (generation, to_bytes()) snapshots taken by run_iterations
+        self.checkpoints = []
+        self.period = period
+        self.displacement = tuple(displacement) if displacement is not None else (0, 0) if period else None
+
+        if engine not in ENGINES:
+            raise ValueError(f"Engine must be one of {', '.join(ENGINES)}")
+        self._engine = engine
+        if workers < 1:
+            raise ValueError("Workers must be at least 1")
+        self._workers = workers
 
         if not isinstance(coordinates, set) and not isinstance(coordinates, list):
             raise ValueError("Coordinates must be a set or list of (row, col) tuples")
@@ -19,9 +82,35 @@ class Board:
             self._coords.add((x, y))
 
         self._max_iterations = max_iterations
+        # cells born or died in the last generation, used by the incremental
+        # engine. None means unknown, so the next step evaluates every cell.
+        self._changed = None
+        # running [hash, sum x, sum y] of the live cells, kept up to date by
+        # the incremental engine for cycle detection. None means stale.
+        self._signature = None
+        self._cycles = cycles.CycleDetector(CYCLE_HISTORY)
+        # (key, x, y) of a cycle matched by hash but not yet confirmed
+        self._cycle_candidate = None
         if not self._coords:
             self.is_finished = True
 
+    @classmethod
+    def from_cells(cls, cells: set[tuple[int, int]], **kwargs) -> "Board":
+        ''' Create a board that takes ownership of an existing set of
+            (row, col) tuples, skipping the per-cell copy in __init__.
+            The set must not be modified by the caller afterwards.
+        '''
+        board = cls(coordinates=[], **kwargs)
+        if cells:
+            board._coords = cells
+            board.is_finished = kwargs.get("is_finished", False)
+        return board
+
+    @property
+    def is_periodic(self) -> bool:
+        ''' True if the board is known to repeat, possibly shifted. '''
+        return self.period is not None
+
     def to_dense(self) -> list[list[int]]:
         ''' Convert the board to a dense 2D list representation. 
             This is not currently used but could easily be exposed with a new endpoint.
@@ -32,28 +121,79 @@ class Board:
         min_x, min_y, max_x, max_y = self._find_min_max()
         grid = [[0 for _ in range(min_y, max_y + 1)] for _ in range(min_x, max_x + 1)]
         for r, c in self._coords:
-            grid[r][c] = 1
+            grid[r - min_x][c - min_y] = 1
         return grid
 
     def to_dict(self) -> dict:
         ''' Convert the board to a sparse dictionary representation. '''
         return {
             "coordinates": self._coords,
-            "is_finished": self.is_finished
+            "is_finished": self.is_finished,
+            "period": self.period,
+            "displacement": self.displacement,
+            "generation": self.generation
         }
 
+    def bounding_box(self) -> tuple[int, int, int, int]:
+        ''' Return (min_x, min_y, max_x, max_y) of the live cells, all 0 for an empty board. '''
+        return self._find_min_max()
+
+    def check_bounds(self):
+        ''' Raise ValueError if any cell is more than MAX_COORDINATE from the origin. '''
+        if any(abs(value) > MAX_COORDINATE for value in self._find_min_max()):
+            raise ValueError(f"Coordinates must be between {-MAX_COORDINATE} and {MAX_COORDINATE}")
+
     def to_string(self) -> str:
         ''' Serialize the board to a string representation. '''
         data = {
             "coordinates": list(self._coords),
-            "is_finished": self.is_finished
+            "is_finished": self.is_finished,
+            "period": self.period,
+            "displacement": self.displacement,
+            "generation": self.generation
         }
         return json.dumps(data)
+
+    def to_bytes(self) -> bytes:
+        ''' Serialize the board to the compact binary storage format. '''
+        return codec.encode(self._coords, self.is_finished, self.period, self.displacement, self.generation)
     
-    def run_iterations(self, iterations: int) -> bool:
+    def to_payload(self) -> dict:
+        ''' Convert the board to a compact picklable payload, e.g. for
+            handing it to a worker process. Coordinates are packed into
+            int64 bytes rather than a set of tuples.
+        '''
+        return {
+            "coordinates": np.array(list(self._coords), dtype=np.int64).tobytes(),
+            "is_finished": self.is_finished,
+            "period": self.period,
+            "displacement": self.displacement,
+            "generation": self.generation,
+            "engine": self._engine,
+            "max_iterations": self._max_iterations,
+            "workers": self._workers
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Board":
+        ''' Rebuild a board from to_payload output. '''
+        payload = dict(payload)
+        coordinates = np.frombuffer(payload.pop("coordinates"), dtype=np.int64).reshape(-1, 2)
+        return cls(coordinates=coordinates.tolist(), **payload)
+
+    def run_iterations(self, iterations: int, stop_on_cycle: bool = False, checkpoint_interval: int | None = None,
+                       checkpoint_retention: int | None = None) -> bool:
         ''' Run the board for a given number of iterations.
             Returns True if all iterations were completed, False if the board
             reached a finished state before completing all iterations.
+            Once a cycle is detected the remaining iterations are skipped
+            ahead using its period, or if stop_on_cycle is set the run stops
+            there and also returns False.
+            If checkpoint_interval is given, a snapshot is appended to
+            self.checkpoints whenever the generation passes a multiple of it.
+            With checkpoint_retention, only the last that many multiples
+            before the target are snapshotted, as storage would evict the
+            older ones anyway.
         '''
         if iterations < 0:
             raise ValueError("Iterations must be non-negative")
@@ -61,10 +201,273 @@ class Board:
         if iterations > self._max_iterations:
             raise ValueError(f"Iterations exceed maximum allowed of {self._max_iterations}")
 
+        if iterations == 0:
+            return True
+
+        target = self.generation + iterations
+        if checkpoint_interval and checkpoint_retention != 0:
+            # run straight to the first snapshot that will be kept, so long
+            # (e.g. hashlife) runs don't stop to snapshot every interval
+            first_kept = 0
+            if checkpoint_retention is not None:
+                first_kept = (target // checkpoint_interval - checkpoint_retention + 1) * checkpoint_interval
+            completed = True
+            while completed and self.generation < target:
+                next_checkpoint = max((self.generation // checkpoint_interval + 1) * checkpoint_interval, first_kept)
+                completed = self._run(min(target, next_checkpoint) - self.generation, stop_on_cycle)
+                if completed and self.generation % checkpoint_interval == 0:
+                    self.checkpoints.append((self.generation, self.to_bytes()))
+        else:
+            completed = self._run(iterations, stop_on_cycle)
+
+        # a finished board no longer changes, so it is equally valid at the target
+        if self.is_finished:
+            self.generation = target
+        return completed
+
+    def generations(self, deltas: bool = False):
+        ''' Lazily advance the board one iteration at a time, yielding each
+            new generation in to_dict() form. With deltas=True, only the
+            changes are yielded instead, as
+            {"generation": int, "born": set, "died": set, "is_finished": bool}.
+            Stops after yielding the generation in which the board finishes.
+        '''
+        while not self.is_finished:
+            # engines either replace the cell set, leaving this one as it
+            # was, or (incremental) update it in place and track the changes
+            previous = self._coords
+            self.run_iterations(1)
+            if not deltas:
+                yield self.to_dict()
+                continue
+            if self._coords is previous:
+                changed = self._changed or set()
+                born = {cell for cell in changed if cell in previous}
+                died = changed - born
+            else:
+                born = self._coords - previous
+                died = previous - self._coords
+            yield {
+                "generation": self.generation,
+                "born": born,
+                "died": died,
+                "is_finished": self.is_finished
+            }
+
+    def _run(self, iterations: int, stop_on_cycle: bool) -> bool:
+        ''' Run iterations, returning as described in run_iterations. '''
+        start_generation = self.generation
         while iterations > 0:
-            if self._iterate():
+            if self.is_finished:
                 return False
+
+            if self.period is not None:
+                if stop_on_cycle:
+                    return False
+                iterations = self._skip_cycles(iterations)
+                if iterations == 0:
+                    break
+
+            if self._engine == "hashlife":
+                if not stop_on_cycle:
+                    return self._measure("hashlife", self._run_hashlife, iterations)
+                stepped = self.generation - start_generation
+                if stepped >= HASHLIFE_CYCLE_PROBE and iterations > HASHLIFE_CYCLE_PROBE:
+                    # no cycle yet, so jump to just short of the target
+                    if not self._measure("hashlife", self._run_hashlife, iterations - HASHLIFE_CYCLE_PROBE):
+                        return False
+                    iterations = HASHLIFE_CYCLE_PROBE
+                chunk = min(iterations, AUTO_RESELECT_INTERVAL)
+                if stepped < HASHLIFE_CYCLE_PROBE:
+                    chunk = min(chunk, HASHLIFE_CYCLE_PROBE - stepped)
+                engine = self._select_engine()
+            elif self._engine == "auto":
+                chunk = min(iterations, AUTO_RESELECT_INTERVAL)
+                engine = self._select_engine()
+            else:
+                chunk = iterations
+                engine = self._engine
+            iterations -= chunk - self._measure(engine, self._run_engine, engine, chunk)
+            if self._cycle_candidate is not None:
+                self._confirm_cycle()
+
+        return not self.is_finished
+
+    def _measure(self, engine: str, run, *args):
+        ''' Call run(*args), recording its time and the generations it
+            stepped under the given engine.
+        '''
+        start_generation = self.generation
+        with _ENGINE_SECONDS.time(engine=engine):
+            result = run(*args)
+        _ENGINE_GENERATIONS.inc(self.generation - start_generation, engine=engine)
+        return result
+
+    def _skip_cycles(self, iterations: int) -> int:
+        ''' Jump over as many whole periods as fit in iterations.
+            Returns the number of iterations left to run.
+        '''
+        repeats, remaining = divmod(iterations, self.period)
+        self.generation += repeats * self.period
+        dx, dy = self.displacement
+        if repeats and (dx or dy):
+            dx *= repeats
+            dy *= repeats
+            self._coords = {(x + dx, y + dy) for x, y in self._coords}
+            self._changed = None
+            self._signature = None
+        return remaining
+
+    def _record_cycle(self, family: str, key, x: int, y: int) -> bool:
+        ''' Record the current generation for cycle detection.
+            Returns True if a cycle has just been detected.
+        '''
+        found = self._cycles.check(family, key, x, y)
+        if found is None:
+            return False
+        self.period, self.displacement = found
+        self._cycle_candidate = (key, x, y)
+        return True
+
+    def _confirm_cycle(self):
+        ''' Check the cycle _record_cycle found by hash alone, by stepping a
+            copy of the current cells one period and comparing the result
+            with the cells shifted by the displacement. On a hash collision
+            the cycle is dropped and the current generation takes the place
+            of the one it collided with.
+        '''
+        key, x, y = self._cycle_candidate
+        self._cycle_candidate = None
+        dx, dy = self.displacement
+        min_x, min_y, max_x, max_y = self._find_min_max()
+        if (max_x - min_x + 1) * (max_y - min_y + 1) <= DENSE_MAX_AREA:
+            start, start_x, start_y = grid, grid_x, grid_y = dense.to_array(self._coords)
+            for _ in range(self.period):
+                grid, grid_x, grid_y = dense.crop(*dense.step(grid, grid_x, grid_y))
+            repeats = (grid_x, grid_y) == (start_x + dx, start_y + dy) and np.array_equal(grid, start)
+        else:
+            probe = Board.from_cells(set(self._coords))
+            for _ in range(self.period):
+                probe._coords = probe._next_generation()
+            repeats = probe._coords == {(cell_x + dx, cell_y + dy) for cell_x, cell_y in self._coords}
+        if not repeats:
+            self.period = self.displacement = None
+            self._cycles.record(key, x, y)
+
+    def _select_engine(self) -> str:
+        ''' Choose the sparse, incremental, dense or parallel engine for the current board. '''
+        population = len(self._coords)
+        if population < DENSE_MIN_POPULATION:
+            return "sparse"
+
+        min_x, min_y, max_x, max_y = self._find_min_max()
+        area = (max_x - min_x + 1) * (max_y - min_y + 1)
+        if area > DENSE_MAX_AREA or population / area < DENSE_MIN_DENSITY:
+            # large sparse boards are usually mostly settled debris
+            return "incremental"
+        if self._workers > 1 and area >= PARALLEL_MIN_AREA:
+            return "parallel"
+        return "dense"
+
+    def _run_engine(self, engine: str, iterations: int) -> int:
+        ''' Run iterations one generation at a time with the given engine.
+            Stops early if the board finishes or a cycle is detected, and
+            returns the number of iterations that were not run.
+        '''
+        if engine == "dense":
+            return self._run_dense(iterations)
+        if engine == "parallel":
+            return self._run_parallel(iterations)
+
+        if engine == "incremental":
+            step = self._iterate_incremental
+        else:
+            step = self._iterate
+
+        while iterations > 0:
+            if step():
+                return iterations
+            iterations -= 1
+
+            if self.period is None:
+                if engine == "incremental":
+                    sig = self._signature
+                else:
+                    sig = cycles.signature(self._coords)
+                key, x, y = cycles.normalize(sig, len(self._coords))
+                if self._record_cycle("cells", key, x, y):
+                    return iterations
+        return 0
+
+    def _run_dense(self, iterations: int) -> int:
+        ''' Run iterations over a numpy array of the bounding box.
+            Follows the same finishing and cycle rules as _run_engine.
+        '''
+        if self.is_finished:
+            return iterations
+
+        self._changed = None
+        self._signature = None
+        grid, x, y = dense.to_array(self._coords)
+        while iterations > 0:
+            new_grid, new_x, new_y = dense.crop(*dense.step(grid, x, y))
+
+            # if no changes, board is finished
+            if (new_x, new_y) == (x, y) and np.array_equal(new_grid, grid):
+                self.is_finished = True
+                break
+
+            grid, x, y = new_grid, new_x, new_y
+            self.generation += 1
+
+            # if no live cells remain, board is finished
+            if not grid.size:
+                self.is_finished = True
+                break
+
             iterations -= 1
+
+            # the cropped array is already translation-normalized
+            if self.period is None and self._record_cycle("array", hash((grid.shape, grid.tobytes())), x, y):
+                break
+
+        self._coords = dense.from_array(grid, x, y)
+        return iterations
+
+    def _run_parallel(self, iterations: int) -> int:
+        ''' Run iterations like _run_dense, on self._workers processes. '''
+        if self.is_finished:
+            return iterations
+
+        self._changed = None
+        self._signature = None
+        grid, x, y = dense.to_array(self._coords)
+        # once a period is known, nothing more is recorded
+        check = None
+        if self.period is None:
+            check = lambda key, x, y: self._record_cycle("stripes", key, x, y)
+        with parallel.shared_runner(self._workers) as runner:
+            grid, x, y, stepped, iterations, finished = runner.run(grid, x, y, iterations, check)
+        self.generation += stepped
+        self.is_finished = finished
+        self._coords = dense.from_array(grid, x, y)
+        return iterations
+
+    def _run_hashlife(self, iterations: int) -> bool:
+        ''' Jump forward the given number of iterations with HashLife.
+            Intermediate generations are never materialized, so a finished
+            board can only be detected once the jump is complete.
+        '''
+        self._changed = None
+        self._signature = None
+        # intermediate generations are skipped, so cycle history is meaningless
+        self._cycles.reset()
+        self._coords = _hashlife.advance(self._coords, iterations)
+        self.generation += iterations
+
+        if not self._coords or _hashlife.advance(self._coords, 1) == self._coords:
+            self.is_finished = True
+            return False
         return True
 
     def _iterate(self) -> bool:
@@ -74,6 +477,94 @@ class Board:
         if self.is_finished:
             return True
 
+        self._changed = None
+        self._signature = None
+        new_coords = self._next_generation()
+
+        # if no changes, board is finished
+        if self._coords == new_coords:
+            self.is_finished = True
+            return True
+        
+        self._coords = new_coords
+        self.generation += 1
+        
+        # if no live cells remain, board is finished
+        if not self._coords:
+            self.is_finished = True
+            return True
+        
+        return False
+
+    def _iterate_incremental(self) -> bool:
+        ''' Perform a single iteration, only re-evaluating cells whose
+            neighborhood changed in the previous generation.
+            Returns True if the board has reached a finished state, False otherwise.
+        '''
+        if self.is_finished:
+            return True
+
+        coords = self._coords
+        if self._changed is None:
+            # nothing to go on yet, evaluate the whole board once
+            new_coords = self._next_generation()
+            born = new_coords - coords
+            died = coords - new_coords
+            self._signature = cycles.signature(coords)
+        else:
+            # a cell can only change if something in its 3x3 neighborhood
+            # changed last generation
+            candidates = set()
+            for x, y in self._changed:
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        candidates.add((x + dx, y + dy))
+
+            born = set()
+            died = set()
+            for position in candidates:
+                x, y = position
+                count = 0
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        if (dx or dy) and (x + dx, y + dy) in coords:
+                            count += 1
+                if position in coords:
+                    if count != 2 and count != 3:
+                        died.add(position)
+                elif count == 3:
+                    born.add(position)
+
+        # if no changes, board is finished
+        if not born and not died:
+            self._changed = set()
+            self.is_finished = True
+            return True
+
+        coords -= died
+        coords |= born
+        self._changed = born | died
+        self.generation += 1
+
+        sig = self._signature
+        for x, y in born:
+            sig[0] = (sig[0] + cycles.cell_hash(x, y)) % cycles.MODULUS
+            sig[1] += x
+            sig[2] += y
+        for x, y in died:
+            sig[0] = (sig[0] - cycles.cell_hash(x, y)) % cycles.MODULUS
+            sig[1] -= x
+            sig[2] -= y
+
+        # if no live cells remain, board is finished
+        if not coords:
+            self.is_finished = True
+            return True
+
+        return False
+
+    def _next_generation(self) -> set[tuple[int, int]]:
+        ''' Compute the next generation's live cells from scratch. '''
         neighbors = {}
 
         # count neighbors for each live cell
@@ -101,20 +592,7 @@ class Board:
                 # dead cells
                 if count == 3:
                     new_coords.add(position)
-
-        # if no changes, board is finished
-        if self._coords == new_coords:
-            self.is_finished = True
-            return True
-        
-        self._coords = new_coords
-        
-        # if no live cells remain, board is finished
-        if not self._coords:
-            self.is_finished = True
-            return True
-        
-        return False
+        return new_coords
 
     def _find_min_max(self) -> tuple[int, int, int, int]:
         ''' Recalculate the min and max x and y values based on current coordinates. '''
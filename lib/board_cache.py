@@ -0,0 +1,73 @@
+#!/usr/local/bin/python3
+
+''' In-process cache of live Board objects, in front of valkey.
+
+    Entries are tagged with the board's stored version. A request checks
+    the version key (a tiny GET) and, if nothing has changed since this
+    worker last wrote the board, skips fetching and decoding it. Writes
+    from other workers bump the version, so stale entries are never used.
+'''
+
+from collections import OrderedDict
+from lib.board import Board
+
+
+class BoardCache:
+    def __init__(self, max_boards: int = 256, max_cells: int = 5_000_000):
+        ''' Least recently used boards are evicted once there are more than
+            max_boards, or their live cells add up to more than max_cells.
+        '''
+        self._max_boards = max_boards
+        self._max_cells = max_cells
+        self._entries: OrderedDict[str, tuple[int, Board, int]] = OrderedDict()
+        self._cells = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, board_id: str) -> bool:
+        return board_id in self._entries
+
+    @property
+    def cells(self) -> int:
+        ''' Total live cells across cached boards. '''
+        return self._cells
+
+    def take(self, board_id: str, version: int) -> Board | None:
+        ''' Remove and return the cached board if it is at the given version.
+            The caller owns the board until it puts it back, so a request
+            that mutates it and then fails can't leave a corrupt entry.
+        '''
+        entry = self._pop(board_id)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, board_id: str, version: int, board: Board):
+        ''' Cache a board as of the given stored version. '''
+        if not self._max_boards:
+            return
+        self._pop(board_id)
+
+        size = len(board.to_dict()["coordinates"]) + 1
+        if size > self._max_cells:
+            return
+        self._entries[board_id] = (version, board, size)
+        self._cells += size
+
+        while len(self._entries) > self._max_boards or self._cells > self._max_cells:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._cells -= evicted_size
+
+    def discard(self, board_id: str):
+        self._pop(board_id)
+
+    def _pop(self, board_id: str) -> tuple[int, Board, int] | None:
+        entry = self._entries.pop(board_id, None)
+        if entry is not None:
+            self._cells -= entry[2]
+        return entry
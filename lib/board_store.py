@@ -0,0 +1,170 @@
+#!/usr/local/bin/python3
+
+''' Reading and writing whole boards in valkey, shared by the API and the
+    job workers.
+
+    lib.storage holds the raw valkey operations; BoardStore applies the
+    configured storage format, compression, quotas and TTL on top of them,
+    so every process writes boards the same way.
+'''
+
+import asyncio
+from lib import codec, compression, metrics, storage, tiles
+from lib.board import Board
+
+STAGE_SECONDS = metrics.histogram(
+    "gol_stage_duration_seconds", "Time spent in each stage of handling a request", ("stage",))
+
+
+class BoardNotFound(LookupError):
+    pass
+
+
+class QuotaExceeded(ValueError):
+    pass
+
+
+class BoardStore:
+    def __init__(self, storage_format: str = "binary", ttl: int = 0, compression_method: str = "zlib",
+                 compress_min_size: int = 65536, max_cells: int = 0, max_bytes: int = 0,
+                 checkpoint_retention: int = 32):
+        ''' storage_format is "binary", "json" or "tiled"; any format is read
+            back regardless. A ttl, max_cells or max_bytes of 0 disables it.
+        '''
+        self.storage_format = storage_format
+        self.ttl = ttl
+        self.compression_method = compression_method
+        self.compress_min_size = compress_min_size
+        self.max_cells = max_cells
+        self.max_bytes = max_bytes
+        self.checkpoint_retention = checkpoint_retention
+
+    async def retrieve(self, client, board_id: str) -> tuple[dict, int, dict[str, bytes] | None]:
+        ''' Retrieve and deserialize a board by its ID, along with its stored
+            version and tiles (as load() returns them).
+            Raises BoardNotFound if there's no such board.
+        '''
+        board_data, version, stored_tiles = await self.load(client, board_id)
+        if board_data is None:
+            raise BoardNotFound("Board not found")
+        return self.decode(board_data, stored_tiles), version, stored_tiles
+
+    async def load(self, client, board_id: str) -> tuple[bytes | str | None, int, dict[str, bytes] | None]:
+        ''' Fetch a stored board, its version and, for tiled boards, its tiles
+            (None for boards stored whole), refreshing its TTL alongside.
+        '''
+        with STAGE_SECONDS.time(stage="valkey_read"):
+            loaded, _ = await asyncio.gather(self._fetch(client, board_id), self.touch(client, [board_id]))
+            return loaded
+
+    async def load_many(self, client, board_ids: list[str]) -> list[tuple[bytes | str | None, int, dict[str, bytes] | None]]:
+        ''' load() for many boards, normally in a single round trip. '''
+        with STAGE_SECONDS.time(stage="valkey_read"):
+            loaded, _ = await asyncio.gather(self._fetch_many(client, board_ids), self.touch(client, board_ids))
+            return loaded
+
+    async def _fetch(self, client, board_id: str) -> tuple[bytes | str | None, int, dict[str, bytes] | None]:
+        if self.storage_format == "tiled":
+            return _tiles_if_tiled(*await storage.load_tiled(client, board_id))
+        board_data, version = await storage.load(client, board_id)
+        if codec.is_tiled(board_data):
+            # stored before the storage format changed
+            return _tiles_if_tiled(*await storage.load_tiled(client, board_id))
+        return board_data, version, None
+
+    async def _fetch_many(self, client, board_ids: list[str]) -> list[tuple[bytes | str | None, int, dict[str, bytes] | None]]:
+        if self.storage_format == "tiled":
+            return [_tiles_if_tiled(*loaded) for loaded in await storage.load_many_tiled(client, board_ids)]
+        return [_tiles_if_tiled(*await storage.load_tiled(client, board_id)) if codec.is_tiled(board_data)
+                else (board_data, version, None)
+                for board_id, (board_data, version) in zip(board_ids, await storage.load_many(client, board_ids))]
+
+    async def touch(self, client, board_ids: list[str]):
+        ''' Push back the expiry of boards that are being used, if a TTL is set. '''
+        if self.ttl and board_ids:
+            await storage.touch(client, board_ids, self.ttl)
+
+    def decode(self, board_data: bytes | str, stored_tiles: dict[str, bytes] | None = None) -> dict:
+        ''' Deserialize a stored board, and the tiles of a tiled board, into
+            Board keyword arguments.
+        '''
+        with STAGE_SECONDS.time(stage="decode"):
+            if stored_tiles is None:
+                return codec.decode(board_data)
+            return codec.decode(board_data, tiles.merge(stored_tiles))
+
+    def serialize(self, board: Board) -> bytes | str:
+        ''' Serialize a whole board in the configured storage format, or the
+            binary format for tiled storage (e.g. for checkpoints).
+        '''
+        with STAGE_SECONDS.time(stage="serialize"):
+            if self.storage_format == "json":
+                board_data = board.to_string()
+            else:
+                board_data = board.to_bytes()
+            if len(board_data) >= self.compress_min_size:
+                board_data = compression.compress(board_data, self.compression_method)
+            return board_data
+
+    def compress_checkpoints(self, checkpoints: list[tuple[int, bytes | str]]) -> list[tuple[int, bytes | str]]:
+        ''' Checkpoints are rarely read back, so they're compressed whatever their size. '''
+        return [(generation, compression.compress(data, self.compression_method)) for generation, data in checkpoints]
+
+    async def save_checkpoints(self, client, board_id: str, checkpoints: list[tuple[int, bytes | str]]) -> int:
+        ''' Compress and store (generation, data) snapshots of a board.
+            Returns the number of old checkpoints evicted.
+        '''
+        return await storage.save_checkpoints(client, board_id, self.compress_checkpoints(checkpoints),
+                                              self.checkpoint_retention, self.ttl)
+
+    def queue_save_checkpoints(self, client, board_id: str, checkpoints: list[tuple[int, bytes | str]]):
+        ''' save_checkpoints() on a pipeline. '''
+        return storage.queue_save_checkpoints(client, board_id, self.compress_checkpoints(checkpoints),
+                                              self.checkpoint_retention, self.ttl)
+
+    def check_cells(self, board: Board):
+        if self.max_cells and len(board.to_dict()["coordinates"]) > self.max_cells:
+            raise QuotaExceeded(f"board exceeds limit of {self.max_cells} live cells")
+
+    def check_bytes(self, size: int):
+        if self.max_bytes and size > self.max_bytes:
+            raise QuotaExceeded(f"board exceeds storage limit of {self.max_bytes} bytes")
+
+    def queue_write(self, client, board_id: str, board: Board, version: int, stored_tiles: dict[str, bytes] | None):
+        ''' Issue, or queue on a pipeline, the compare-and-set of a board
+            against version, in the configured storage format.
+            stored_tiles are the board's tiles at that version, as load()
+            returns them; tiled boards only rewrite the tiles that differ from
+            them, or all tiles if they're None.
+            Raises QuotaExceeded if the board is over its quota, before
+            anything is issued.
+        '''
+        self.check_cells(board)
+        if self.storage_format != "tiled":
+            board_data = self.serialize(board)
+            self.check_bytes(len(board_data))
+            if stored_tiles is None:
+                return storage.queue_compare_and_set(client, board_id, board_data, version, self.ttl)
+            # the board was tiled, so drop its tiles
+            return storage.queue_compare_and_set_tiles(client, board_id, board_data, version, {}, [],
+                                                           replace=True, ttl=self.ttl)
+
+        with STAGE_SECONDS.time(stage="serialize"):
+            board_dict = board.to_dict()
+            cells = tiles.to_array(board_dict["coordinates"])
+            header = codec.encode_array(cells, board_dict["is_finished"], board_dict["period"],
+                                        board_dict["displacement"], board_dict["generation"], tiled=True)
+            current = tiles.split(cells)
+            self.check_bytes(len(header) + sum(len(value) for value in current.values()))
+            if stored_tiles is None:
+                return storage.queue_compare_and_set_tiles(client, board_id, header, version, current, [],
+                                                           replace=True, ttl=self.ttl)
+            changed, removed = tiles.diff(stored_tiles, current)
+            return storage.queue_compare_and_set_tiles(client, board_id, header, version, changed, removed, ttl=self.ttl)
+
+
+def _tiles_if_tiled(board_data, version: int, stored_tiles: dict[str, bytes]):
+    ''' Drop the tiles read along with a board that's stored whole, e.g.
+        from before the storage format changed.
+    '''
+    return board_data, version, stored_tiles if codec.is_tiled(board_data) else None
@@ -0,0 +1,216 @@
+#!/usr/local/bin/python3
+
+''' Versioned binary storage format for boards.
+
+    Layout (little endian):
+        header  - magic, format version, flags, element width, generation,
+                  period, displacement, bounding box and cell count
+        cells   - (x - min_x, y - min_y) pairs sorted by x then y, packed as
+                  unsigned ints of the smallest width that fits the box
+
+    The cell block loads directly into a numpy array with no per-cell
+    parsing. decode() also accepts the original JSON format, so boards
+    stored before this format existed keep working.
+
+    Tiled boards (see lib.tiles) store only the header, with the tiled
+    flag set; attach() and decode() combine it with the cells read from
+    the tiles.
+'''
+
+import itertools
+import json
+import struct
+import numpy as np
+
+MAGIC = b"GOLB"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sBBBxqqqqqqqqQ")
+
+_FLAG_FINISHED = 1
+_FLAG_PERIODIC = 2
+_FLAG_TILED = 4
+
+_WIDTHS = {2: np.dtype("<u2"), 4: np.dtype("<u4"), 8: np.dtype("<u8")}
+
+
+def encode(coordinates, is_finished: bool = False, period: int | None = None,
+           displacement: tuple[int, int] | None = None, generation: int = 0, tiled: bool = False) -> bytes:
+    ''' Serialize a board to the binary format.
+        With tiled, only the header is written, for boards whose cells are
+        stored as tiles.
+    '''
+    count = len(coordinates)
+    cells = np.fromiter(itertools.chain.from_iterable(coordinates), dtype=np.int64, count=count * 2).reshape(-1, 2)
+    return encode_array(cells, is_finished, period, displacement, generation, tiled)
+
+
+def encode_array(cells: np.ndarray, is_finished: bool = False, period: int | None = None,
+                 displacement: tuple[int, int] | None = None, generation: int = 0, tiled: bool = False) -> bytes:
+    ''' encode() for an (n, 2) int64 array of distinct cells. '''
+    count = len(cells)
+    if count:
+        min_x, min_y = (int(value) for value in cells.min(axis=0))
+        max_x, max_y = (int(value) for value in cells.max(axis=0))
+        if not tiled:
+            # lexsort sorts by the last key first
+            cells = cells[np.lexsort((cells[:, 1], cells[:, 0]))] - (min_x, min_y)
+        span = max(max_x - min_x, max_y - min_y)
+    else:
+        min_x = min_y = max_x = max_y = 0
+        span = 0
+
+    width = next(width for width in (2, 4, 8) if span < 1 << (width * 8))
+
+    flags = 0
+    if is_finished:
+        flags |= _FLAG_FINISHED
+    if period is not None:
+        flags |= _FLAG_PERIODIC
+    if tiled:
+        flags |= _FLAG_TILED
+    disp_x, disp_y = displacement if displacement is not None else (0, 0)
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, flags, width, generation, period or 0,
+                          disp_x, disp_y, min_x, min_y, max_x, max_y, count)
+    if not count or tiled:
+        return header
+    return header + cells.astype(_WIDTHS[width]).tobytes()
+
+
+def _decode_header(data) -> tuple[np.dtype, int, dict]:
+    ''' Unpack a header into the cell dtype, cell count and board fields. '''
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated binary board")
+    (magic, version, flags, width, generation, period, disp_x, disp_y,
+     min_x, min_y, max_x, max_y, count) = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary board")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported board format version {version}")
+    if width not in _WIDTHS:
+        raise ValueError(f"Invalid cell width {width}")
+
+    periodic = bool(flags & _FLAG_PERIODIC)
+    return _WIDTHS[width], count, {
+        "tiled": bool(flags & _FLAG_TILED),
+        "is_finished": bool(flags & _FLAG_FINISHED),
+        "period": period if periodic else None,
+        "displacement": (disp_x, disp_y) if periodic else None,
+        "generation": generation,
+        "bounding_box": (min_x, min_y, max_x, max_y),
+    }
+
+
+def decode_array(data: bytes) -> tuple[np.ndarray, dict]:
+    ''' Deserialize the binary format into an (n, 2) int64 array of cells
+        and a dict of the remaining board fields.
+    '''
+    dtype, count, fields = _decode_header(data)
+    if fields.pop("tiled"):
+        raise ValueError("Cells of a tiled board are stored separately")
+    cells = np.frombuffer(data, dtype=dtype, count=count * 2, offset=_HEADER.size)
+    min_x, min_y, _, _ = fields["bounding_box"]
+    return cells.reshape(-1, 2).astype(np.int64) + (min_x, min_y), fields
+
+
+def decode_header(data: bytes) -> dict:
+    ''' Read the board fields, bounding box and number of cells from the
+        binary format, without decoding the cells.
+    '''
+    _, count, fields = _decode_header(data)
+    fields["count"] = count
+    return fields
+
+
+def is_tiled(data: bytes | str | None) -> bool:
+    ''' True if data is the header of a board whose cells are stored as tiles.
+        Invalid data isn't, and decoding it reports what's wrong instead.
+    '''
+    if not is_binary(data):
+        return False
+    try:
+        return decode_header(data)["tiled"]
+    except ValueError:
+        return False
+
+
+def attach(header: bytes, cells: np.ndarray) -> tuple[np.ndarray, dict]:
+    ''' Combine a tiled board's header with the cells read from its tiles,
+        returning the same as decode_array().
+    '''
+    _, count, fields = _decode_header(header)
+    if not fields.pop("tiled"):
+        raise ValueError("Board is not tiled")
+    if len(cells) != count:
+        raise ValueError("Tiles don't match the board header")
+    return cells, fields
+
+
+def to_set(cells: np.ndarray) -> set[tuple[int, int]]:
+    ''' Convert an (n, 2) array of cells to a set of (x, y) tuples. '''
+    xs, ys = cells.T.tolist() if len(cells) else ([], [])
+    return set(zip(xs, ys))
+
+
+def decode(data: bytes | str, cells: np.ndarray | None = None) -> dict:
+    ''' Deserialize a stored board, in either the binary or legacy JSON
+        format, into a dict of Board keyword arguments.
+        For tiled boards, cells are the cells read from the tiles.
+    '''
+    if is_binary(data):
+        cells, fields = decode_array(data) if cells is None else attach(data, cells)
+        fields.pop("bounding_box")
+        fields["coordinates"] = to_set(cells)
+        return fields
+
+    return json.loads(data)
+
+
+def is_binary(data: bytes | str) -> bool:
+    ''' True if stored data is in the binary format rather than JSON. '''
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class Decoder:
+    ''' Incrementally decode the binary format from chunks of bytes, e.g.
+        a request body as it arrives, without holding the whole encoding.
+    '''
+    def __init__(self, max_cells: int | None = None):
+        self._max_cells = max_cells
+        self._buffer = bytearray()
+        self._dtype = None
+        self._count = 0
+        self._received = 0
+        self._fields = None
+        self._chunks = []
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        if self._fields is None:
+            if len(self._buffer) < _HEADER.size:
+                return
+            self._dtype, self._count, self._fields = _decode_header(self._buffer)
+            if self._fields.pop("tiled"):
+                raise ValueError("Cells of a tiled board are stored separately")
+            if self._max_cells is not None and self._count > self._max_cells:
+                raise ValueError(f"Pattern exceeds limit of {self._max_cells} cells")
+            del self._buffer[:_HEADER.size]
+
+        cell_size = self._dtype.itemsize * 2
+        usable = len(self._buffer) - len(self._buffer) % cell_size
+        if not usable:
+            return
+        self._received += usable // cell_size
+        if self._received > self._count:
+            raise ValueError("More cells than the header declares")
+        self._chunks.append(np.frombuffer(bytes(self._buffer[:usable]), dtype=self._dtype))
+        del self._buffer[:usable]
+
+    def close(self) -> tuple[np.ndarray, dict]:
+        ''' Finish decoding, returning the same as decode_array(). '''
+        if self._fields is None or self._buffer or self._received != self._count:
+            raise ValueError("Truncated binary board")
+        cells = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=self._dtype)
+        min_x, min_y, _, _ = self._fields["bounding_box"]
+        return cells.reshape(-1, 2).astype(np.int64) + (min_x, min_y), self._fields
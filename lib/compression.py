@@ -0,0 +1,66 @@
+#!/usr/local/bin/python3
+
+''' Transparent compression of stored boards.
+
+    Compressed values are plain zlib or zstd streams, recognized by their
+    own magic bytes, which neither the binary format ("GOLB") nor JSON
+    ("{") can start with. So compressed and uncompressed values can be
+    stored side by side, and decompress() passes anything else through.
+
+    zstd needs the optional zstandard package.
+'''
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+METHODS = ("none", "zlib", "zstd")
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# the first byte of a zlib stream with the default window size
+_ZLIB_MAGIC = 0x78
+
+
+def check_method(method: str):
+    ''' Raise ValueError if method can't be used here. '''
+    if method not in METHODS:
+        raise ValueError(f"Compression must be one of {', '.join(METHODS)}")
+    if method == "zstd" and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard package")
+
+
+def is_compressed(data: bytes | str | None) -> bool:
+    if not isinstance(data, (bytes, bytearray, memoryview)) or len(data) < 4:
+        return False
+    header = bytes(data[:4])
+    # the first two bytes of a zlib stream are a multiple of 31
+    return header == _ZSTD_MAGIC or (header[0] == _ZLIB_MAGIC and int.from_bytes(header[:2], "big") % 31 == 0)
+
+
+def compress(data: bytes | str, method: str, level: int = 3) -> bytes | str:
+    ''' Compress stored data with method, unless it's "none", the data is
+        already compressed or compressing it doesn't make it any smaller.
+    '''
+    if method == "none" or is_compressed(data):
+        return data
+    raw = data.encode() if isinstance(data, str) else bytes(data)
+    if method == "zstd":
+        check_method(method)
+        compressed = zstandard.ZstdCompressor(level=level).compress(raw)
+    else:
+        compressed = zlib.compress(raw, level)
+    return compressed if len(compressed) < len(raw) else data
+
+
+def decompress(data: bytes | str | None) -> bytes | str | None:
+    ''' Undo compress(), leaving data that isn't compressed as it is. '''
+    if not is_compressed(data):
+        return data
+    if bytes(data[:4]) == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("Board is zstd compressed, which needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(bytes(data))
+    return zlib.decompress(data)
@@ -0,0 +1,107 @@
+#!/usr/local/bin/python3
+
+''' Oscillator and spaceship detection.
+
+    Generations are identified by a translation-normalized hash, so a
+    pattern that returns to an earlier shape (in place or shifted) is
+    detected along with its period and displacement. Hashes can collide,
+    so callers confirm a detected cycle against the actual cells.
+'''
+
+from collections import deque
+
+# polynomial hash of a set of cells: sum of A^x * B^y mod a Mersenne prime.
+# translating a pattern by (dx, dy) multiplies the hash by A^dx * B^dy, and
+# the sums are additive, so both can be updated cell by cell as cells are
+# born or die instead of rehashing the whole board every generation.
+MODULUS = (1 << 61) - 1
+_A = 0x5DEECE66D
+_B = 0x2545F4914F6CDD1D % MODULUS
+
+
+def cell_hash(x: int, y: int) -> int:
+    ''' Hash contribution of a single live cell. '''
+    return pow(_A, x, MODULUS) * pow(_B, y, MODULUS) % MODULUS
+
+
+def signature(coordinates) -> list[int]:
+    ''' Return the [hash, sum of x, sum of y] signature of a set of cells. '''
+    powers_a = {}
+    powers_b = {}
+    total = 0
+    sum_x = 0
+    sum_y = 0
+    for x, y in coordinates:
+        power_a = powers_a.get(x)
+        if power_a is None:
+            power_a = powers_a[x] = pow(_A, x, MODULUS)
+        power_b = powers_b.get(y)
+        if power_b is None:
+            power_b = powers_b[y] = pow(_B, y, MODULUS)
+        total += power_a * power_b
+        sum_x += x
+        sum_y += y
+    return [total % MODULUS, sum_x, sum_y]
+
+
+def normalize(sig: list[int], population: int) -> tuple[tuple, int, int]:
+    ''' Turn a signature into a translation-invariant key and an origin.
+        The origin is the floor of the centroid, which moves by exactly
+        (dx, dy) when the pattern is translated by (dx, dy).
+    '''
+    total, sum_x, sum_y = sig
+    if not population:
+        return (0, 0, 0, 0), 0, 0
+    origin_x = sum_x // population
+    origin_y = sum_y // population
+    shifted = total * pow(_A, -origin_x, MODULUS) * pow(_B, -origin_y, MODULUS) % MODULUS
+    key = (population, sum_x - origin_x * population, sum_y - origin_y * population, shifted)
+    return key, origin_x, origin_y
+
+
+class CycleDetector:
+    def __init__(self, history: int = 64):
+        ''' Keep the keys of the last `history` generations, so cycles with
+            a period up to `history` are detected.
+        '''
+        self._history = history
+        self.reset()
+
+    def reset(self, family: str | None = None):
+        ''' Forget all recorded generations.
+            Keys from different families (e.g. set and array based engines)
+            are not comparable, so switching family resets the history.
+        '''
+        self._family = family
+        self._count = 0
+        self._order = deque()
+        self._seen = {}
+
+    def check(self, family: str, key, x: int, y: int) -> tuple[int, tuple[int, int]] | None:
+        ''' Record a generation's key and origin.
+            Returns (period, displacement) if the same key was seen within
+            the history, None otherwise.
+        '''
+        if family != self._family:
+            self.reset(family)
+
+        previous = self._seen.get(key)
+        if previous is not None:
+            count, prev_x, prev_y = previous
+            return self._count - count, (x - prev_x, y - prev_y)
+
+        self.record(key, x, y)
+        return None
+
+    def record(self, key, x: int, y: int):
+        ''' Record a generation without checking it, replacing an earlier
+            generation with the same key, e.g. after check() matched it but
+            the cells turned out to differ.
+        '''
+        if key in self._seen:
+            self._order.remove(key)
+        self._seen[key] = (self._count, x, y)
+        self._order.append(key)
+        if len(self._order) > self._history:
+            del self._seen[self._order.popleft()]
+        self._count += 1
@@ -0,0 +1,63 @@
+#!/usr/local/bin/python3
+
+''' Vectorized stepping over a dense bounding-box array.
+
+    Grids are uint8 arrays positioned by the coordinates of their [0, 0]
+    cell. Each step grows the box by one cell on every side, and crop()
+    shrinks it back to the live cells so the box tracks the pattern.
+'''
+
+import numpy as np
+
+
+def to_array(coordinates) -> tuple[np.ndarray, int, int]:
+    ''' Convert live cells to a bounding-box array and its (x, y) origin. '''
+    if not coordinates:
+        return np.zeros((0, 0), dtype=np.uint8), 0, 0
+
+    count = len(coordinates)
+    xs = np.fromiter((x for x, _ in coordinates), dtype=np.int64, count=count)
+    ys = np.fromiter((y for _, y in coordinates), dtype=np.int64, count=count)
+    min_x = int(xs.min())
+    min_y = int(ys.min())
+
+    grid = np.zeros((int(xs.max()) - min_x + 1, int(ys.max()) - min_y + 1), dtype=np.uint8)
+    grid[xs - min_x, ys - min_y] = 1
+    return grid, min_x, min_y
+
+
+def from_array(grid: np.ndarray, x: int, y: int) -> set[tuple[int, int]]:
+    ''' Convert a positioned array back to a set of live cells. '''
+    xs, ys = np.nonzero(grid)
+    return set(zip((xs + x).tolist(), (ys + y).tolist()))
+
+
+def step(grid: np.ndarray, x: int, y: int) -> tuple[np.ndarray, int, int]:
+    ''' Advance a positioned array by one generation.
+        The result is one cell larger on every side.
+    '''
+    height = grid.shape[0] + 2
+    width = grid.shape[1] + 2
+    padded = np.pad(grid, 2)
+
+    # sum the eight shifted copies to get each cell's neighbor count
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            if dx == 1 and dy == 1:
+                continue
+            counts += padded[dx:dx + height, dy:dy + width]
+
+    alive = padded[1:1 + height, 1:1 + width]
+    new_grid = ((counts == 3) | ((counts == 2) & (alive == 1))).view(np.uint8)
+    return new_grid, x - 1, y - 1
+
+
+def crop(grid: np.ndarray, x: int, y: int) -> tuple[np.ndarray, int, int]:
+    ''' Shrink a positioned array to the bounding box of its live cells. '''
+    rows = np.flatnonzero(grid.any(axis=1))
+    if rows.size == 0:
+        return grid[:0, :0], x, y
+    cols = np.flatnonzero(grid.any(axis=0))
+    return (grid[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1],
+            x + int(rows[0]), y + int(cols[0]))
@@ -0,0 +1,118 @@
+#!/usr/local/bin/python3
+
+''' Translation-invariant cache of board evolutions, shared by all boards.
+
+    Users keep submitting the same patterns (gliders, R-pentominoes, ...)
+    at different positions. Patterns are keyed by their cells shifted so the
+    bounding box starts at the origin, so every copy of a pattern shares the
+    result of "run k iterations", which is shifted back to the board's real
+    position on a hit.
+'''
+
+import hashlib
+import itertools
+import time
+from collections import OrderedDict
+import numpy as np
+from lib.board import Board
+
+
+class EvolutionCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, max_cells: int = 10_000):
+        ''' Entries are evicted least recently used first beyond max_entries,
+            and expire ttl seconds after being stored. Boards with more than
+            max_cells live cells (before or after) are not cached.
+        '''
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._max_cells = max_cells
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, board: Board, iterations: int, stop_on_cycle: bool) -> tuple | None:
+        ''' Compute the cache key for running board for iterations.
+            Returns None if the board is not cacheable.
+            Must be called before the board is run, since running mutates it.
+        '''
+        coordinates = board.to_dict()["coordinates"]
+        if not self._max_entries or not 0 < len(coordinates) <= self._max_cells:
+            return None
+
+        cells, origin = _normalize(coordinates)
+        digest = hashlib.blake2b(cells.tobytes(), digest_size=16).digest()
+        state = (board.is_finished, board.period, board.displacement)
+        return (digest, len(cells), iterations, stop_on_cycle, state), origin
+
+    def get(self, key: tuple | None, board: Board) -> tuple[Board, bool] | None:
+        ''' Return the cached (resulting board, run_iterations result) for
+            a key from key(), positioned relative to board, or None.
+        '''
+        if key is None:
+            return None
+
+        pattern, (x, y) = key
+        entry = self._entries.get(pattern)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[pattern]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(pattern)
+        self.hits += 1
+
+        _, cells, is_finished, period, displacement, completed, advanced = entry
+        payload = board.to_payload()
+        payload.update(
+            coordinates=(cells + (x, y)).tobytes(),
+            is_finished=is_finished,
+            period=period,
+            displacement=displacement,
+            generation=board.generation + advanced,
+        )
+        return Board.from_payload(payload), completed
+
+    def put(self, key: tuple | None, start_generation: int, result: Board, completed: bool):
+        ''' Store the outcome of running the board that key() was computed for. '''
+        coordinates = result.to_dict()["coordinates"]
+        if key is None or len(coordinates) > self._max_cells:
+            return
+
+        pattern, (x, y) = key
+        if coordinates:
+            cells = _to_array(coordinates) - (x, y)
+        else:
+            cells = np.zeros((0, 2), dtype=np.int64)
+
+        self._entries[pattern] = (
+            time.monotonic() + self._ttl,
+            cells,
+            result.is_finished,
+            result.period,
+            result.displacement,
+            completed,
+            result.generation - start_generation,
+        )
+        self._entries.move_to_end(pattern)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _to_array(coordinates) -> np.ndarray:
+    return np.fromiter(itertools.chain.from_iterable(coordinates), dtype=np.int64,
+                       count=len(coordinates) * 2).reshape(-1, 2)
+
+
+def _normalize(coordinates) -> tuple[np.ndarray, tuple[int, int]]:
+    ''' Sort cells and shift them so the bounding box starts at (0, 0). '''
+    cells = _to_array(coordinates)
+    cells = cells[np.lexsort((cells[:, 1], cells[:, 0]))]
+    origin = cells.min(axis=0)
+    return cells - origin, (int(origin[0]), int(origin[1]))
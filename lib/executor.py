@@ -0,0 +1,112 @@
+#!/usr/local/bin/python3
+
+''' Runs board iterations off the event loop.
+
+    In "inline" mode iterations run directly in the calling coroutine.
+    In "process" mode they run in a process pool, so CPU-bound simulations
+    don't block other requests and can use every core. The number of
+    simulations queued or running is bounded, and ExecutorBusy is raised
+    rather than letting the backlog (and latency) grow without limit.
+    Short steps that can't leave the process, like the next frame of a
+    stream, run on a thread instead.
+'''
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from lib.board import Board
+
+EXECUTION_MODES = ("inline", "process")
+
+
+class ExecutorBusy(Exception):
+    ''' Raised when too many simulations are already queued. '''
+
+
+def _run_payload(payload: dict, iterations: int, stop_on_cycle: bool, checkpoint_interval: int | None,
+                 checkpoint_retention: int | None) -> tuple[dict, bool, list[tuple[int, bytes]]]:
+    ''' Worker entry point: rebuild the board, run it and pack it back up. '''
+    board = Board.from_payload(payload)
+    completed = board.run_iterations(iterations, stop_on_cycle=stop_on_cycle, checkpoint_interval=checkpoint_interval,
+                                     checkpoint_retention=checkpoint_retention)
+    return board.to_payload(), completed, board.checkpoints
+
+
+class BoardExecutor:
+    def __init__(self, mode: str = "inline", workers: int | None = None, max_pending: int | None = None):
+        ''' workers defaults to the number of cores, max_pending (queued plus
+            running simulations) to four per worker.
+        '''
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Execution mode must be one of {', '.join(EXECUTION_MODES)}")
+
+        self._mode = mode
+        self._workers = workers or os.cpu_count() or 1
+        self._max_pending = max_pending if max_pending is not None else self._workers * 4
+        self._pending = 0
+        self._pool = None
+
+    @property
+    def pending(self) -> int:
+        ''' Number of simulations currently queued or running. '''
+        return self._pending
+
+    @property
+    def free(self) -> int:
+        ''' Number of simulations that can be started before ExecutorBusy is raised. '''
+        return max(self._max_pending - self._pending, 0)
+
+    async def run_iterations(self, board: Board, iterations: int, stop_on_cycle: bool = False,
+                             checkpoint_interval: int | None = None,
+                             checkpoint_retention: int | None = None) -> tuple[Board, bool]:
+        ''' Run Board.run_iterations according to the execution mode.
+            Returns the resulting board, which is a new object in process
+            mode, and run_iterations' return value.
+        '''
+        if self._mode == "inline":
+            return board, board.run_iterations(iterations, stop_on_cycle=stop_on_cycle,
+                                               checkpoint_interval=checkpoint_interval,
+                                               checkpoint_retention=checkpoint_retention)
+
+        if self._pending >= self._max_pending:
+            raise ExecutorBusy(f"Too many simulations in progress ({self._pending}), try again later")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            payload, completed, checkpoints = await loop.run_in_executor(
+                self._get_pool(), _run_payload, board.to_payload(), iterations, stop_on_cycle, checkpoint_interval,
+                checkpoint_retention
+            )
+        finally:
+            self._pending -= 1
+
+        result = Board.from_payload(payload)
+        result.checkpoints = checkpoints
+        return result, completed
+
+    async def call(self, func, *args):
+        ''' Call func(*args) according to the execution mode, on a thread
+            rather than in the pool in process mode. For short steps on state
+            that lives in this process, e.g. advancing a streamed board by a
+            generation, which would cost more to send to a worker than to run.
+        '''
+        if self._mode == "inline":
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    def shutdown(self):
+        ''' Stop the worker processes, if any were started. '''
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # created lazily so inline mode and tests never start processes.
+        # spawn avoids forking a process that already has an event loop and threads
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
@@ -0,0 +1,241 @@
+#!/usr/local/bin/python3
+
+''' HashLife engine: a memoized quadtree of canonical nodes.
+
+    Every distinct square of cells is stored exactly once, and the result of
+    advancing a node is cached, so repeated structure (still lifes, oscillators,
+    gliders travelling through empty space) is only ever computed once. This
+    lets a pattern jump 2^k generations in a single step.
+'''
+
+
+class Node:
+    ''' A canonical quadtree node of size 2^k x 2^k.
+        a, b, c, d are the (x, y), (x+1, y), (x, y+1), (x+1, y+1) quadrants.
+        Nodes are only ever created through HashLife.join, so identity
+        comparison is equivalent to structural comparison.
+    '''
+    __slots__ = ("k", "a", "b", "c", "d", "n", "_hash")
+
+    def __init__(self, k: int, a, b, c, d, n: int, node_hash: int):
+        self.k = k
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.n = n
+        self._hash = node_hash
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
+class HashLife:
+    def __init__(self, max_nodes: int = 2_000_000):
+        ''' max_nodes bounds the memo tables; they are dropped between
+            advance() calls once exceeded.
+        '''
+        self._max_nodes = max_nodes
+        self.clear()
+
+    def clear(self):
+        ''' Drop all canonical nodes and cached successors. '''
+        self._nodes = {}
+        self._zeros = {}
+        self._successors = {}
+        self._off = Node(0, None, None, None, None, 0, 0)
+        self._on = Node(0, None, None, None, None, 1, 1)
+
+    def advance(self, coordinates, generations: int) -> set[tuple[int, int]]:
+        ''' Return the live cells after advancing the given coordinates
+            by the requested number of generations.
+        '''
+        if generations < 0:
+            raise ValueError("Generations must be non-negative")
+
+        if len(self._nodes) > self._max_nodes:
+            self.clear()
+
+        coords = set(coordinates)
+        if not coords or generations == 0:
+            return coords
+
+        node, x, y = self._construct(coords)
+
+        # generations is a sum of powers of two, and steps commute,
+        # so we can take one 2^j jump per set bit
+        j = 0
+        while generations:
+            if generations & 1:
+                node, x, y = self._step(node, x, y, j)
+                if node.n == 0:
+                    return set()
+            generations >>= 1
+            j += 1
+
+        cells = set()
+        self._expand(node, x, y, cells)
+        return cells
+
+    def _step(self, node: Node, x: int, y: int, j: int) -> tuple[Node, int, int]:
+        ''' Advance a positioned node by 2^j generations. '''
+        # the node must be large enough to take a 2^j step and the pattern
+        # must sit in its central half so nothing escapes while it grows
+        while node.k < j + 2 or not self._is_padded(node):
+            node, x, y = self._centre(node, x, y)
+
+        half = 1 << (node.k - 1)
+        node, x, y = self._centre(node, x, y)
+        return self._successor(node, j), x + half, y + half
+
+    def join(self, a: Node, b: Node, c: Node, d: Node) -> Node:
+        ''' Return the canonical node with the given quadrants. '''
+        key = (a, b, c, d)
+        node = self._nodes.get(key)
+        if node is None:
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n, hash(key))
+            self._nodes[key] = node
+        return node
+
+    def _zero(self, k: int) -> Node:
+        ''' Return the empty node of level k. '''
+        node = self._zeros.get(k)
+        if node is None:
+            if k == 0:
+                node = self._off
+            else:
+                z = self._zero(k - 1)
+                node = self.join(z, z, z, z)
+            self._zeros[k] = node
+        return node
+
+    def _construct(self, coords: set[tuple[int, int]]) -> tuple[Node, int, int]:
+        ''' Build a quadtree from live cells, returning the node and the
+            coordinates of its (x, y) corner.
+        '''
+        xs, ys = zip(*coords)
+        min_x, min_y = min(xs), min(ys)
+        pattern = {(x - min_x, y - min_y): self._on for x, y in coords}
+
+        k = 0
+        while len(pattern) > 1:
+            z = self._zero(k)
+            next_level = {}
+            while pattern:
+                x, y = next(iter(pattern))
+                x -= x & 1
+                y -= y & 1
+                a = pattern.pop((x, y), z)
+                b = pattern.pop((x + 1, y), z)
+                c = pattern.pop((x, y + 1), z)
+                d = pattern.pop((x + 1, y + 1), z)
+                next_level[(x >> 1, y >> 1)] = self.join(a, b, c, d)
+            pattern = next_level
+            k += 1
+
+        # the remaining key is always (0, 0) since min_x and min_y map to 0
+        return pattern.popitem()[1], min_x, min_y
+
+    def _expand(self, node: Node, x: int, y: int, cells: set[tuple[int, int]]):
+        ''' Collect the live cells of a positioned node into cells. '''
+        if node.n == 0:
+            return
+        if node.k == 0:
+            cells.add((x, y))
+            return
+        half = 1 << (node.k - 1)
+        self._expand(node.a, x, y, cells)
+        self._expand(node.b, x + half, y, cells)
+        self._expand(node.c, x, y + half, cells)
+        self._expand(node.d, x + half, y + half, cells)
+
+    def _centre(self, node: Node, x: int, y: int) -> tuple[Node, int, int]:
+        ''' Surround a node with empty space, doubling its size. '''
+        if node.k == 0:
+            z = self._off
+            return self.join(z, z, z, node), x - 1, y - 1
+        z = self._zero(node.k - 1)
+        centred = self.join(
+            self.join(z, z, z, node.a),
+            self.join(z, z, node.b, z),
+            self.join(z, node.c, z, z),
+            self.join(node.d, z, z, z),
+        )
+        half = 1 << (node.k - 1)
+        return centred, x - half, y - half
+
+    def _is_padded(self, node: Node) -> bool:
+        ''' True if all live cells are inside the central half of the node. '''
+        if node.k < 2:
+            return False
+        return (node.a.n == node.a.d.n
+                and node.b.n == node.b.c.n
+                and node.c.n == node.c.b.n
+                and node.d.n == node.d.a.n)
+
+    def _life(self, cells: tuple[Node, ...]) -> Node:
+        ''' Apply the rules to the centre of a 3x3 block of level 0 nodes. '''
+        count = sum(cell.n for cell in cells) - cells[4].n
+        if count == 3 or (count == 2 and cells[4].n):
+            return self._on
+        return self._off
+
+    def _life_4x4(self, m: Node) -> Node:
+        ''' Advance the centre 2x2 of a level 2 node by one generation. '''
+        a, b, c, d = m.a, m.b, m.c, m.d
+        return self.join(
+            self._life((a.a, a.b, b.a, a.c, a.d, b.c, c.a, c.b, d.a)),
+            self._life((a.b, b.a, b.b, a.d, b.c, b.d, c.b, d.a, d.b)),
+            self._life((a.c, a.d, b.c, c.a, c.b, d.a, c.c, c.d, d.c)),
+            self._life((a.d, b.c, b.d, c.b, d.a, d.b, c.d, d.c, d.d)),
+        )
+
+    def _successor(self, m: Node, j: int) -> Node:
+        ''' Return the centre of a level k node advanced by 2^j generations,
+            where j is capped at k - 2. The result is a level k - 1 node.
+        '''
+        if m.n == 0:
+            return m.a
+
+        j = min(j, m.k - 2)
+        key = (m, j)
+        cached = self._successors.get(key)
+        if cached is not None:
+            return cached
+
+        if m.k == 2:
+            result = self._life_4x4(m)
+        else:
+            join = self.join
+            a, b, c, d = m.a, m.b, m.c, m.d
+            # nine overlapping level k - 1 subsquares
+            c1 = self._successor(join(a.a, a.b, a.c, a.d), j)
+            c2 = self._successor(join(a.b, b.a, a.d, b.c), j)
+            c3 = self._successor(join(b.a, b.b, b.c, b.d), j)
+            c4 = self._successor(join(a.c, a.d, c.a, c.b), j)
+            c5 = self._successor(join(a.d, b.c, c.b, d.a), j)
+            c6 = self._successor(join(b.c, b.d, d.a, d.b), j)
+            c7 = self._successor(join(c.a, c.b, c.c, c.d), j)
+            c8 = self._successor(join(c.b, d.a, c.d, d.c), j)
+            c9 = self._successor(join(d.a, d.b, d.c, d.d), j)
+
+            if j < m.k - 2:
+                # the subsquares have already advanced the full 2^j,
+                # so just reassemble their centres
+                result = join(
+                    join(c1.d, c2.c, c4.b, c5.a),
+                    join(c2.d, c3.c, c5.b, c6.a),
+                    join(c4.d, c5.c, c7.b, c8.a),
+                    join(c5.d, c6.c, c8.b, c9.a),
+                )
+            else:
+                # each pass advances 2^(k-3), so run a second pass
+                result = join(
+                    self._successor(join(c1, c2, c4, c5), j),
+                    self._successor(join(c2, c3, c5, c6), j),
+                    self._successor(join(c4, c5, c7, c8), j),
+                    self._successor(join(c5, c6, c8, c9), j),
+                )
+
+        self._successors[key] = result
+        return result
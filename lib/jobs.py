@@ -0,0 +1,123 @@
+#!/usr/local/bin/python3
+
+''' Background simulation jobs, queued on a valkey stream.
+
+    A job is a hash under "job:<id>" holding its request (board_id, kind,
+    iterations) and progress (status, generation, target_generation,
+    error). Its id is added to the STREAM, which workers (see worker.py)
+    read as the consumer group GROUP, so each job goes to one worker.
+
+    While a job runs, its worker periodically saves the board so far under
+    "job:<id>:state". A job whose worker dies stays pending in the group
+    and is claimed by another worker once it has been idle for a while,
+    which carries on from the saved state. The finished board is kept
+    under the same key as the job's result.
+'''
+
+STREAM = "jobs"
+GROUP = "workers"
+# roughly how many entries the stream keeps, long after they've been handled
+STREAM_MAX_LENGTH = 100_000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def state_key(job_id: str) -> str:
+    return f"job:{job_id}:state"
+
+
+def _to_str(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def submit(client, job_id: str, board_id: str, kind: str, iterations: int):
+    ''' Record a new job and queue it, in one round trip. '''
+    pipe = client.pipeline(transaction=True)
+    pipe.hset(job_key(job_id), mapping={"board_id": board_id, "kind": kind, "iterations": iterations, "status": QUEUED})
+    pipe.xadd(STREAM, {"job_id": job_id}, maxlen=STREAM_MAX_LENGTH, approximate=True)
+    await pipe.execute()
+
+
+async def load(client, job_id: str) -> dict[str, str] | None:
+    ''' Fetch a job's fields, or None if it doesn't exist (or expired). '''
+    fields = await client.hgetall(job_key(job_id))
+    if not fields:
+        return None
+    return {_to_str(name): _to_str(value) for name, value in fields.items()}
+
+
+async def load_state(client, job_id: str) -> bytes | None:
+    ''' Fetch the board a job saved last: its progress or result. '''
+    return await client.get(state_key(job_id))
+
+
+async def update(client, job_id: str, **fields):
+    await client.hset(job_key(job_id), mapping=fields)
+
+
+async def save_progress(client, job_id: str, generation: int, state: bytes):
+    ''' Save a running job's board and generation together. '''
+    pipe = client.pipeline(transaction=True)
+    pipe.set(state_key(job_id), state)
+    pipe.hset(job_key(job_id), mapping={"generation": generation})
+    await pipe.execute()
+
+
+async def finish(client, job_id: str, ttl: int, state: bytes | None = None, **fields):
+    ''' Mark a job done or failed (per fields["status"]), storing its
+        result if given, and expire it ttl seconds from now.
+    '''
+    pipe = client.pipeline(transaction=True)
+    if state is not None:
+        pipe.set(state_key(job_id), state)
+    pipe.hset(job_key(job_id), mapping=fields)
+    pipe.expire(job_key(job_id), ttl)
+    pipe.expire(state_key(job_id), ttl)
+    await pipe.execute()
+
+
+async def create_group(client):
+    ''' Create the consumer group (and stream), if it doesn't exist yet. '''
+    try:
+        await client.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def claim(client, consumer: str, idle: float, block: float) -> tuple[str, str] | None:
+    ''' Take the next job for this consumer, as (message_id, job_id).
+        Jobs left pending by a consumer that has been silent for idle
+        seconds are taken over first. Otherwise waits up to block seconds
+        for a new job, returning None if none arrives.
+    '''
+    reply = await client.xautoclaim(STREAM, GROUP, consumer, int(idle * 1000), start_id="0-0", count=1)
+    messages = reply[1]
+    if not messages:
+        streams = await client.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=1, block=int(block * 1000))
+        messages = streams[0][1] if streams else []
+    for message_id, fields in messages:
+        fields = {_to_str(name): _to_str(value) for name, value in (fields or {}).items()}
+        # entries trimmed from the stream while pending come back without fields
+        if "job_id" in fields:
+            return _to_str(message_id), fields["job_id"]
+        await ack(client, message_id)
+    return None
+
+
+async def heartbeat(client, consumer: str, message_id: str):
+    ''' Reset a job's idle time, so other workers don't take it over. '''
+    await client.xclaim(STREAM, GROUP, consumer, 0, [message_id], justid=True)
+
+
+async def ack(client, message_id: str):
+    ''' Remove a handled job from the group's pending list. '''
+    await client.xack(STREAM, GROUP, message_id)
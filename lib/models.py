@@ -1,5 +1,6 @@
 #!/usr/local/bin/python3
 
+from typing import Literal
 from pydantic import BaseModel
 
 class BoardId(BaseModel):
@@ -7,3 +8,42 @@ class BoardId(BaseModel):
 
 class BoardState(BaseModel):
     coordinates: set[tuple[int, int]]  # set of active cell coordinates
+
+class BoardStatus(BoardState):
+    is_finished: bool = False  # board stopped changing or died out
+    period: int | None = None  # set once the board is found to repeat
+    displacement: tuple[int, int] | None = None  # shift per period, (0, 0) for oscillators
+    generation: int = 0  # iterations since the board was created
+
+class BoardBatch(BaseModel):
+    boards: list[BoardState]
+
+class IterateBatch(BaseModel):
+    board_ids: list[str]
+    num_iters: int
+
+class BatchItem(BaseModel):
+    board_id: str | None = None
+    board: BoardStatus | None = None  # only set for iterate batches
+    error: str | None = None  # set instead of a result if this board failed
+
+class BatchResults(BaseModel):
+    results: list[BatchItem]  # in the same order as the request
+
+class JobRequest(BaseModel):
+    kind: Literal["iterate", "final"] = "iterate"  # like /iterate/{n} or /final/{n}
+    iterations: int
+
+class JobId(BaseModel):
+    job_id: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    board_id: str
+    kind: str
+    iterations: int
+    status: str  # queued, running, done or failed
+    generation: int | None = None  # board generation reached so far, once running
+    target_generation: int | None = None  # generation the job runs to, once running
+    error: str | None = None  # set if the job failed
+    board: BoardStatus | None = None  # the resulting board, once done
@@ -0,0 +1,327 @@
+#!/usr/local/bin/python3
+
+''' Steps a single large board on several cores at once.
+
+    The bounding box array (as in lib.dense) is split into horizontal
+    stripes, one per worker process, held in shared memory with two
+    buffers that swap roles every generation. Each generation every worker
+    steps its stripe from one buffer into the other, reading the halo rows
+    just above and below it directly from its neighbours' stripes, and all
+    of them meet at a barrier before the next generation starts. Workers
+    also report which rows and columns of their stripe are alive and, for
+    cycle detection, hash their rows, so the parent process never has to
+    scan the whole array.
+
+    The array is surrounded by EPOCH_GENERATIONS dead cells on every side
+    and only cropped and re-padded every EPOCH_GENERATIONS generations,
+    since a pattern grows by at most one cell per side per generation.
+'''
+
+import atexit
+import contextlib
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+EPOCH_GENERATIONS = 64
+
+_STEP = 0
+_STOP = 1
+# control fields: command, then the bounding box rows and columns to hash
+_CONTROL = 5
+
+
+class _Layout:
+    ''' numpy views of one epoch's shared memory block. '''
+    def __init__(self, buffer, workers: int, height: int, width: int):
+        offset = 0
+
+        def view(dtype, shape):
+            nonlocal offset
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self.control = view(np.int64, (_CONTROL,))
+        # per worker: whether its stripe changed, and its first and last live column
+        self.stats = view(np.int64, (workers, 3))
+        self.row_hashes = view(np.uint64, (height,))
+        self.live_rows = view(np.bool_, (height,))
+        self.grids = (view(np.uint8, (height, width)), view(np.uint8, (height, width)))
+
+    @staticmethod
+    def size(workers: int, height: int, width: int) -> int:
+        return 8 * (_CONTROL + workers * 3 + height) + height + 2 * height * width
+
+
+def _stripe(index: int, workers: int, height: int) -> tuple[int, int]:
+    ''' The rows [start, end) stepped by worker index. '''
+    return index * height // workers, (index + 1) * height // workers
+
+
+def step_stripe(src: np.ndarray, dst: np.ndarray, start: int, end: int):
+    ''' Write the next generation of rows [start, end) of src into dst.
+        Cells outside src count as dead.
+    '''
+    height, width = src.shape
+    # the stripe plus its halo, with dead cells wherever it reaches the edge
+    padded = np.pad(src[max(start - 1, 0):min(end + 1, height)],
+                    ((1 if start == 0 else 0, 1 if end == height else 0), (1, 1)))
+    rows = end - start
+    counts = np.zeros((rows, width), dtype=np.uint8)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            if dx == 1 and dy == 1:
+                continue
+            counts += padded[dx:dx + rows, dy:dy + width]
+    alive = padded[1:1 + rows, 1:1 + width]
+    dst[start:end] = (counts == 3) | ((counts == 2) & (alive == 1))
+
+
+def _hash_row(row: np.ndarray) -> int:
+    # Python's own hash is salted per process, so it can't be combined across workers
+    return int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), "little")
+
+
+def _work(index: int, workers: int, barrier, epochs):
+    ''' Worker process: step this worker's stripe for each epoch it's sent. '''
+    while True:
+        epoch = epochs.get()
+        if epoch is None:
+            return
+        name, height, width, detect = epoch
+        try:
+            memory = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            # the parent already gave up on this epoch
+            continue
+        layout = _Layout(memory.buf, workers, height, width)
+        start, end = _stripe(index, workers, height)
+        src = dst = stripe = None
+        try:
+            # the parent ends the epoch with _STOP at the next barrier
+            generation = 0
+            while True:
+                barrier.wait()
+                if layout.control[0] == _STOP:
+                    break
+                src, dst = layout.grids if generation % 2 == 0 else layout.grids[::-1]
+                step_stripe(src, dst, start, end)
+                stripe = dst[start:end]
+                columns = np.flatnonzero(stripe.any(axis=0))
+                layout.live_rows[start:end] = stripe.any(axis=1)
+                layout.stats[index] = (not np.array_equal(stripe, src[start:end]),
+                                       columns[0] if columns.size else width, columns[-1] if columns.size else -1)
+                barrier.wait()
+
+                if detect:
+                    barrier.wait()
+                    if layout.control[0] == _STOP:
+                        break
+                    _, min_row, max_row, min_col, max_col = layout.control.tolist()
+                    for row in range(max(start, min_row), min(end, max_row + 1)):
+                        layout.row_hashes[row] = _hash_row(dst[row, min_col:max_col + 1])
+                    barrier.wait()
+                generation += 1
+        except threading.BrokenBarrierError:
+            # the parent, or another worker, gave up
+            return
+        except Exception:
+            # release everyone waiting at the barrier, rather than leaving them hanging
+            barrier.abort()
+            raise
+        finally:
+            del layout, src, dst, stripe
+            memory.close()
+
+
+class StripeRunner:
+    ''' Worker processes for stepping boards, started by start() (or on
+        entering it as a context manager) and stopped by close() (or on
+        exit), so one set of processes can serve several run() calls.
+        Starting them costs far more than a run of a few generations, so
+        boards share one runner per process through shared_runner().
+    '''
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self._processes = []
+        self._closing = False
+
+    def __enter__(self) -> "StripeRunner":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # the workers may be waiting for a generation that will never come
+        self.close(abort=exc_type is not None)
+
+    @property
+    def broken(self) -> bool:
+        ''' True if a worker failed, so the runner can't be used any more. '''
+        return self._barrier.broken or not all(process.is_alive() for process in self._processes)
+
+    def start(self) -> "StripeRunner":
+        # spawn rather than fork, since the parent may be running threads
+        context = multiprocessing.get_context("spawn")
+        self._barrier = context.Barrier(self.workers + 1)
+        self._epochs = [context.SimpleQueue() for _ in range(self.workers)]
+        self._processes = [context.Process(target=_work, args=(index, self.workers, self._barrier, epochs), daemon=True)
+                           for index, epochs in enumerate(self._epochs)]
+        for process in self._processes:
+            process.start()
+        self._closing = False
+        threading.Thread(target=self._watch, daemon=True).start()
+        return self
+
+    def _watch(self):
+        # a worker that dies, however it dies, never reaches the barrier again,
+        # so break it for everyone else
+        multiprocessing.connection.wait([process.sentinel for process in self._processes])
+        if not self._closing:
+            self._barrier.abort()
+
+    def close(self, abort: bool = False):
+        ''' Stop the workers. With abort, they're released from the barrier
+            rather than waited for, e.g. if a run was interrupted.
+        '''
+        self._closing = True
+        if abort:
+            self._barrier.abort()
+        # workers between epochs stop on this, the rest on the broken barrier
+        for epochs in self._epochs:
+            epochs.put(None)
+        for process in self._processes:
+            process.join(timeout=None if not self._barrier.broken else 1)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def run(self, grid: np.ndarray, x: int, y: int, iterations: int, check=None):
+        ''' Advance a positioned array by up to iterations generations,
+            following the same rules as the serial dense engine: the run
+            ends early if nothing changes or nothing is left alive, or if
+            check(key, x, y) returns True. check is called with a
+            translation-invariant key and the origin of each generation, for
+            cycle detection.
+            Returns (grid, x, y, generations stepped, iterations not run,
+            finished), with the grid cropped to its live cells.
+        '''
+        stepped = 0
+        finished = False
+        stopped = False
+        while iterations > 0 and not finished and not stopped:
+            generations = min(iterations, EPOCH_GENERATIONS)
+            # cells can't spread further than this within the epoch
+            margin = generations
+            height = grid.shape[0] + 2 * margin
+            width = grid.shape[1] + 2 * margin
+            memory = shared_memory.SharedMemory(create=True, size=_Layout.size(self.workers, height, width))
+            layout = stats = None
+            try:
+                layout = _Layout(memory.buf, self.workers, height, width)
+                layout.grids[0][:] = 0
+                layout.grids[0][margin:height - margin, margin:width - margin] = grid
+                origin_x = x - margin
+                origin_y = y - margin
+                for epochs in self._epochs:
+                    epochs.put((memory.name, height, width, check is not None))
+
+                current = 0
+                generation = 0
+                while generation < generations:
+                    layout.control[0] = _STEP
+                    self._wait()
+                    self._wait()
+
+                    stats = layout.stats
+                    if not stats[:, 0].any():
+                        # nothing changed, so the board is finished
+                        finished = True
+                        break
+                    current = 1 - current
+                    generation += 1
+                    stepped += 1
+
+                    rows = np.flatnonzero(layout.live_rows)
+                    if not rows.size:
+                        finished = True
+                        break
+                    iterations -= 1
+
+                    if check is not None:
+                        min_col = int(stats[:, 1].min())
+                        max_col = int(stats[:, 2].max())
+                        layout.control[1:] = (rows[0], rows[-1], min_col, max_col)
+                        self._wait()
+                        self._wait()
+                        key = hashlib.blake2b(layout.row_hashes[rows[0]:rows[-1] + 1].tobytes(), digest_size=16)
+                        key.update(np.array((rows[-1] - rows[0], max_col - min_col), dtype=np.int64).tobytes())
+                        if check(key.digest(), origin_x + int(rows[0]), origin_y + min_col):
+                            stopped = True
+                            break
+
+                # the workers are waiting for the next generation, or to hash this one
+                layout.control[0] = _STOP
+                self._wait()
+
+                # every epoch steps at least once, so live_rows describes the current grid
+                grid = layout.grids[current]
+                rows = np.flatnonzero(layout.live_rows)
+                if rows.size:
+                    columns = np.flatnonzero(grid[rows[0]:rows[-1] + 1].any(axis=0))
+                    x = origin_x + int(rows[0])
+                    y = origin_y + int(columns[0])
+                    grid = grid[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1].copy()
+                else:
+                    grid = np.zeros((0, 0), dtype=np.uint8)
+            finally:
+                # views of the block have to go before it can be closed
+                layout = stats = None
+                memory.close()
+                memory.unlink()
+        return grid, x, y, stepped, iterations, finished
+
+    def _wait(self):
+        try:
+            self._barrier.wait()
+        except Exception as e:
+            raise RuntimeError("A parallel stepping worker failed") from e
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def shared_runner(workers: int):
+    ''' Use this process's long-lived runner with the given number of
+        workers, starting it on first use. Callers take turns, since one
+        runner steps one board at a time. If a run fails, the runner is
+        discarded and the next caller gets a fresh one.
+    '''
+    global _shared
+    with _shared_lock:
+        if _shared is not None and (_shared.workers != workers or _shared.broken):
+            _shared.close(abort=True)
+            _shared = None
+        if _shared is None:
+            _shared = StripeRunner(workers).start()
+        try:
+            yield _shared
+        except BaseException:
+            # the workers may be part way through an epoch
+            _shared.close(abort=True)
+            _shared = None
+            raise
+
+
+@atexit.register
+def _close_shared():
+    global _shared
+    if _shared is not None:
+        _shared.close()
+        _shared = None
@@ -0,0 +1,74 @@
+#!/usr/local/bin/python3
+
+''' Low-overhead sampling profiler for finding out where slow requests spend
+    their time.
+
+    A background thread records the stack of one target thread (normally the
+    event loop's) every `interval` seconds into a bounded ring. After a slow
+    request, report() summarizes the samples taken while it ran. Samples
+    cover everything the thread did in that window, including other
+    requests interleaved on the event loop.
+'''
+
+import collections
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, max_samples: int = 10_000, max_depth: int = 64):
+        self._interval = interval
+        self._max_depth = max_depth
+        self._samples = collections.deque(maxlen=max_samples)
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: int | None = None):
+        ''' Start sampling the given thread, by default the calling one. '''
+        if self._thread is not None:
+            return
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._samples.append((time.perf_counter(), self._stack(frame)))
+
+    def _stack(self, frame) -> tuple[str, ...]:
+        ''' Describe a stack as "file:function" entries, outermost first. '''
+        stack = []
+        while frame is not None and len(stack) < self._max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def samples(self, start: float, end: float) -> list[tuple[str, ...]]:
+        ''' Stacks sampled between two time.perf_counter() readings. '''
+        return [stack for taken, stack in list(self._samples) if start <= taken <= end]
+
+    def report(self, start: float, end: float, limit: int = 10) -> str:
+        ''' Summarize the most common stacks sampled between start and end,
+            one "count stack" line each, with frames joined by ";" as in
+            collapsed flame graph input.
+        '''
+        counts = collections.Counter(self.samples(start, end))
+        return "\n".join(f"{count} {';'.join(stack)}" for stack, count in counts.most_common(limit))
@@ -0,0 +1,182 @@
+#!/usr/local/bin/python3
+
+''' Run Length Encoded (RLE) patterns, the standard Life interchange format.
+
+    A pattern is a header line "x = <width>, y = <height>, rule = B3/S23",
+    optionally preceded by "#" comment lines, followed by runs of
+    "<count><tag>": "b" dead cells, "o" live cells, "$" end of row and "!"
+    end of pattern. RLE x is the column and y the row, so a cell at
+    (x, y) is (y, x) in board coordinates. "#R x y" or "#P x y" comment
+    lines place the top left corner of the pattern.
+'''
+
+import codecs
+import itertools
+import re
+import numpy as np
+
+RULE = "B3/S23"
+
+_TOKEN = re.compile(r"(\d*)([A-Za-z$!])|\s+")
+_HEADER = re.compile(r"x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?", re.IGNORECASE)
+_POSITION = re.compile(r"#[RP]\s+(-?\d+)\s+(-?\d+)")
+# longest line export() writes, as recommended by the format
+LINE_LENGTH = 70
+
+
+class RleParser:
+    ''' Incrementally parse RLE text fed in arbitrary chunks, straight into a
+        set of (row, col) cells.
+    '''
+    def __init__(self, max_cells: int | None = None):
+        self._max_cells = max_cells
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+        self._in_body = False
+        self._done = False
+        self._origin_x = 0
+        self._origin_y = 0
+        self._x = 0
+        self._y = 0
+        self.cells = set()
+
+    def feed(self, data: bytes | str):
+        # everything after the end of the pattern is ignored
+        if self._done:
+            return
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        self._pending += data
+        if not self._in_body:
+            self._parse_header()
+        if self._in_body:
+            self._parse_body()
+
+    def close(self) -> set[tuple[int, int]]:
+        ''' Finish parsing and return the live cells. '''
+        self.feed(self._decoder.decode(b"", final=True))
+        if not self._in_body:
+            raise ValueError("RLE pattern is missing its header line")
+        if self._pending.strip():
+            raise ValueError(f"Truncated RLE run {self._pending.strip()!r}")
+        return self.cells
+
+    def _parse_header(self):
+        while not self._in_body:
+            line, newline, rest = self._pending.partition("\n")
+            if not newline:
+                return
+            self._pending = rest
+            line = line.strip()
+            if line.startswith("#"):
+                position = _POSITION.match(line)
+                if position:
+                    self._origin_x, self._origin_y = int(position[1]), int(position[2])
+                continue
+            if not line:
+                continue
+
+            header = _HEADER.match(line)
+            if not header:
+                raise ValueError("RLE pattern is missing its header line")
+            rule = header[3]
+            if rule and rule.upper() not in (RULE, "23/3"):
+                raise ValueError(f"Unsupported rule {rule}, only {RULE} is supported")
+            self._in_body = True
+
+    def _parse_body(self):
+        text = self._pending
+        position = 0
+        # stop before a trailing run count, since its digits may continue in the next chunk
+        end = len(text.rstrip("0123456789"))
+        cells = self.cells
+        x = self._x
+        y = self._y
+        for token in _TOKEN.finditer(text, 0, end):
+            if token.start() != position:
+                raise ValueError(f"Invalid RLE at {text[position:position + 10]!r}")
+            position = token.end()
+            tag = token[2]
+            if tag is None:
+                continue
+            count = int(token[1]) if token[1] else 1
+            if tag == "b":
+                x += count
+            elif tag == "$":
+                x = 0
+                y += count
+            elif tag == "!":
+                self._done = True
+                break
+            else:
+                # any other letter is a live state of a multi-state rule
+                # runs only ever move forward, so cells are never counted twice
+                if self._max_cells is not None and len(cells) + count > self._max_cells:
+                    raise ValueError(f"Pattern exceeds limit of {self._max_cells} cells")
+                row = self._origin_y + y
+                col = self._origin_x + x
+                if count == 1:
+                    cells.add((row, col))
+                else:
+                    cells.update(zip(itertools.repeat(row, count), range(col, col + count)))
+                x += count
+        if position != end and not self._done:
+            raise ValueError(f"Invalid RLE at {text[position:position + 10]!r}")
+        self._x = x
+        self._y = y
+        self._pending = "" if self._done else text[position:]
+
+
+def parse(text: str, max_cells: int | None = None) -> set[tuple[int, int]]:
+    ''' Parse a complete RLE pattern into a set of (row, col) cells. '''
+    parser = RleParser(max_cells)
+    parser.feed(text)
+    return parser.close()
+
+
+def export(cells: np.ndarray, comment: str | None = None):
+    ''' Lazily encode an (n, 2) array of (row, col) cells sorted by row
+        then column (as lib.codec stores them) as RLE, yielding one line at
+        a time.
+    '''
+    if comment:
+        yield f"#C {comment}\n"
+    if not len(cells):
+        yield f"x = 0, y = 0, rule = {RULE}\n!\n"
+        return
+
+    min_row, min_col = (int(value) for value in cells.min(axis=0))
+    max_row, max_col = (int(value) for value in cells.max(axis=0))
+    if min_row or min_col:
+        yield f"#R {min_col} {min_row}\n"
+    yield f"x = {max_col - min_col + 1}, y = {max_row - min_row + 1}, rule = {RULE}\n"
+
+    rows = cells[:, 0] - min_row
+    cols = cells[:, 1] - min_col
+    # a run of live cells starts wherever the row changes or a column is skipped
+    starts = np.flatnonzero(np.r_[True, (np.diff(rows) != 0) | (np.diff(cols) != 1)])
+    lengths = np.diff(np.r_[starts, len(cells)])
+
+    line = ""
+    row = col = 0
+    for run_row, run_col, length in zip(rows[starts].tolist(), cols[starts].tolist(), lengths.tolist()):
+        tokens = []
+        if run_row != row:
+            tokens.append(_run(run_row - row, "$"))
+            row = run_row
+            col = 0
+        if run_col != col:
+            tokens.append(_run(run_col - col, "b"))
+        tokens.append(_run(length, "o"))
+        col = run_col + length
+
+        for token in tokens:
+            if len(line) + len(token) > LINE_LENGTH:
+                yield line + "\n"
+                line = ""
+            line += token
+    yield line + "!\n"
+
+
+def _run(count: int, tag: str) -> str:
+    return f"{count}{tag}" if count > 1 else tag
@@ -0,0 +1,85 @@
+#!/usr/local/bin/python3
+
+''' Configuration shared by the API (main.py) and the job workers
+    (worker.py), which must agree on how boards are simulated and stored.
+    Everything is read from the environment; see the README.
+'''
+
+import os
+import valkey.asyncio as valkey
+from valkey.asyncio.retry import Retry
+from valkey.backoff import ExponentialBackoff
+from lib import compression
+from lib.board_store import BoardStore
+
+BOARD_ENGINE = os.getenv("BOARD_ENGINE", "auto")
+# processes a single board may be split across by the parallel engine.
+# with more than one, auto uses it for the largest dense boards
+BOARD_PARALLEL_WORKERS = int(os.getenv("BOARD_PARALLEL_WORKERS", "1"))
+# "binary" stores boards in the compact lib.codec format, "json" in the
+# original format and "tiled" as lib.tiles tiles, so only changed tiles are
+# rewritten and /region reads only the tiles it needs. any format is read
+# back regardless of this setting.
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "binary")
+# boards expire BOARD_TTL seconds after they were last read or written,
+# along with their checkpoints (0, the default, keeps them forever)
+BOARD_TTL = int(os.getenv("BOARD_TTL", "0"))
+# boards stored in at least BOARD_COMPRESS_MIN_SIZE bytes, and all
+# checkpoints, which are rarely read back, are compressed with
+# BOARD_COMPRESSION ("zlib", "zstd" or "none")
+BOARD_COMPRESSION = os.getenv("BOARD_COMPRESSION", "zlib")
+compression.check_method(BOARD_COMPRESSION)
+BOARD_COMPRESS_MIN_SIZE = int(os.getenv("BOARD_COMPRESS_MIN_SIZE", "65536"))
+# most live cells and stored bytes a board may have, checked whenever a board
+# is created or written back (0 disables either limit)
+MAX_BOARD_CELLS = int(os.getenv("MAX_BOARD_CELLS", "10000000"))
+MAX_BOARD_BYTES = int(os.getenv("MAX_BOARD_BYTES", "0"))
+# a snapshot is kept every CHECKPOINT_INTERVAL generations (0 disables them)
+# so earlier generations can be read back without recomputing from scratch.
+# generation 0 and the newest CHECKPOINT_RETENTION snapshots are kept per board
+CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL", "64"))
+CHECKPOINT_RETENTION = int(os.getenv("CHECKPOINT_RETENTION", "32"))
+# how many times a board is recomputed after losing a write race to another
+# request or job for the same board before giving up
+MAX_WRITE_ATTEMPTS = int(os.getenv("MAX_WRITE_ATTEMPTS", "5"))
+
+board_store = BoardStore(
+    storage_format=STORAGE_FORMAT,
+    ttl=BOARD_TTL,
+    compression_method=BOARD_COMPRESSION,
+    compress_min_size=BOARD_COMPRESS_MIN_SIZE,
+    max_cells=MAX_BOARD_CELLS,
+    max_bytes=MAX_BOARD_BYTES,
+    checkpoint_retention=CHECKPOINT_RETENTION,
+)
+
+# allow overriding via environment so the app works from docker-compose
+# in production we would also use a password pulled from e.g. secrets manager
+valkey_host = os.getenv("VALKEY_HOST", "localhost")
+valkey_port = int(os.getenv("VALKEY_PORT", "6379"))
+# the pool is shared by everything in flight in a process, so size it for
+# the expected concurrency. when it's exhausted, callers wait up to
+# VALKEY_POOL_TIMEOUT seconds for a free connection rather than failing outright
+valkey_max_connections = int(os.getenv("VALKEY_MAX_CONNECTIONS", "100"))
+valkey_pool_timeout = float(os.getenv("VALKEY_POOL_TIMEOUT", "5"))
+valkey_socket_timeout = float(os.getenv("VALKEY_SOCKET_TIMEOUT", "5"))
+valkey_connect_timeout = float(os.getenv("VALKEY_CONNECT_TIMEOUT", "2"))
+# connection and timeout errors are retried with exponential backoff
+valkey_retries = int(os.getenv("VALKEY_RETRIES", "3"))
+valkey_backoff_base = float(os.getenv("VALKEY_BACKOFF_BASE", "0.01"))
+valkey_backoff_cap = float(os.getenv("VALKEY_BACKOFF_CAP", "0.5"))
+
+
+def connection_pool() -> valkey.BlockingConnectionPool:
+    ''' A new pool of connections to the configured valkey server. '''
+    return valkey.BlockingConnectionPool(
+        host=valkey_host,
+        port=valkey_port,
+        db=0,
+        max_connections=valkey_max_connections,
+        timeout=valkey_pool_timeout,
+        socket_timeout=valkey_socket_timeout,
+        socket_connect_timeout=valkey_connect_timeout,
+        retry=Retry(ExponentialBackoff(cap=valkey_backoff_cap, base=valkey_backoff_base), valkey_retries),
+        retry_on_timeout=True,
+    )
@@ -0,0 +1,38 @@
+#!/usr/local/bin/python3
+
+''' In-process request coalescing.
+
+    Concurrent calls with the same key share a single execution: the first
+    caller starts the work and everyone else awaits the same result (or
+    exception) instead of repeating it.
+'''
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    @property
+    def pending(self) -> int:
+        ''' Number of distinct calls currently running. '''
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        ''' Run fn(), or join an identical call that is already running. '''
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            # forget the call once it finishes, not when the first caller
+            # returns, so a cancelled caller doesn't orphan the others
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # shield so one caller being cancelled doesn't cancel everyone's result
+        return await asyncio.shield(future)
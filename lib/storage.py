@@ -0,0 +1,270 @@
+#!/usr/local/bin/python3
+
+''' Versioned board storage helpers on top of an async valkey client.
+
+    Each board is stored under its id, with a write counter under
+    "<id>:version". Updates are compare-and-set against the version that
+    was read, so concurrent read-modify-write cycles from any number of
+    workers can't silently overwrite each other.
+
+    Snapshots of earlier generations are stored under "<id>:gen:<n>" and
+    indexed by generation in the "<id>:checkpoints" sorted set.
+
+    Tiled boards (see lib.tiles) keep only a header under the id, and their
+    cells in the "<id>:tiles" hash of tile name to tile value, so a write
+    only sends the tiles that changed and a read can fetch just the tiles
+    it needs.
+
+    Boards and checkpoints may be stored compressed (see lib.compression)
+    and are decompressed as they're read. Boards may also be given a TTL,
+    which every write sets on the keys it writes and touch() pushes back
+    whenever a board is used, so abandoned boards expire along with
+    everything stored for them.
+'''
+
+from lib import compression
+
+# KEYS: board key, version key. ARGV: expected version, new data, ttl.
+# a missing version key counts as version 0, i.e. a freshly created board.
+# SET clears a key's TTL, so every write sets it again (a ttl of 0 means none)
+_COMPARE_AND_SET = """
+local current = redis.call('GET', KEYS[2]) or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2])
+redis.call('SET', KEYS[2], tostring(tonumber(current) + 1))
+if tonumber(ARGV[3]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return 1
+"""
+
+# KEYS: checkpoint index. ARGV: retention, ttl, then (generation, key, data)
+# triples. keeps the oldest checkpoint (normally generation 0, so any
+# generation can still be rebuilt) plus the newest `retention`, and deletes
+# the rest, one at a time since there may be more than unpack() allows
+_SAVE_CHECKPOINTS = """
+local index = KEYS[1]
+local ttl = tonumber(ARGV[2])
+for i = 3, #ARGV, 3 do
+    redis.call('SET', ARGV[i + 1], ARGV[i + 2])
+    redis.call('ZADD', index, ARGV[i], ARGV[i + 1])
+    if ttl > 0 then
+        redis.call('EXPIRE', ARGV[i + 1], ttl)
+    end
+end
+if ttl > 0 then
+    redis.call('EXPIRE', index, ttl)
+end
+local excess = redis.call('ZCARD', index) - tonumber(ARGV[1]) - 1
+if excess > 0 then
+    for _, key in ipairs(redis.call('ZRANGE', index, 1, excess)) do
+        redis.call('DEL', key)
+    end
+    redis.call('ZREMRANGEBYRANK', index, 1, excess)
+    return excess
+end
+return 0
+"""
+
+
+# KEYS: board key, version key, tiles key. ARGV: expected version, new data,
+# ttl, "1" to delete every existing tile first, the number of tiles to
+# delete, their names, then (name, value) pairs of tiles to set.
+# fields are changed one at a time, since unpack() is limited to a few
+# thousand values
+_COMPARE_AND_SET_TILES = """
+local current = redis.call('GET', KEYS[2]) or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2])
+redis.call('SET', KEYS[2], tostring(tonumber(current) + 1))
+if ARGV[4] == '1' then
+    redis.call('DEL', KEYS[3])
+end
+local first = 6 + tonumber(ARGV[5])
+for i = 6, first - 1 do
+    redis.call('HDEL', KEYS[3], ARGV[i])
+end
+for i = first, #ARGV, 2 do
+    redis.call('HSET', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+if tonumber(ARGV[3]) > 0 then
+    for i = 1, 3 do
+        redis.call('EXPIRE', KEYS[i], ARGV[3])
+    end
+end
+return 1
+"""
+
+# KEYS: board key, version key, tiles key.
+# returns the data, version and every tile as one consistent snapshot
+_LOAD_TILED = """
+return {redis.call('GET', KEYS[1]), redis.call('GET', KEYS[2]), redis.call('HGETALL', KEYS[3])}
+"""
+
+# KEYS: board key, tiles key. ARGV: names of the tiles to fetch.
+# returns the data followed by each tile's value, or false if it's empty
+_LOAD_REGION = """
+local result = {redis.call('GET', KEYS[1])}
+for i = 1, #ARGV do
+    result[i + 1] = redis.call('HGET', KEYS[2], ARGV[i])
+end
+return result
+"""
+
+# KEYS: board key, version key, tiles key, checkpoint index. ARGV: ttl.
+_TOUCH = """
+for i = 1, #KEYS do
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+for _, key in ipairs(redis.call('ZRANGE', KEYS[4], 0, -1)) do
+    redis.call('EXPIRE', key, ARGV[1])
+end
+return 1
+"""
+
+
+def version_key(board_id: str) -> str:
+    return f"{board_id}:version"
+
+
+def checkpoint_key(board_id: str, generation: int) -> str:
+    return f"{board_id}:gen:{generation}"
+
+
+def checkpoints_key(board_id: str) -> str:
+    return f"{board_id}:checkpoints"
+
+
+def tiles_key(board_id: str) -> str:
+    return f"{board_id}:tiles"
+
+
+def _to_str(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def load(client, board_id: str) -> tuple[bytes | str | None, int]:
+    ''' Fetch a stored board and its version in one round trip.
+        The data is None if the board doesn't exist.
+    '''
+    data, version = await client.mget(board_id, version_key(board_id))
+    return compression.decompress(data), int(version or 0)
+
+
+async def load_many(client, board_ids: list[str]) -> list[tuple[bytes | str | None, int]]:
+    ''' Fetch many boards and their versions with a single MGET. '''
+    keys = []
+    for board_id in board_ids:
+        keys.extend((board_id, version_key(board_id)))
+    values = await client.mget(*keys) if keys else []
+    return [(compression.decompress(values[i]), int(values[i + 1] or 0)) for i in range(0, len(values), 2)]
+
+
+async def load_tiled(client, board_id: str) -> tuple[bytes | str | None, int, dict[str, bytes]]:
+    ''' Fetch a board, its version and all of its tiles in one round trip. '''
+    return _parse_tiled(await queue_load_tiled(client, board_id))
+
+
+async def load_many_tiled(client, board_ids: list[str]) -> list[tuple[bytes | str | None, int, dict[str, bytes]]]:
+    ''' load_tiled() for many boards, in one pipelined round trip. '''
+    if not board_ids:
+        return []
+    pipe = client.pipeline(transaction=False)
+    for board_id in board_ids:
+        queue_load_tiled(pipe, board_id)
+    return [_parse_tiled(reply) for reply in await pipe.execute()]
+
+
+def queue_load_tiled(client, board_id: str):
+    return client.eval(_LOAD_TILED, 3, board_id, version_key(board_id), tiles_key(board_id))
+
+
+def _parse_tiled(reply) -> tuple[bytes | str | None, int, dict[str, bytes]]:
+    data, version, fields = reply
+    return compression.decompress(data), int(version or 0), {_to_str(fields[i]): fields[i + 1] for i in range(0, len(fields), 2)}
+
+
+async def load_region(client, board_id: str, names: list[str]) -> tuple[bytes | str | None, dict[str, bytes]]:
+    ''' Fetch a board and only the named tiles, in one round trip.
+        Tiles that don't exist (empty, or the board isn't tiled) are left out.
+    '''
+    data, *values = await client.eval(_LOAD_REGION, 2, board_id, tiles_key(board_id), *names)
+    return compression.decompress(data), {name: value for name, value in zip(names, values) if value}
+
+
+async def load_version(client, board_id: str) -> int:
+    ''' Fetch only a board's version. '''
+    return int(await client.get(version_key(board_id)) or 0)
+
+
+async def compare_and_set(client, board_id: str, data: bytes | str, expected_version: int, ttl: int = 0) -> bool:
+    ''' Store data only if the board is still at expected_version, expiring
+        in ttl seconds if it's set.
+        Returns False if another writer got there first.
+    '''
+    result = await queue_compare_and_set(client, board_id, data, expected_version, ttl)
+    return bool(result)
+
+
+def queue_compare_and_set(client, board_id: str, data: bytes | str, expected_version: int, ttl: int = 0):
+    ''' Issue the compare-and-set command; on a pipeline this just queues
+        it, and the pipeline result is 1 on success or 0 on conflict.
+    '''
+    return client.eval(_COMPARE_AND_SET, 2, board_id, version_key(board_id), str(expected_version), data, ttl)
+
+
+def queue_compare_and_set_tiles(client, board_id: str, data: bytes | str, expected_version: int,
+                                changed: dict[str, bytes], removed: list[str], replace: bool = False, ttl: int = 0):
+    ''' Like queue_compare_and_set(), also setting the changed tiles and
+        deleting the removed ones. With replace, every existing tile is
+        deleted first, for boards whose stored tiles are unknown.
+    '''
+    args = [str(expected_version), data, ttl, "1" if replace else "0", len(removed), *removed]
+    for name, value in changed.items():
+        args.extend((name, value))
+    return client.eval(_COMPARE_AND_SET_TILES, 3, board_id, version_key(board_id), tiles_key(board_id), *args)
+
+
+async def save_checkpoints(client, board_id: str, checkpoints: list[tuple[int, bytes | str]], retention: int,
+                           ttl: int = 0) -> int:
+    ''' Store (generation, data) snapshots, expiring in ttl seconds if it's
+        set, and evict old ones beyond the retention limit. Returns the
+        number of checkpoints evicted.
+    '''
+    if not checkpoints:
+        return 0
+    return int(await queue_save_checkpoints(client, board_id, checkpoints, retention, ttl))
+
+
+def queue_save_checkpoints(client, board_id: str, checkpoints: list[tuple[int, bytes | str]], retention: int,
+                           ttl: int = 0):
+    ''' Issue the checkpoint save command, or queue it on a pipeline. '''
+    args = [retention, ttl]
+    for generation, data in checkpoints:
+        args.extend((generation, checkpoint_key(board_id, generation), data))
+    return client.eval(_SAVE_CHECKPOINTS, 1, checkpoints_key(board_id), *args)
+
+
+async def load_checkpoint(client, board_id: str, generation: int) -> bytes | str | None:
+    ''' Fetch the latest checkpoint at or before the given generation. '''
+    keys = await client.zrevrangebyscore(checkpoints_key(board_id), generation, "-inf", start=0, num=1)
+    if not keys:
+        return None
+    return compression.decompress(await client.get(keys[0]))
+
+
+async def touch(client, board_ids: list[str], ttl: int):
+    ''' Expire boards, and everything stored for them, ttl seconds from now. '''
+    pipe = client.pipeline(transaction=False)
+    for board_id in board_ids:
+        queue_touch(pipe, board_id, ttl)
+    await pipe.execute()
+
+
+def queue_touch(client, board_id: str, ttl: int):
+    return client.eval(_TOUCH, 4, board_id, version_key(board_id), tiles_key(board_id), checkpoints_key(board_id), ttl)
@@ -0,0 +1,103 @@
+#!/usr/local/bin/python3
+
+''' Splitting boards into fixed-size square tiles, so large boards can be
+    stored, updated and read back a piece at a time.
+
+    Tile (tx, ty) covers cells tx * SIZE <= x < (tx + 1) * SIZE and likewise
+    for y, and is named "tx,ty". A tile's value is either a SIZE x SIZE
+    bitmap (BITMAP_BYTES long) or, when that is shorter, its live cells as
+    little-endian uint16 offsets x * SIZE + y within the tile. Empty tiles
+    are not stored at all.
+'''
+
+import itertools
+import numpy as np
+
+SHIFT = 6
+SIZE = 1 << SHIFT
+BITMAP_BYTES = SIZE * SIZE // 8
+# tiles with fewer live cells than this are stored as offsets
+_SPARSE_LIMIT = BITMAP_BYTES // 2
+
+
+def to_array(coordinates) -> np.ndarray:
+    ''' Convert an iterable of (x, y) cells to an (n, 2) int64 array. '''
+    if isinstance(coordinates, np.ndarray):
+        return coordinates.reshape(-1, 2).astype(np.int64, copy=False)
+    return np.fromiter(itertools.chain.from_iterable(coordinates), dtype=np.int64,
+                       count=len(coordinates) * 2).reshape(-1, 2)
+
+
+def split(coordinates) -> dict[str, bytes]:
+    ''' Encode cells as a dict of tile name to tile value. '''
+    cells = to_array(coordinates)
+    if not len(cells):
+        return {}
+
+    # arithmetic shifts floor, so negative coordinates land in negative tiles
+    tile_x = cells[:, 0] >> SHIFT
+    tile_y = cells[:, 1] >> SHIFT
+    offsets = (cells[:, 0] & (SIZE - 1)) * SIZE + (cells[:, 1] & (SIZE - 1))
+    order = np.lexsort((offsets, tile_y, tile_x))
+    tile_x = tile_x[order]
+    tile_y = tile_y[order]
+    offsets = offsets[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(tile_x) != 0) | (np.diff(tile_y) != 0)])
+    ends = np.r_[starts[1:], len(cells)]
+
+    sparse = offsets.astype("<u2").tobytes()
+    tiles = {}
+    for tx, ty, start, end in zip(tile_x[starts].tolist(), tile_y[starts].tolist(), starts.tolist(), ends.tolist()):
+        count = end - start
+        if count < _SPARSE_LIMIT:
+            tiles[f"{tx},{ty}"] = sparse[start * 2:end * 2]
+        else:
+            bits = np.zeros(SIZE * SIZE, dtype=np.uint8)
+            bits[offsets[start:end]] = 1
+            tiles[f"{tx},{ty}"] = np.packbits(bits).tobytes()
+    return tiles
+
+
+def merge(tiles: dict) -> np.ndarray:
+    ''' Decode a dict of tile name to tile value (names and values as str
+        or bytes) into an (n, 2) int64 array of cells.
+    '''
+    parts = []
+    for name, value in tiles.items():
+        if isinstance(name, bytes):
+            name = name.decode()
+        tx, ty = (int(part) for part in name.split(","))
+        if len(value) == BITMAP_BYTES:
+            offsets = np.flatnonzero(np.unpackbits(np.frombuffer(value, dtype=np.uint8)))
+        else:
+            offsets = np.frombuffer(value, dtype="<u2").astype(np.int64)
+        part = np.empty((len(offsets), 2), dtype=np.int64)
+        part[:, 0] = (tx << SHIFT) + (offsets >> SHIFT)
+        part[:, 1] = (ty << SHIFT) + (offsets & (SIZE - 1))
+        parts.append(part)
+    if not parts:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(parts)
+
+
+def diff(previous: dict[str, bytes], current: dict[str, bytes]) -> tuple[dict[str, bytes], list[str]]:
+    ''' Return the tiles that were added or changed, and the names of the
+        tiles that were removed, going from previous to current.
+    '''
+    changed = {name: value for name, value in current.items() if previous.get(name) != value}
+    removed = [name for name in previous if name not in current]
+    return changed, removed
+
+
+def names(x: int, y: int, width: int, height: int) -> list[str]:
+    ''' Names of the tiles overlapping a width x height rectangle at (x, y). '''
+    return [f"{tx},{ty}"
+            for tx in range(x >> SHIFT, ((x + width - 1) >> SHIFT) + 1)
+            for ty in range(y >> SHIFT, ((y + height - 1) >> SHIFT) + 1)]
+
+
+def crop(cells: np.ndarray, x: int, y: int, width: int, height: int) -> np.ndarray:
+    ''' Keep only the cells inside a width x height rectangle at (x, y). '''
+    inside = ((cells[:, 0] >= x) & (cells[:, 0] < x + width)
+              & (cells[:, 1] >= y) & (cells[:, 1] < y + height))
+    return cells[inside]
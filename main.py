@@ -1,26 +1,194 @@
 #!/usr/local/bin/python3
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+import contextvars
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
+import functools
+import itertools
+import json
+import logging
+import time
 import uuid
 import os
+import numpy as np
 # valkey may or may not be appropriate for this use case, depending
 # on expected load, data size, persistence requirements, etc.
-import valkey
-import json
+import valkey.asyncio as valkey
 from lib.board import Board
-from lib.models import BoardId, BoardState
+from lib import codec, jobs, metrics, rle, settings, storage, tiles
+from lib.board_cache import BoardCache
+from lib.board_store import STAGE_SECONDS as _STAGE_SECONDS, BoardNotFound, QuotaExceeded
+from lib.evolution_cache import EvolutionCache
+from lib.executor import BoardExecutor, ExecutorBusy
+from lib.profiler import SamplingProfiler
+from lib.singleflight import SingleFlight
+from lib.models import BatchResults, BoardBatch, BoardId, BoardState, BoardStatus, IterateBatch, JobId, JobRequest, JobStatus
+# storage and simulation settings shared with worker.py
+from lib.settings import BOARD_ENGINE, BOARD_PARALLEL_WORKERS, CHECKPOINT_INTERVAL, MAX_WRITE_ATTEMPTS, board_store
 
 ## this is entirely arbitrary, would need to reconfigure based on requirements
-MAX_ALLOWED_ITERATIONS = 1000
-
-app = FastAPI()
-# allow overriding via environment so the app works from docker-compose
-# in production we would also use a password pulled from e.g. secrets manager
-valkey_host = os.getenv("VALKEY_HOST", "localhost")
-valkey_port = int(os.getenv("VALKEY_PORT", "6379"))
-pool = valkey.ConnectionPool(host=valkey_host, port=valkey_port, db=0)
+## with BOARD_ENGINE=hashlife the cap can safely be raised by orders of magnitude
+MAX_ALLOWED_ITERATIONS = int(os.getenv("MAX_ALLOWED_ITERATIONS", "1000"))
+# largest width * height accepted by /boards/{id}/region
+MAX_REGION_AREA = int(os.getenv("MAX_REGION_AREA", str(1 << 20)))
+# board responses use this media type and the lib.codec binary format,
+# instead of JSON, when the request's Accept header includes it
+BOARD_MEDIA_TYPE = "application/x-gol-board"
+# responses of at least RESPONSE_GZIP_MIN_SIZE bytes are gzipped for clients
+# that accept it (0, the default, disables compression)
+RESPONSE_GZIP_MIN_SIZE = int(os.getenv("RESPONSE_GZIP_MIN_SIZE", "0"))
+# media types for /boards/import and /boards/{id}/export pattern formats
+PATTERN_FORMATS = {"rle": "text/plain; charset=utf-8", "packed": BOARD_MEDIA_TYPE}
+# most live cells accepted by /boards/import
+MAX_UPLOAD_CELLS = int(os.getenv("MAX_UPLOAD_CELLS", "10000000"))
+# exports are streamed in chunks of about this many bytes
+EXPORT_CHUNK_SIZE = 1 << 16
+# media types for /stream output formats
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+# results of running the same pattern (anywhere on the board) for the same
+# number of iterations are shared between boards on this worker.
+# EVOLUTION_CACHE_SIZE=0 disables the cache
+evolution_cache = EvolutionCache(
+    max_entries=int(os.getenv("EVOLUTION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("EVOLUTION_CACHE_TTL", "3600")),
+    max_cells=int(os.getenv("EVOLUTION_CACHE_MAX_CELLS", "10000")),
+)
+# optionally keep recently used boards in memory, so repeated requests for a
+# board skip fetching and decoding it as long as no other worker changed it.
+# BOARD_CACHE_SIZE=0 (the default) disables it
+board_cache = BoardCache(
+    max_boards=int(os.getenv("BOARD_CACHE_SIZE", "0")),
+    max_cells=int(os.getenv("BOARD_CACHE_MAX_CELLS", "5000000")),
+)
+# most boards or board ids accepted by one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+# jobs (POST /boards/{id}/jobs) run in worker.py processes rather than the
+# request, so they may run up to MAX_JOB_ITERATIONS iterations
+MAX_JOB_ITERATIONS = int(os.getenv("MAX_JOB_ITERATIONS", "1000000"))
+# longest GET /jobs/{id}?wait= long poll, and how often it checks on the job
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.1"))
+# "process" runs simulations in a pool of BOARD_EXECUTOR_WORKERS processes
+# (default one per core) instead of on the event loop. once
+# BOARD_EXECUTOR_MAX_PENDING simulations are queued, requests get a 503.
+executor = BoardExecutor(
+    mode=os.getenv("BOARD_EXECUTOR", "inline"),
+    workers=int(os.getenv("BOARD_EXECUTOR_WORKERS", "0")) or None,
+    max_pending=int(os.environ["BOARD_EXECUTOR_MAX_PENDING"]) if "BOARD_EXECUTOR_MAX_PENDING" in os.environ else None,
+)
+
+# one pool per process, see lib.settings for its configuration
+pool = settings.connection_pool()
 v = valkey.Valkey(connection_pool=pool)
 
+# requests taking at least PROFILE_SLOW_REQUESTS seconds are logged with the
+# stacks a sampling profiler saw while they ran (0, the default, disables it)
+PROFILE_SLOW_REQUESTS = float(os.getenv("PROFILE_SLOW_REQUESTS", "0"))
+profiler = SamplingProfiler(interval=float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005")))
+logger = logging.getLogger(__name__)
+
+# served in the Prometheus text format on /metrics
+_REQUEST_SECONDS = metrics.histogram(
+    "gol_request_duration_seconds", "Request duration", ("method", "route", "status"))
+_GENERATIONS = metrics.counter(
+    "gol_generations_total", "Generations advanced for requests, computed or served from the evolution cache", ("source",))
+_POPULATION = metrics.histogram(
+    "gol_board_population", "Live cells of simulated boards", buckets=tuple(4 ** i for i in range(13)))
+_BOUNDING_BOX = metrics.histogram(
+    "gol_board_bounding_box_cells", "Bounding box area of simulated boards", buckets=tuple(16 ** i for i in range(10)))
+
+
+def _pool_connections() -> dict:
+    # the pool doesn't expose these publicly, so leave the gauge empty if
+    # another valkey version names them differently
+    try:
+        return {
+            ("in_use",): len(pool._in_use_connections),
+            ("available",): len(pool._available_connections),
+        }
+    except (AttributeError, TypeError):
+        return {}
+
+
+metrics.gauge("gol_valkey_pool_connections", "Valkey connections by state", ("state",), callback=_pool_connections)
+metrics.gauge("gol_valkey_pool_max_connections", "Valkey connection pool size", callback=lambda: pool.max_connections)
+metrics.gauge("gol_executor_pending", "Simulations queued or running in the executor", callback=lambda: executor.pending)
+metrics.gauge("gol_single_flight_in_flight", "Distinct board computations in flight", callback=lambda: single_flight.pending)
+metrics.counter("gol_evolution_cache_requests_total", "Evolution cache lookups", ("result",), callback=lambda: {
+    ("hit",): evolution_cache.hits,
+    ("miss",): evolution_cache.misses,
+})
+metrics.gauge("gol_board_cache_cells", "Live cells held in the board cache", callback=lambda: board_cache.cells)
+
+# set when an endpoint function returns, so the time FastAPI then spends
+# validating and serializing the response can be measured
+_endpoint_finished = contextvars.ContextVar("endpoint_finished", default=None)
+
+
+class _TimedRoute(APIRoute):
+    ''' Route that records request durations and response serialization
+        time, and reports slow requests when the profiler is running.
+    '''
+    def __init__(self, path: str, endpoint, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _endpoint_finished.set(time.perf_counter())
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request: Request) -> Response:
+            _endpoint_finished.set(None)
+            status = 500
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as he:
+                status = he.status_code
+                raise
+            finally:
+                end = time.perf_counter()
+                finished = _endpoint_finished.get()
+                if finished is not None and status < 400:
+                    _STAGE_SECONDS.observe(end - finished, stage="response")
+                _REQUEST_SECONDS.observe(end - start, method=request.method, route=route, status=status)
+                if profiler.running and end - start >= PROFILE_SLOW_REQUESTS:
+                    logger.warning("Slow request %s %s took %.3fs, most sampled stacks:\n%s",
+                                   request.method, request.url.path, end - start, profiler.report(start, end))
+
+        return timed_handler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PROFILE_SLOW_REQUESTS:
+        profiler.start()
+    yield
+    profiler.stop()
+    executor.shutdown()
+    await v.aclose()
+    await pool.disconnect()
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = _TimedRoute
+if RESPONSE_GZIP_MIN_SIZE:
+    app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MIN_SIZE)
+# identical concurrent requests for a board on this worker share one computation
+single_flight = SingleFlight()
+
 @app.post("/boards/", response_model=BoardId)
 async def create_board(input_board: BoardState) -> dict:
     ''' Create a new board and store it.
@@ -33,48 +201,429 @@ async def create_board(input_board: BoardState) -> dict:
 
     try:
         board = Board(coordinates=input_board.coordinates)
+        board.check_bounds()
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
 
-    # use uuid for a unique board id
-    # we could use e.g. a hash of the board, but this would cause issues with
-    # how we're storing boards right now (id -> current state), meaning duplicate 
-    # initial boards would overwrite each other, and would also make get_next_state
-    # impossible (you wouldn't know which "next" state to return)
-    board_id = str(uuid.uuid4())
- 
-    # store serialized sparse board in valkey
-    v.set(board_id, board.to_string())
-    return {"board_id": board_id}
+    return {"board_id": await _store_new_board(board)}
+
+
+@app.post("/boards/import", response_model=BoardId)
+async def import_board(request: Request, pattern_format: str = Query("rle", alias="format")) -> dict:
+    ''' Create a board from a pattern in the request body, either RLE text
+        or the packed binary format. The body is parsed as it arrives, so
+        the whole upload is never held in memory as text or JSON.
+        Returns the unique board ID.
+    '''
+    _validate_pattern_format(pattern_format)
+
+    try:
+        if pattern_format == "rle":
+            parser = rle.RleParser(max_cells=MAX_UPLOAD_CELLS)
+            async for chunk in request.stream():
+                parser.feed(chunk)
+            cells = parser.close()
+        else:
+            decoder = codec.Decoder(max_cells=MAX_UPLOAD_CELLS)
+            async for chunk in request.stream():
+                decoder.feed(chunk)
+            # only the cells are imported, the board starts again from generation 0
+            cells = codec.to_set(decoder.close()[0])
+        board = Board.from_cells(cells)
+        board.check_bounds()
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+
+    return {"board_id": await _store_new_board(board)}
+
+
+@app.post("/boards/batch", response_model=BatchResults)
+async def create_boards(batch: BoardBatch) -> dict:
+    ''' Create many boards in one request, stored in a single pipelined round trip.
+        Returns a result per board, in request order, holding either its
+        board_id or an error.
+    '''
+    _validate_batch_size(len(batch.boards))
+
+    results = []
+    stored = {}
+    pipe = v.pipeline(transaction=False)
+    for input_board in batch.boards:
+        board_id = str(uuid.uuid4())
+        try:
+            board = Board(coordinates=input_board.coordinates)
+            board.check_bounds()
+            board_store.check_cells(board)
+            board_data = board_store.serialize(board)
+            if board_store.storage_format == "tiled":
+                board_store.queue_write(pipe, board_id, board, 0, None)
+            else:
+                board_store.check_bytes(len(board_data))
+        except ValueError as ve:
+            # including QuotaExceeded
+            results.append({"error": str(ve)})
+            continue
+        stored[board_id] = board_data
+        results.append({"board_id": board_id})
 
+    if stored:
+        if board_store.storage_format != "tiled" and board_store.ttl:
+            # MSET can't set a TTL
+            for board_id, board_data in stored.items():
+                pipe.set(board_id, board_data, ex=board_store.ttl)
+        elif board_store.storage_format != "tiled":
+            pipe.mset(stored)
+        if CHECKPOINT_INTERVAL:
+            for board_id, board_data in stored.items():
+                board_store.queue_save_checkpoints(pipe, board_id, [(0, board_data)])
+        with _STAGE_SECONDS.time(stage="valkey_write"):
+            await pipe.execute()
 
-@app.get("/boards/{board_id}/next", response_model=BoardState)
+    return {"results": results}
+
+
+@app.post("/boards/batch/iterate", response_model=BatchResults)
+async def iterate_boards(batch: IterateBatch) -> Response:
+    ''' Advance many boards by num_iters iterations in one request.
+        Boards are fetched with one MGET, simulated in one pass and written
+        back in one pipelined round trip. A board that can't be advanced
+        (not found, modified concurrently, overloaded) gets an error in its
+        result; the others are unaffected.
+    '''
+    _validate_batch_size(len(batch.board_ids))
+    _validate_num_iters(batch.num_iters)
+
+    loaded = await board_store.load_many(v, batch.board_ids)
+
+    # submitting every board at once would overflow the executor's queue and
+    # fail most of a large batch, so only take the slots that are free now
+    # (at least one, so a busy executor still fails the board like any request)
+    slots = asyncio.Semaphore(max(executor.free, 1))
+
+    async def advance(board_data, stored_tiles) -> Board:
+        if board_data is None:
+            raise HTTPException(status_code=400, detail="Board not found")
+        board = _build_board(board_store.decode(board_data, stored_tiles))
+        if batch.num_iters == 0:
+            return board
+        async with slots:
+            return await _simulate(board, batch.num_iters, exception_on_incomplete=False,
+                                   checkpoint_interval=CHECKPOINT_INTERVAL or None)
+
+    outcomes = await asyncio.gather(*(advance(data, stored_tiles) for data, _, stored_tiles in loaded),
+                                    return_exceptions=True)
+
+    results = []
+    # (index into results, index of the compare-and-set reply) per write
+    writes = []
+    queued = 0
+    pipe = v.pipeline(transaction=False)
+    for board_id, (_, version, stored_tiles), outcome in zip(batch.board_ids, loaded, outcomes):
+        if isinstance(outcome, HTTPException):
+            results.append({"board_id": board_id, "error": outcome.detail})
+            continue
+        if isinstance(outcome, ValueError):
+            # e.g. a stored board that can't be decoded
+            results.append({"board_id": board_id, "error": str(outcome)})
+            continue
+        if isinstance(outcome, Exception):
+            logger.error("Advancing board %s failed", board_id, exc_info=outcome)
+            results.append({"board_id": board_id, "error": "Internal error"})
+            continue
+        if isinstance(outcome, BaseException):
+            # cancelled
+            raise outcome
+
+        results.append({"board_id": board_id, "board": outcome.to_dict()})
+        if not batch.num_iters:
+            continue
+
+        try:
+            board_store.queue_write(pipe, board_id, outcome, version, stored_tiles)
+        except QuotaExceeded as qe:
+            results[-1] = {"board_id": board_id, "error": str(qe)}
+            continue
+        writes.append((len(results) - 1, queued))
+        queued += 1
+        if outcome.checkpoints:
+            # a generation's state doesn't depend on who computed it, so
+            # checkpoints are safe to store even if the write loses a race
+            board_store.queue_save_checkpoints(pipe, board_id, outcome.checkpoints)
+            queued += 1
+
+    if writes:
+        with _STAGE_SECONDS.time(stage="valkey_write"):
+            replies = await pipe.execute()
+        for result_index, reply_index in writes:
+            if not replies[reply_index]:
+                results[result_index] = {
+                    "board_id": results[result_index]["board_id"],
+                    "error": "Board is being modified concurrently, please retry"
+                }
+
+    with _STAGE_SECONDS.time(stage="encode"):
+        body = json.dumps({"results": [{
+            "board_id": result["board_id"],
+            "board": _board_json(result["board"]) if "board" in result else None,
+            "error": result.get("error"),
+        } for result in results]}, separators=(",", ":"))
+    return Response(body, media_type="application/json")
+
+
+@app.get("/boards/{board_id}/next", response_model=BoardStatus)
 # @app.get("/boards/{board_id}/next")
-async def get_next_state(board_id: str) -> dict:
+async def get_next_state(board_id: str, request: Request) -> Response:
     ''' Get the next state for the given board ID.
         Returns the board state after one iteration.
     '''
-    return await _run_board_iterations(board_id, 1)
+    return _board_response(await _run_board_iterations(board_id, 1), request)
 
 
-@app.get("/boards/{board_id}/iterate/{num_iters}", response_model=BoardState)
-async def get_state(board_id: str, num_iters: int) -> dict:
+@app.get("/boards/{board_id}/iterate/{num_iters}", response_model=BoardStatus)
+async def get_state(board_id: str, num_iters: int, request: Request) -> Response:
     ''' Get the board state after num_iters iterations.
         If exception_on_incomplete is True, raises an error if the board
         does not reach a final state within the requested iterations.
     '''    
-    return await _run_board_iterations(board_id, num_iters)
+    return _board_response(await _run_board_iterations(board_id, num_iters), request)
 
 
-@app.get("/boards/{board_id}/final/{max_iterations}", response_model=BoardState)
-async def get_final_state(board_id: str, max_iterations: int) -> dict:
+@app.get("/boards/{board_id}/final/{max_iterations}", response_model=BoardStatus)
+async def get_final_state(board_id: str, max_iterations: int, request: Request) -> Response:
     ''' Get the final state for the given board ID.
+        Oscillators and spaceships count as final once their cycle is detected.
         If the board does not reach a final state within MAX_ALLOWED_ITERATIONS,
         raises an error.
     '''
     # it's not clear from specs whether the limit is client-provided or server-defined
     # assume user defined but sanity check (in _run_board_iterations) to prevent impossible requests
-    return await _run_board_iterations(board_id, max_iterations, exception_on_incomplete=True)
+    return _board_response(await _run_board_iterations(board_id, max_iterations, exception_on_incomplete=True), request)
+
+
+@app.get("/boards/{board_id}/generations/{generation}", response_model=BoardStatus)
+async def get_generation(board_id: str, generation: int, request: Request) -> Response:
+    ''' Get the board state at a given generation without changing the stored board.
+        Starts from the nearest earlier checkpoint (or the current state) and
+        only computes the remaining generations.
+    '''
+    if generation < 0:
+        raise HTTPException(status_code=400, detail="generation must be non-negative")
+
+    board_dict, _, _ = await _retrieve_board(board_id)
+    board_dict = board_dict if board_dict.get("generation", 0) <= generation else None
+
+    with _STAGE_SECONDS.time(stage="valkey_read"):
+        checkpoint = await storage.load_checkpoint(v, board_id, generation)
+    if checkpoint is not None:
+        checkpoint_dict = board_store.decode(checkpoint)
+        if board_dict is None or checkpoint_dict["generation"] > board_dict.get("generation", 0):
+            board_dict = checkpoint_dict
+
+    if board_dict is None:
+        raise HTTPException(status_code=400, detail="Generation is no longer available")
+
+    board = _build_board(board_dict)
+    remaining = generation - board.generation
+    if remaining > MAX_ALLOWED_ITERATIONS:
+        raise HTTPException(status_code=400, detail=f"Generation is more than {MAX_ALLOWED_ITERATIONS} iterations from the nearest checkpoint")
+
+    board = await _simulate(board, remaining, exception_on_incomplete=False)
+    return _board_response(board.to_dict(), request)
+
+
+@app.post("/boards/{board_id}/jobs", response_model=JobId, status_code=202)
+async def create_job(board_id: str, job: JobRequest) -> dict:
+    ''' Queue a job to advance the board like /iterate/{iterations} or
+        /final/{iterations}, but without holding the request open while it
+        runs. Jobs are run by worker.py processes and may run up to
+        MAX_JOB_ITERATIONS iterations.
+        Returns the job ID, to follow the job with GET /jobs/{job_id}.
+    '''
+    if job.iterations < 0:
+        raise HTTPException(status_code=400, detail="iterations must be non-negative")
+
+    if job.iterations > MAX_JOB_ITERATIONS:
+        raise HTTPException(status_code=400, detail=f"iterations exceeds limit of {MAX_JOB_ITERATIONS}")
+
+    with _STAGE_SECONDS.time(stage="valkey_read"):
+        exists = await v.exists(board_id)
+    if not exists:
+        raise HTTPException(status_code=400, detail="Board not found")
+
+    job_id = str(uuid.uuid4())
+    with _STAGE_SECONDS.time(stage="valkey_write"):
+        await jobs.submit(v, job_id, board_id, job.kind, job.iterations)
+    return {"job_id": job_id}
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, wait: float = 0) -> Response:
+    ''' Get a job's status and progress, and the resulting board once it's done.
+        With wait, long polls: responds as soon as the job is done or
+        failed, or after wait seconds (at most JOB_MAX_WAIT) regardless.
+    '''
+    if wait < 0:
+        raise HTTPException(status_code=400, detail="wait must be non-negative")
+
+    deadline = time.monotonic() + min(wait, JOB_MAX_WAIT)
+    while True:
+        with _STAGE_SECONDS.time(stage="valkey_read"):
+            job = await jobs.load(v, job_id)
+        if job is None:
+            raise HTTPException(status_code=400, detail="Job not found")
+        if job["status"] in jobs.FINISHED or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    board = None
+    if job["status"] == jobs.DONE:
+        with _STAGE_SECONDS.time(stage="valkey_read"):
+            result = await jobs.load_state(v, job_id)
+        if result is not None:
+            board = _board_json(board_store.decode(result))
+
+    with _STAGE_SECONDS.time(stage="encode"):
+        body = json.dumps({
+            "job_id": job_id,
+            "board_id": job["board_id"],
+            "kind": job["kind"],
+            "iterations": int(job["iterations"]),
+            "status": job["status"],
+            "generation": int(job["generation"]) if "generation" in job else None,
+            "target_generation": int(job["target_generation"]) if "target_generation" in job else None,
+            "error": job.get("error"),
+            "board": board,
+        }, separators=(",", ":"))
+    return Response(body, media_type="application/json")
+
+
+@app.get("/boards/{board_id}/export")
+async def export_board(board_id: str, pattern_format: str = Query("rle", alias="format")) -> StreamingResponse:
+    ''' Stream the board's current state as RLE text or in the packed binary
+        format, without changing it.
+    '''
+    _validate_pattern_format(pattern_format)
+
+    board_data, _, stored_tiles = await board_store.load(v, board_id)
+    if board_data is None:
+        raise HTTPException(status_code=400, detail="Board not found")
+
+    if stored_tiles is not None or not codec.is_binary(board_data):
+        board_dict = board_store.decode(board_data, stored_tiles)
+        board_data = codec.encode(board_dict["coordinates"], board_dict.get("is_finished", False), board_dict.get("period"),
+                                  board_dict.get("displacement"), board_dict.get("generation", 0))
+
+    if pattern_format == "packed":
+        chunks = (board_data[i:i + EXPORT_CHUNK_SIZE] for i in range(0, len(board_data), EXPORT_CHUNK_SIZE))
+    else:
+        cells, fields = codec.decode_array(board_data)
+        chunks = _join_lines(rle.export(cells, comment=f"generation {fields['generation']}"), EXPORT_CHUNK_SIZE)
+    return StreamingResponse(chunks, media_type=PATTERN_FORMATS[pattern_format])
+
+
+@app.get("/boards/{board_id}/region")
+async def get_region(board_id: str, x: int, y: int, width: int, height: int, dense: bool = False) -> Response:
+    ''' Get the live cells of the board's current state inside the width x
+        height rectangle at (x, y), without changing it. For tiled boards
+        only the tiles overlapping the rectangle are read.
+        With dense, cells are returned as a grid of 0/1 rows instead, where
+        grid[i][j] is the cell (x + i, y + j).
+    '''
+    if width <= 0 or height <= 0:
+        raise HTTPException(status_code=400, detail="width and height must be positive")
+
+    if width * height > MAX_REGION_AREA:
+        raise HTTPException(status_code=400, detail=f"region area exceeds limit of {MAX_REGION_AREA}")
+
+    with _STAGE_SECONDS.time(stage="valkey_read"):
+        (board_data, region_tiles), _ = await asyncio.gather(
+            storage.load_region(v, board_id, tiles.names(x, y, width, height)), board_store.touch(v, [board_id]))
+    if board_data is None:
+        raise HTTPException(status_code=400, detail="Board not found")
+
+    with _STAGE_SECONDS.time(stage="decode"):
+        if codec.is_tiled(board_data):
+            fields = codec.decode_header(board_data)
+            cells = tiles.merge(region_tiles)
+        elif codec.is_binary(board_data):
+            cells, fields = codec.decode_array(board_data)
+        else:
+            # the region is only a small part of a board stored whole
+            fields = codec.decode(board_data)
+            cells = tiles.to_array(fields["coordinates"])
+        cells = tiles.crop(cells, x, y, width, height)
+
+    with _STAGE_SECONDS.time(stage="encode"):
+        region = {
+            "x": x, "y": y, "width": width, "height": height,
+            "generation": fields.get("generation", 0),
+            "is_finished": fields.get("is_finished", False),
+        }
+        if dense:
+            grid = np.zeros((width, height), dtype=np.uint8)
+            grid[cells[:, 0] - x, cells[:, 1] - y] = 1
+            region["grid"] = grid.tolist()
+        else:
+            region["coordinates"] = cells.tolist()
+        return Response(json.dumps(region, separators=(",", ":")), media_type="application/json")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    ''' Serve this worker's metrics in the Prometheus text format. '''
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/boards/{board_id}/stream")
+async def stream_generations(board_id: str, limit: int = MAX_ALLOWED_ITERATIONS, deltas: bool = False,
+                             interval: float = 0, stream_format: str = Query("ndjson", alias="format")):
+    ''' Stream the current state followed by up to limit successive generations,
+        one JSON frame per generation, without changing the stored board.
+        With deltas, frames after the first only list the cells born and died.
+        interval adds a minimum delay in seconds between frames; otherwise
+        frames are produced as fast as the client reads them.
+    '''
+    if limit < 0:
+        raise HTTPException(status_code=400, detail="limit must be non-negative")
+
+    if limit > MAX_ALLOWED_ITERATIONS:
+        raise HTTPException(status_code=400, detail=f"limit exceeds limit of {MAX_ALLOWED_ITERATIONS}")
+
+    if interval < 0:
+        raise HTTPException(status_code=400, detail="interval must be non-negative")
+
+    if stream_format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+
+    board_dict, _, _ = await _retrieve_board(board_id)
+    board = _build_board(board_dict)
+
+    frames = itertools.chain([board.to_dict()], itertools.islice(board.generations(deltas=deltas), limit))
+    return StreamingResponse(_encode_frames(frames, stream_format, interval), media_type=STREAM_FORMATS[stream_format])
+
+
+async def _encode_frames(frames, stream_format: str, interval: float):
+    ''' Serialize frames from Board.generations for streaming.
+        Each frame is computed only when the previous one has been sent, so
+        a slow client throttles the simulation rather than buffering it.
+        Frames are computed and serialized through the executor, so in
+        process mode they're off the event loop.
+    '''
+    while (line := await executor.call(_encode_frame, frames, stream_format)) is not None:
+        yield line
+        # also hands control back to the event loop between frames
+        await asyncio.sleep(interval)
+
+
+def _encode_frame(frames, stream_format: str) -> str | None:
+    ''' Compute and serialize the next frame, or return None after the last one. '''
+    frame = next(frames, None)
+    if frame is None:
+        return None
+    line = json.dumps({key: list(value) if isinstance(value, set) else value for key, value in frame.items()})
+    if stream_format == "sse":
+        return f"data: {line}\n\n"
+    return line + "\n"
 
 
 async def _run_board_iterations(board_id: str, num_iters: int, exception_on_incomplete: bool = False) -> dict:
@@ -83,48 +632,250 @@ async def _run_board_iterations(board_id: str, num_iters: int, exception_on_inco
         does not reach a final state within the requested iterations.
     '''
 
-    if num_iters < 0:
-        raise HTTPException(status_code=400, detail="num_iters must be non-negative")
+    _validate_num_iters(num_iters)
 
-    if num_iters > MAX_ALLOWED_ITERATIONS:
-        raise HTTPException(status_code=400, detail=f"num_iters exceeds limit of {MAX_ALLOWED_ITERATIONS}")
+    # clients polling the same board at the same time all get the result of
+    # one computation, rather than each advancing the board in turn
+    return await single_flight.do(
+        (board_id, num_iters, exception_on_incomplete),
+        lambda: _advance_board(board_id, num_iters, exception_on_incomplete),
+    )
 
-    # retrieve current board state
-    board_dict = await _retrieve_board(board_id)
-    if board_dict is None:
-        raise HTTPException(status_code=400, detail="Board not found")
 
-    board = Board(**board_dict, max_iterations=MAX_ALLOWED_ITERATIONS)
-    if num_iters == 0:
-        return board.to_dict()
+async def _advance_board(board_id: str, num_iters: int, exception_on_incomplete: bool) -> dict:
+    ''' Read, advance and write back a board.
+        The write only succeeds if nobody else (on any worker) updated the
+        board in the meantime; otherwise the latest state is re-read and
+        the iterations are recomputed on top of it.
+    '''
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        board = None
+        # the stored tiles of a cached board aren't known, so it's rewritten in full
+        stored_tiles = None
+        if board_id in board_cache:
+            with _STAGE_SECONDS.time(stage="valkey_read"):
+                version, _ = await asyncio.gather(storage.load_version(v, board_id), board_store.touch(v, [board_id]))
+            board = board_cache.take(board_id, version)
+
+        if board is None:
+            # retrieve current board state
+            board_dict, version, stored_tiles = await _retrieve_board(board_id)
+            board = _build_board(board_dict)
+
+        if num_iters == 0:
+            board_cache.put(board_id, version, board)
+            return _to_response(board_id, board)
+
+        board = await _simulate(board, num_iters, exception_on_incomplete, checkpoint_interval=CHECKPOINT_INTERVAL or None)
+
+        # it isn't clear if this should overwrite the stored board state or not,
+        # but we'll assume we must or we'd need a different way to handle board ids/get_next_state.
+
+        # if we needed to, we could generate a predictable key (e.g. f"{board_id}:{num_iters}")
+        # which would also allow caching for repeat requests, but this wouldn't likely be useful
+        # unless hashing were used instead of uuids for board ids, and would probably mean a lot of 
+        # wasted storage.
+
+        try:
+            write = board_store.queue_write(v, board_id, board, version, stored_tiles)
+        except QuotaExceeded as qe:
+            raise HTTPException(status_code=400, detail=str(qe))
+        with _STAGE_SECONDS.time(stage="valkey_write"):
+            stored = bool(await write)
+            if stored:
+                await board_store.save_checkpoints(v, board_id, board.checkpoints)
+        if stored:
+            board.checkpoints = []
+            board_cache.put(board_id, version + 1, board)
+            return _to_response(board_id, board)
+
+    raise HTTPException(status_code=409, detail="Board is being modified concurrently, please retry")
+
+
+async def _simulate(board: Board, num_iters: int, exception_on_incomplete: bool,
+                    checkpoint_interval: int | None = None) -> Board:
+    ''' Run the iterations for a request and return the resulting board.
+        If exception_on_incomplete is True, raises an error if the board
+        does not reach a final state within the requested iterations.
+    '''
+    start_generation = board.generation
+    with _STAGE_SECONDS.time(stage="evolution_cache"):
+        cache_key = evolution_cache.key(board, num_iters, exception_on_incomplete)
+        cached = evolution_cache.get(cache_key, board)
+    if cached is not None:
+        board, completed_all_iterations = cached
+        _GENERATIONS.inc(board.generation - start_generation, source="cache")
+        # keep time-travel reads cheap by checkpointing wherever we landed,
+        # unless no checkpoints are retained
+        if checkpoint_interval and board_store.checkpoint_retention and start_generation // checkpoint_interval != board.generation // checkpoint_interval:
+            board.checkpoints.append((board.generation, board.to_bytes()))
+    else:
+        # final state requests stop as soon as the board is known to repeat
+        try:
+            with _STAGE_SECONDS.time(stage="simulate"):
+                board, completed_all_iterations = await executor.run_iterations(
+                    board, num_iters, stop_on_cycle=exception_on_incomplete, checkpoint_interval=checkpoint_interval,
+                    checkpoint_retention=board_store.checkpoint_retention
+                )
+        except ExecutorBusy as eb:
+            raise HTTPException(status_code=503, detail=str(eb), headers={"Retry-After": "1"})
+        _GENERATIONS.inc(board.generation - start_generation, source="computed")
+        evolution_cache.put(cache_key, start_generation, board, completed_all_iterations)
 
-    completed_all_iterations = board.run_iterations(num_iters)
+    population = len(board.to_dict()["coordinates"])
+    _POPULATION.observe(population)
+    if population:
+        min_x, min_y, max_x, max_y = board.bounding_box()
+        _BOUNDING_BOX.observe((max_x - min_x + 1) * (max_y - min_y + 1))
 
     # special handling for final state requests
     if (exception_on_incomplete
         and not board.is_finished 
+        and not board.is_periodic
         and completed_all_iterations):
         raise HTTPException(status_code=400, detail="Board did not reach final state within requested iterations")
 
-    # it isn't clear if this should overwrite the stored board state or not,
-    # but we'll assume we must or we'd need a different way to handle board ids/get_next_state.
+    return board
 
-    # if we needed to, we could generate a predictable key (e.g. f"{board_id}:{num_iters}")
-    # which would also allow caching for repeat requests, but this wouldn't likely be useful
-    # unless hashing were used instead of uuids for board ids, and would probably mean a lot of 
-    # wasted storage.
 
-    v.set(board_id, board.to_string())
-    return board.to_dict()
+async def _retrieve_board(board_id: str) -> tuple[dict, int, dict[str, bytes] | None]:
+    ''' Retrieve and deserialize a board from storage by its ID,
+        along with its stored version and tiles (see BoardStore.retrieve).
+        Raises HTTPException if the board is not found.
+    '''
+    try:
+        return await board_store.retrieve(v, board_id)
+    except BoardNotFound as bnf:
+        raise HTTPException(status_code=400, detail=str(bnf))
 
 
-async def _retrieve_board(board_id: str) -> Board:
-    ''' Retrieve and deserialize a board from storage by its ID.
-        Raises HTTPException if the board is not found.
+async def _store_new_board(board: Board) -> str:
+    ''' Store a newly created board, returning its id. '''
+    # use uuid for a unique board id
+    # we could use e.g. a hash of the board, but this would cause issues with
+    # how we're storing boards right now (id -> current state), meaning duplicate 
+    # initial boards would overwrite each other, and would also make get_next_state
+    # impossible (you wouldn't know which "next" state to return)
+    board_id = str(uuid.uuid4())
+ 
+    # store serialized sparse board in valkey
+    try:
+        board_store.check_cells(board)
+        board_data = board_store.serialize(board)
+        if board_store.storage_format == "tiled":
+            write = board_store.queue_write(v, board_id, board, 0, None)
+        else:
+            board_store.check_bytes(len(board_data))
+            write = v.set(board_id, board_data, ex=board_store.ttl or None)
+    except QuotaExceeded as qe:
+        raise HTTPException(status_code=400, detail=str(qe))
+    with _STAGE_SECONDS.time(stage="valkey_write"):
+        await write
+        if CHECKPOINT_INTERVAL:
+            await board_store.save_checkpoints(v, board_id, [(0, board_data)])
+    return board_id
+
+
+def _join_lines(lines, size: int):
+    ''' Group lines of text into chunks of about size characters, so a
+        stream isn't sent one short line at a time.
     '''
-    board_json = v.get(board_id)
-    if board_json is None:
-        raise HTTPException(status_code=400, detail="Board not found")
-    
-    board_dict = json.loads(board_json)
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _build_board(board_dict: dict) -> Board:
+    ''' Construct a board to simulate from deserialized storage. '''
+    with _STAGE_SECONDS.time(stage="construct"):
+        return Board(**board_dict, max_iterations=MAX_ALLOWED_ITERATIONS, engine=BOARD_ENGINE,
+                     workers=BOARD_PARALLEL_WORKERS)
+
+
+def _to_response(board_id: str, board: Board) -> dict:
+    ''' Convert a board to a response dict.
+        to_dict() shares the board's cell set, so copy it if the board is
+        cached, since a later request may advance it in place.
+    '''
+    board_dict = board.to_dict()
+    if board_id in board_cache:
+        board_dict["coordinates"] = set(board_dict["coordinates"])
     return board_dict
+
+
+def _board_json(board_dict: dict) -> dict:
+    ''' Convert a to_dict() result to the BoardStatus JSON shape. '''
+    return {
+        "coordinates": list(board_dict["coordinates"]),
+        "is_finished": board_dict.get("is_finished", False),
+        "period": board_dict.get("period"),
+        "displacement": board_dict.get("displacement"),
+        "generation": board_dict.get("generation", 0),
+    }
+
+
+def _board_response(board_dict: dict, request: Request) -> Response:
+    ''' Encode a board for the response directly, rather than returning it
+        for FastAPI to validate and rebuild cell by cell through the response
+        model, which costs more than simulating for large boards.
+        Clients that prefer BOARD_MEDIA_TYPE get the lib.codec binary format,
+        everyone else the BoardStatus JSON.
+    '''
+    with _STAGE_SECONDS.time(stage="encode"):
+        if _prefers_binary(request.headers.get("accept", "")):
+            body = codec.encode(board_dict["coordinates"], board_dict.get("is_finished", False), board_dict.get("period"),
+                                board_dict.get("displacement"), board_dict.get("generation", 0))
+            return Response(body, media_type=BOARD_MEDIA_TYPE)
+        return Response(json.dumps(_board_json(board_dict), separators=(",", ":")), media_type="application/json")
+
+
+def _prefers_binary(accept: str) -> bool:
+    ''' True if an Accept header names BOARD_MEDIA_TYPE with a q-value of at
+        least JSON's. Wildcards only count towards JSON, so the binary format
+        has to be asked for explicitly.
+    '''
+    # q-values of the media ranges, by type
+    ranges = {}
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges[media_type.lower()] = q
+
+    binary = ranges.get(BOARD_MEDIA_TYPE, 0.0)
+    # the most specific range that matches JSON decides its q-value
+    json_q = next((ranges[media_type] for media_type in ("application/json", "application/*", "*/*")
+                   if media_type in ranges), 0.0)
+    return binary > 0 and binary >= json_q
+
+
+def _validate_num_iters(num_iters: int):
+    if num_iters < 0:
+        raise HTTPException(status_code=400, detail="num_iters must be non-negative")
+
+    if num_iters > MAX_ALLOWED_ITERATIONS:
+        raise HTTPException(status_code=400, detail=f"num_iters exceeds limit of {MAX_ALLOWED_ITERATIONS}")
+
+
+def _validate_pattern_format(pattern_format: str):
+    if pattern_format not in PATTERN_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PATTERN_FORMATS)}")
+
+
+def _validate_batch_size(size: int):
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"batch size exceeds limit of {MAX_BATCH_SIZE}")
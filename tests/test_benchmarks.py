@@ -0,0 +1,36 @@
+#!/usr/local/bin/python3
+
+import unittest
+from benchmarks import bench_board
+from benchmarks.workloads import FUNCTIONAL, SETTLED, Workload, parse, soup, workloads
+
+class TestBenchmarks(unittest.TestCase):
+    def test_workloads(self):
+        self.assertEqual(parse([".O", "O."]), [(0, 1), (1, 0)])
+        self.assertEqual(soup(16, 0.3, seed=1), soup(16, 0.3, seed=1))
+        self.assertEqual(soup(16, 0, seed=1), [])
+
+        names = [workload.name for workload in workloads()]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(set(FUNCTIONAL) - set(names), set(SETTLED))
+        self.assertTrue(all(workload.generations == 1 for workload in workloads(scale=0)))
+
+    def test_run_and_compare(self):
+        glider = Workload("glider", FUNCTIONAL["glider"], 8)
+        results = bench_board.run([glider], ["sparse", "hashlife"], repeats=1)
+        self.assertEqual([entry["engine"] for entry in results["engines"]], ["sparse", "hashlife"])
+        self.assertEqual(results["engines"][0]["final_population"], 5)
+        self.assertLess(results["serialization"][0]["binary_bytes"], results["serialization"][0]["json_bytes"])
+        self.assertEqual(bench_board.compare(results, results, 0.2), [])
+
+        slower = {**results, "engines": [dict(entry) for entry in results["engines"]]}
+        slower["engines"][1]["generations_per_sec"] /= 2
+        regressions = bench_board.compare(results, slower, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("glider/hashlife generations_per_sec", regressions[0])
+
+        with self.assertRaises(ValueError):
+            bench_board.compare(results, {**results, "scale": 0.5}, 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
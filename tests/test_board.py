@@ -3,6 +3,7 @@
 from contextlib import AbstractContextManager
 from typing import Any
 import unittest
+from unittest.mock import patch
 from lib.board import Board
 
 class TestBoard(unittest.TestCase):
@@ -56,6 +57,14 @@ class TestBoard(unittest.TestCase):
         ]
         self.assertEqual(dense, expected_dense)
     
+    def test_board_to_dense_negative(self):
+        board = Board(coordinates={(-2, -1), (0, 1)})
+        self.assertEqual(board.to_dense(), [
+            [1, 0, 0],
+            [0, 0, 0],
+            [0, 0, 1]
+        ])
+
     def test_board_invalid_iterations(self):
         board = Board(coordinates={(0, 0)})
         with self.assertRaises(ValueError):
@@ -91,6 +100,163 @@ class TestBoard(unittest.TestCase):
         self.assertFalse(board.is_finished)
         self.assertTrue(completed_all_iterations_without_finishing)
 
+    def test_engines_match(self):
+        import random
+        rng = random.Random(7)
+        for _ in range(10):
+            coordinates = {(rng.randint(-10, 10), rng.randint(-10, 10)) for _ in range(150)}
+            results = []
+            for engine in ("sparse", "incremental", "dense", "auto"):
+                board = Board(coordinates=coordinates, engine=engine)
+                completed = board.run_iterations(120)
+                results.append((completed, board.is_finished, board._coords))
+            for result in results[1:]:
+                self.assertEqual(results[0], result)
+
+    def test_incremental_tracks_changes(self):
+        # a block (static) next to a blinker (active)
+        coordinates = {(0, 0), (0, 1), (1, 0), (1, 1), (10, 10), (10, 11), (10, 12)}
+        board = Board(coordinates=coordinates, engine="incremental")
+        board.run_iterations(1)
+        self.assertEqual(board._changed, {(10, 10), (10, 12), (9, 11), (11, 11)})
+        board.run_iterations(1)
+        self.assertEqual(board._coords, coordinates)
+
+        # switching engines invalidates the change set
+        board._run_engine("sparse", 1)
+        self.assertIsNone(board._changed)
+
+    def test_auto_engine_selection(self):
+        self.assertEqual(Board(coordinates={(0, 0), (0, 1), (0, 2)})._select_engine(), "sparse")
+        dense_coords = {(i, j) for i in range(10) for j in range(10)}
+        self.assertEqual(Board(coordinates=dense_coords)._select_engine(), "dense")
+        sparse_coords = {(i * 100, j * 100) for i in range(10) for j in range(10)}
+        self.assertEqual(Board(coordinates=sparse_coords)._select_engine(), "incremental")
+
+    def test_cycle_detection(self):
+        blinker = {(0, 0), (1, 0), (2, 0)}
+        glider = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+        for engine in ("sparse", "incremental", "dense"):
+            board = Board(coordinates=blinker, engine=engine)
+            self.assertFalse(board.run_iterations(100, stop_on_cycle=True))
+            self.assertTrue(board.is_periodic)
+            self.assertFalse(board.is_finished)
+            self.assertEqual((board.period, board.displacement), (2, (0, 0)))
+
+            board = Board(coordinates=glider, engine=engine)
+            self.assertFalse(board.run_iterations(100, stop_on_cycle=True))
+            self.assertEqual((board.period, board.displacement), (4, (1, 1)))
+
+        # once the period is known, later runs skip ahead instead of stepping
+        board = Board(coordinates=glider, period=4, displacement=[1, 1])
+        self.assertTrue(board.run_iterations(1000))
+        self.assertEqual(board._coords, {(x + 250, y + 250) for x, y in glider})
+
+        board = Board(coordinates=glider, max_iterations=1001)
+        self.assertTrue(board.run_iterations(1001))
+        self.assertEqual(board.period, 4)
+        expected = Board(coordinates=glider, max_iterations=1001, engine="hashlife")
+        expected.run_iterations(1001)
+        self.assertEqual(board._coords, expected._coords)
+
+    def test_cycle_hash_collision(self):
+        # every generation hashing the same must not pass for a cycle
+        r_pentomino = {(1, 0), (2, 0), (0, 1), (1, 1), (1, 2)}
+        expected = Board(coordinates=r_pentomino, engine="hashlife")
+        expected.run_iterations(50)
+        with patch("lib.cycles.normalize", return_value=((0,), 0, 0)), patch("lib.board.hash", create=True, return_value=0):
+            for engine in ("sparse", "incremental", "dense"):
+                board = Board(coordinates=r_pentomino, engine=engine)
+                self.assertTrue(board.run_iterations(50, stop_on_cycle=True))
+                self.assertFalse(board.is_periodic)
+                self.assertEqual(board._coords, expected._coords)
+
+    def test_generation_and_checkpoints(self):
+        coordinates = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+        board = Board(coordinates=coordinates)
+        board.run_iterations(10, checkpoint_interval=4)
+        self.assertEqual(board.generation, 10)
+        self.assertEqual([generation for generation, _ in board.checkpoints], [4, 8])
+        board.run_iterations(6, checkpoint_interval=4)
+        self.assertEqual([generation for generation, _ in board.checkpoints], [4, 8, 12, 16])
+
+        # only the snapshots storage will retain are taken, even on long hashlife runs
+        for engine in ("sparse", "hashlife"):
+            with self.subTest(engine=engine):
+                board = Board(coordinates=coordinates, engine=engine, max_iterations=1 << 20)
+                board.run_iterations(1 << 20, checkpoint_interval=64, checkpoint_retention=3)
+                self.assertEqual([generation for generation, _ in board.checkpoints], [(1 << 20) - 128, (1 << 20) - 64, 1 << 20])
+        board = Board(coordinates=coordinates)
+        board.run_iterations(10, checkpoint_interval=4, checkpoint_retention=0)
+        self.assertEqual(board.checkpoints, [])
+
+        # finished boards keep counting, since their state no longer changes
+        board = Board(coordinates={(0, 0), (0, 1), (1, 0), (1, 1)})
+        self.assertFalse(board.run_iterations(10))
+        self.assertEqual(board.generation, 10)
+
+        # stopping on a cycle reports the generation actually reached
+        board = Board(coordinates={(0, 0), (1, 0), (2, 0)})
+        board.run_iterations(100, stop_on_cycle=True)
+        self.assertLess(board.generation, 100)
+
+    def test_generations(self):
+        import itertools
+        board = Board(coordinates={(0, 0), (0, 1), (0, 2)})
+        frames = list(itertools.islice(board.generations(), 2))
+        self.assertEqual([frame["generation"] for frame in frames], [1, 2])
+        self.assertEqual(board.generation, 2)
+
+        frame = next(board.generations(deltas=True))
+        self.assertEqual(frame["born"], {(-1, 1), (1, 1)})
+        self.assertEqual(frame["died"], {(0, 0), (0, 2)})
+
+        # engines that update cells in place report the same deltas
+        r_pentomino = {(1, 0), (2, 0), (0, 1), (1, 1), (1, 2)}
+        expected = list(itertools.islice(Board(coordinates=r_pentomino, engine="sparse").generations(deltas=True), 20))
+        for engine in ("incremental", "dense"):
+            frames = list(itertools.islice(Board(coordinates=r_pentomino, engine=engine).generations(deltas=True), 20))
+            self.assertEqual(frames, expected)
+
+        # finite once the board finishes
+        frames = list(Board(coordinates={(0, 0), (0, 1)}).generations())
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0]["is_finished"])
+
+    def test_hashlife_engine(self):
+        coordinates = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+        sparse = Board(coordinates=coordinates)
+        hashlife = Board(coordinates=coordinates, engine="hashlife")
+        self.assertTrue(sparse.run_iterations(100))
+        self.assertTrue(hashlife.run_iterations(100))
+        self.assertEqual(sparse._coords, hashlife._coords)
+
+        # stable and empty boards are detected once the jump completes
+        block = Board(coordinates={(0, 0), (0, 1), (1, 0), (1, 1)}, engine="hashlife")
+        self.assertFalse(block.run_iterations(10))
+        self.assertTrue(block.is_finished)
+        dies = Board(coordinates={(0, 0)}, engine="hashlife")
+        self.assertFalse(dies.run_iterations(10))
+        self.assertTrue(dies.is_finished)
+
+        # stopping on a cycle steps the start and end of the run to detect it
+        blinker = Board(coordinates={(0, 0), (1, 0), (2, 0)}, engine="hashlife")
+        self.assertFalse(blinker.run_iterations(100, stop_on_cycle=True))
+        self.assertEqual(blinker.period, 2)
+        glider = Board(coordinates=coordinates, engine="hashlife", max_iterations=1 << 20)
+        self.assertFalse(glider.run_iterations(1 << 20, stop_on_cycle=True))
+        self.assertEqual((glider.period, glider.displacement), (4, (1, 1)))
+        # the pi heptomino only settles into blinkers after 173 generations
+        pi = Board(coordinates={(0, 0), (1, 0), (2, 0), (0, 1), (2, 1), (0, 2), (2, 2)}, engine="hashlife")
+        self.assertFalse(pi.run_iterations(1000, stop_on_cycle=True))
+        self.assertEqual(pi.period, 2)
+        expected = Board(coordinates={(0, 0), (1, 0), (2, 0), (0, 1), (2, 1), (0, 2), (2, 2)})
+        expected.run_iterations(pi.generation)
+        self.assertEqual(pi._coords, expected._coords)
+
+        with self.assertRaises(ValueError):
+            Board(coordinates=coordinates, engine="invalid")
+
     def test_to_string_and_from_string(self):
         coordinates = {(0, 0), (1, 1)}
         board = Board(coordinates=coordinates)
@@ -105,5 +271,14 @@ class TestBoard(unittest.TestCase):
         self.assertEqual(loaded_coordinates, coordinates)
         self.assertEqual(loaded_is_finished, board.is_finished)
 
+    def test_from_cells(self):
+        cells = {(0, 0), (0, 1), (0, 2)}
+        board = Board.from_cells(cells, max_iterations=10)
+        self.assertIs(board.to_dict()["coordinates"], cells)
+        self.assertFalse(board.is_finished)
+        self.assertTrue(Board.from_cells(set()).is_finished)
+        board.run_iterations(1)
+        self.assertEqual(board.to_dict()["coordinates"], {(-1, 1), (0, 1), (1, 1)})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+#!/usr/local/bin/python3
+
+import unittest
+from lib.board import Board
+from lib.board_cache import BoardCache
+
+class TestBoardCache(unittest.TestCase):
+    def test_take_matching_version(self):
+        cache = BoardCache()
+        board = Board(coordinates={(0, 0), (0, 1)})
+        cache.put("a", 3, board)
+        self.assertIn("a", cache)
+        self.assertIs(cache.take("a", 3), board)
+        # taking hands ownership to the caller
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.cells, 0)
+
+    def test_stale_version(self):
+        cache = BoardCache()
+        cache.put("a", 3, Board(coordinates={(0, 0)}))
+        self.assertIsNone(cache.take("a", 4))
+        self.assertNotIn("a", cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_eviction_by_count(self):
+        cache = BoardCache(max_boards=2)
+        for board_id in ("a", "b", "c"):
+            cache.put(board_id, 0, Board(coordinates={(0, 0)}))
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("a", cache)
+
+    def test_eviction_by_cells(self):
+        cache = BoardCache(max_cells=25)
+        cache.put("a", 0, Board(coordinates={(i, 0) for i in range(10)}))
+        cache.put("b", 0, Board(coordinates={(i, 0) for i in range(10)}))
+        cache.put("c", 0, Board(coordinates={(i, 0) for i in range(10)}))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.cells, 22)
+        # boards that could never fit aren't cached at all
+        cache.put("d", 0, Board(coordinates={(i, 0) for i in range(30)}))
+        self.assertNotIn("d", cache)
+
+    def test_disabled(self):
+        cache = BoardCache(max_boards=0)
+        cache.put("a", 0, Board(coordinates={(0, 0)}))
+        self.assertEqual(len(cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/local/bin/python3
+
+import json
+import unittest
+import numpy as np
+from lib import codec
+from lib.board import Board
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        coordinates = {(-3, 7), (0, 0), (5, -2), (5, 9)}
+        data = codec.encode(coordinates, is_finished=False, period=4, displacement=(1, -1))
+        decoded = codec.decode(data)
+        self.assertEqual(decoded["coordinates"], coordinates)
+        self.assertFalse(decoded["is_finished"])
+        self.assertEqual(decoded["period"], 4)
+        self.assertEqual(decoded["displacement"], (1, -1))
+
+    def test_empty_and_finished(self):
+        decoded = codec.decode(codec.encode(set(), is_finished=True))
+        self.assertEqual(decoded["coordinates"], set())
+        self.assertTrue(decoded["is_finished"])
+        self.assertIsNone(decoded["period"])
+        self.assertIsNone(decoded["displacement"])
+
+    def test_header_fields(self):
+        cells, fields = codec.decode_array(codec.encode({(2, 3), (10, -4)}, generation=12))
+        self.assertEqual(fields["generation"], 12)
+        self.assertEqual(fields["bounding_box"], (2, -4, 10, 3))
+        self.assertEqual(cells.tolist(), [[2, 3], [10, -4]])
+
+    def test_element_width(self):
+        small = codec.encode({(0, 0), (100, 100)})
+        large = codec.encode({(0, 0), (100_000, 100_000)})
+        huge = codec.encode({(0, 0), (1 << 40, 0)})
+        self.assertEqual(len(small), codec._HEADER.size + 2 * 2 * 2)
+        self.assertEqual(len(large), codec._HEADER.size + 2 * 2 * 4)
+        self.assertEqual(len(huge), codec._HEADER.size + 2 * 2 * 8)
+        self.assertEqual(codec.decode(huge)["coordinates"], {(0, 0), (1 << 40, 0)})
+
+    def test_reads_legacy_json(self):
+        board = Board(coordinates={(0, 0), (1, 1)})
+        decoded = codec.decode(board.to_string())
+        self.assertEqual(set(map(tuple, decoded["coordinates"])), {(0, 0), (1, 1)})
+        self.assertEqual(codec.decode(board.to_string().encode()), json.loads(board.to_string()))
+
+    def test_board_to_bytes(self):
+        board = Board(coordinates={(0, 0), (0, 1), (0, 2)})
+        board.run_iterations(10, stop_on_cycle=True)
+        loaded = Board(**codec.decode(board.to_bytes()))
+        self.assertEqual(loaded._coords, board._coords)
+        self.assertEqual((loaded.period, loaded.displacement), (2, (0, 0)))
+
+    def test_bad_version(self):
+        data = bytearray(codec.encode({(0, 0)}))
+        data[4] = 99
+        with self.assertRaises(ValueError):
+            codec.decode(bytes(data))
+
+    def test_tiled_header(self):
+        coordinates = {(-5, 2), (3, 7), (0, 0)}
+        header = codec.encode(coordinates, generation=9, tiled=True)
+        self.assertTrue(codec.is_tiled(header))
+        self.assertFalse(codec.is_tiled(codec.encode(coordinates)))
+        self.assertEqual(codec.decode_header(header)["bounding_box"], (-5, 0, 3, 7))
+        with self.assertRaises(ValueError):
+            codec.decode(header)
+
+        cells = np.array(sorted(coordinates))
+        decoded = codec.decode(header, cells)
+        self.assertEqual(decoded["coordinates"], coordinates)
+        self.assertEqual(decoded["generation"], 9)
+        with self.assertRaises(ValueError):
+            codec.decode(header, cells[:2])
+
+    def test_streaming_decoder(self):
+        coordinates = {(x, y) for x in range(-50, 50, 3) for y in range(0, 70000, 1000)}
+        data = codec.encode(coordinates, generation=5)
+
+        decoder = codec.Decoder()
+        # odd chunk sizes split the header and cells at arbitrary points
+        for i in range(0, len(data), 7):
+            decoder.feed(data[i:i + 7])
+        cells, fields = decoder.close()
+        self.assertEqual(codec.to_set(cells), coordinates)
+        self.assertEqual(fields["generation"], 5)
+
+        decoder = codec.Decoder()
+        decoder.feed(codec.encode(set()))
+        self.assertEqual(len(decoder.close()[0]), 0)
+
+        decoder = codec.Decoder()
+        decoder.feed(data[:-1])
+        with self.assertRaises(ValueError):
+            decoder.close()
+
+        with self.assertRaises(ValueError):
+            codec.Decoder(max_cells=10).feed(data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/local/bin/python3
+
+import unittest
+from lib import codec, compression
+
+class TestCompression(unittest.TestCase):
+    def test_round_trip(self):
+        data = codec.encode({(x, 0) for x in range(1000)})
+        compressed = compression.compress(data, "zlib")
+        self.assertTrue(compression.is_compressed(compressed))
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(compression.decompress(compressed), data)
+        # compressing twice does nothing
+        self.assertIs(compression.compress(compressed, "zlib"), compressed)
+
+        text = '{"coordinates": [' + ", ".join("[0, 0]" for _ in range(100)) + "]}"
+        self.assertEqual(compression.decompress(compression.compress(text, "zlib")), text.encode())
+
+    def test_passes_through(self):
+        data = codec.encode({(0, 0), (0, 1)})
+        self.assertIs(compression.compress(data, "none"), data)
+        # too short to shrink
+        self.assertEqual(compression.compress('{"coordinates": []}', "zlib"), '{"coordinates": []}')
+        for stored in (data, '{"coordinates": []}', None):
+            self.assertFalse(compression.is_compressed(stored))
+            self.assertIs(compression.decompress(stored), stored)
+
+    @unittest.skipIf(compression.zstandard is None, "zstandard isn't installed")
+    def test_zstd(self):
+        data = codec.encode({(x, 0) for x in range(1000)})
+        compressed = compression.compress(data, "zstd")
+        self.assertTrue(compression.is_compressed(compressed))
+        self.assertEqual(compression.decompress(compressed), data)
+
+    def test_check_method(self):
+        compression.check_method("zlib")
+        with self.assertRaises(ValueError):
+            compression.check_method("lz4")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+#!/usr/local/bin/python3
+
+import unittest
+import numpy as np
+from lib import dense
+
+class TestDense(unittest.TestCase):
+    def test_array_round_trip(self):
+        coordinates = {(-2, 3), (0, 0), (4, -1)}
+        grid, x, y = dense.to_array(coordinates)
+        self.assertEqual(grid.shape, (7, 5))
+        self.assertEqual((x, y), (-2, -1))
+        self.assertEqual(dense.from_array(grid, x, y), coordinates)
+
+    def test_empty(self):
+        grid, x, y = dense.to_array(set())
+        self.assertEqual(grid.size, 0)
+        self.assertEqual(dense.from_array(grid, x, y), set())
+
+    def test_step_blinker(self):
+        grid, x, y = dense.to_array({(0, 0), (0, 1), (0, 2)})
+        grid, x, y = dense.crop(*dense.step(grid, x, y))
+        self.assertEqual(dense.from_array(grid, x, y), {(-1, 1), (0, 1), (1, 1)})
+        self.assertEqual(grid.shape, (3, 1))
+
+    def test_crop(self):
+        grid = np.zeros((5, 5), dtype=np.uint8)
+        grid[2, 3] = 1
+        cropped, x, y = dense.crop(grid, 10, 20)
+        self.assertEqual(cropped.shape, (1, 1))
+        self.assertEqual((x, y), (12, 23))
+
+if __name__ == '__main__':
+    unittest.main()
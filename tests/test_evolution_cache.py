@@ -0,0 +1,70 @@
+#!/usr/local/bin/python3
+
+import unittest
+from unittest.mock import patch
+from lib.board import Board
+from lib.evolution_cache import EvolutionCache
+
+R_PENTOMINO = {(0, 1), (0, 2), (1, 0), (1, 1), (2, 1)}
+
+class TestEvolutionCache(unittest.TestCase):
+    def _run(self, cache, board, iterations, stop_on_cycle=False):
+        start_generation = board.generation
+        key = cache.key(board, iterations, stop_on_cycle)
+        cached = cache.get(key, board)
+        if cached is not None:
+            return cached
+        completed = board.run_iterations(iterations, stop_on_cycle=stop_on_cycle)
+        cache.put(key, start_generation, board, completed)
+        return board, completed
+
+    def test_hit_is_translated(self):
+        cache = EvolutionCache()
+        self._run(cache, Board(coordinates=R_PENTOMINO), 50)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        shifted = {(x - 100, y + 37) for x, y in R_PENTOMINO}
+        result, completed = self._run(cache, Board(coordinates=shifted, generation=5), 50)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        expected = Board(coordinates=shifted)
+        self.assertEqual(expected.run_iterations(50), completed)
+        self.assertEqual(result.to_dict()["coordinates"], expected.to_dict()["coordinates"])
+        self.assertEqual(result.generation, 55)
+
+    def test_key_includes_iterations_and_state(self):
+        cache = EvolutionCache()
+        self._run(cache, Board(coordinates=R_PENTOMINO), 10)
+        self.assertIsNone(cache.get(cache.key(Board(coordinates=R_PENTOMINO), 11, False), Board(coordinates=R_PENTOMINO)))
+        self.assertIsNone(cache.get(cache.key(Board(coordinates=R_PENTOMINO), 10, True), Board(coordinates=R_PENTOMINO)))
+        periodic = Board(coordinates=R_PENTOMINO, period=3)
+        self.assertIsNone(cache.get(cache.key(periodic, 10, False), periodic))
+
+    def test_lru_eviction(self):
+        cache = EvolutionCache(max_entries=2)
+        for iterations in (1, 2, 3):
+            self._run(cache, Board(coordinates=R_PENTOMINO), iterations)
+        self.assertEqual(len(cache), 2)
+        board = Board(coordinates=R_PENTOMINO)
+        self.assertIsNone(cache.get(cache.key(board, 1, False), board))
+        self.assertIsNotNone(cache.get(cache.key(board, 3, False), board))
+
+    def test_ttl(self):
+        cache = EvolutionCache(ttl=10)
+        with patch("lib.evolution_cache.time.monotonic", return_value=100):
+            self._run(cache, Board(coordinates=R_PENTOMINO), 5)
+        board = Board(coordinates=R_PENTOMINO)
+        with patch("lib.evolution_cache.time.monotonic", return_value=105):
+            self.assertIsNotNone(cache.get(cache.key(board, 5, False), board))
+        with patch("lib.evolution_cache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get(cache.key(board, 5, False), board))
+        self.assertEqual(len(cache), 0)
+
+    def test_uncacheable(self):
+        cache = EvolutionCache(max_cells=3)
+        self.assertIsNone(cache.key(Board(coordinates=R_PENTOMINO), 5, False))
+        self.assertIsNone(cache.key(Board(coordinates=set()), 5, False))
+        self.assertIsNone(EvolutionCache(max_entries=0).key(Board(coordinates=R_PENTOMINO), 5, False))
+
+if __name__ == '__main__':
+    unittest.main()
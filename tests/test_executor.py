@@ -0,0 +1,59 @@
+#!/usr/local/bin/python3
+
+import asyncio
+import unittest
+from lib.board import Board
+from lib.executor import BoardExecutor, ExecutorBusy
+
+class TestExecutor(unittest.TestCase):
+    def test_payload_round_trip(self):
+        board = Board(coordinates={(0, 0), (-1, 5)}, max_iterations=50, engine="sparse", period=2, displacement=(0, 0))
+        loaded = Board.from_payload(board.to_payload())
+        self.assertEqual(loaded._coords, board._coords)
+        self.assertEqual(loaded._max_iterations, 50)
+        self.assertEqual(loaded._engine, "sparse")
+        self.assertEqual((loaded.period, loaded.displacement), (2, (0, 0)))
+
+    def test_inline(self):
+        executor = BoardExecutor(mode="inline")
+        board = Board(coordinates={(0, 0), (0, 1), (0, 2)})
+        result, completed = asyncio.run(executor.run_iterations(board, 1))
+        self.assertIs(result, board)
+        self.assertTrue(completed)
+        self.assertEqual(result._coords, {(-1, 1), (0, 1), (1, 1)})
+
+    def test_process(self):
+        executor = BoardExecutor(mode="process", workers=1)
+        try:
+            glider = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+            result, completed = asyncio.run(executor.run_iterations(Board(coordinates=glider), 8))
+            self.assertTrue(completed)
+            self.assertEqual(result._coords, {(x + 2, y + 2) for x, y in glider})
+            self.assertEqual(executor.pending, 0)
+            self.assertEqual(executor.free, 4)
+
+            # errors from the worker are re-raised
+            with self.assertRaises(ValueError):
+                asyncio.run(executor.run_iterations(Board(coordinates=glider, max_iterations=5), 10))
+        finally:
+            executor.shutdown()
+
+    def test_call(self):
+        for mode in ("inline", "process"):
+            executor = BoardExecutor(mode=mode, workers=1)
+            self.assertEqual(asyncio.run(executor.call(divmod, 7, 2)), (3, 1))
+            # nothing is sent to a worker process
+            self.assertIsNone(executor._pool)
+
+    def test_busy(self):
+        executor = BoardExecutor(mode="process", workers=1, max_pending=0)
+        self.assertEqual(executor.free, 0)
+        with self.assertRaises(ExecutorBusy):
+            asyncio.run(executor.run_iterations(Board(coordinates={(0, 0)}), 1))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            BoardExecutor(mode="invalid")
+
+if __name__ == '__main__':
+    unittest.main()
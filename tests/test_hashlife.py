@@ -0,0 +1,50 @@
+#!/usr/local/bin/python3
+
+import random
+import unittest
+from lib.board import Board
+from lib.hashlife import HashLife
+
+class TestHashLife(unittest.TestCase):
+    def _step_sparse(self, coordinates, generations):
+        board = Board(coordinates=coordinates, max_iterations=generations)
+        for _ in range(generations):
+            if board._iterate():
+                break
+        return board._coords
+
+    def test_matches_sparse_engine(self):
+        hashlife = HashLife()
+        rng = random.Random(42)
+        for _ in range(20):
+            coordinates = {(rng.randint(-8, 8), rng.randint(-8, 8)) for _ in range(60)}
+            generations = rng.randint(0, 200)
+            self.assertEqual(hashlife.advance(coordinates, generations),
+                             self._step_sparse(coordinates, generations))
+
+    def test_glider_large_jump(self):
+        hashlife = HashLife()
+        glider = {(1, 2), (2, 3), (3, 1), (3, 2), (3, 3)}
+        # a glider moves one cell diagonally every 4 generations
+        result = hashlife.advance(glider, 4_000_000)
+        self.assertEqual(result, {(x + 1_000_000, y + 1_000_000) for x, y in glider})
+
+    def test_dies_out(self):
+        hashlife = HashLife()
+        self.assertEqual(hashlife.advance({(0, 0), (0, 1)}, 10), set())
+        self.assertEqual(hashlife.advance(set(), 10), set())
+
+    def test_invalid_generations(self):
+        with self.assertRaises(ValueError):
+            HashLife().advance({(0, 0)}, -1)
+
+    def test_cache_bound(self):
+        hashlife = HashLife(max_nodes=10)
+        blinker = {(0, 0), (1, 0), (2, 0)}
+        hashlife.advance(blinker, 100)
+        # the oversized memo tables are dropped on the next call
+        self.assertEqual(hashlife.advance(blinker, 2), blinker)
+        self.assertLess(len(hashlife._nodes), 100)
+
+if __name__ == '__main__':
+    unittest.main()
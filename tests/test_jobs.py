@@ -0,0 +1,133 @@
+#!/usr/local/bin/python3
+
+import unittest
+from unittest.mock import patch
+import worker
+from benchmarks.fake_valkey import FakeValkey
+from lib import codec, jobs, storage
+
+BLINKER = {(0, 0), (0, 1), (0, 2)}
+GLIDER = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+
+class TestQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_claim_and_take_over(self):
+        client = FakeValkey()
+        await jobs.create_group(client)
+        # creating it again is fine
+        await jobs.create_group(client)
+        self.assertIsNone(await jobs.claim(client, "a", idle=60, block=0))
+
+        await jobs.submit(client, "job-1", "board", "iterate", 10)
+        self.assertEqual((await jobs.load(client, "job-1"))["status"], jobs.QUEUED)
+        message_id, job_id = await jobs.claim(client, "a", idle=60, block=0)
+        self.assertEqual(job_id, "job-1")
+        # pending with "a", so nobody else gets it until it has been idle long enough
+        self.assertIsNone(await jobs.claim(client, "b", idle=60, block=0))
+        self.assertEqual(await jobs.claim(client, "b", idle=0, block=0), (message_id, "job-1"))
+
+        await jobs.ack(client, message_id)
+        self.assertIsNone(await jobs.claim(client, "c", idle=0, block=0))
+        self.assertIsNone(await jobs.load(client, "missing"))
+
+
+@patch("worker.JOB_CHUNK_ITERATIONS", 4)
+class TestWorker(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = FakeValkey()
+        patcher = patch("worker.v", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def submit(self, coordinates, kind: str, iterations: int) -> str:
+        await self.client.set("board", codec.encode(coordinates))
+        await jobs.submit(self.client, "job", "board", kind, iterations)
+        return "job"
+
+    async def test_iterate(self):
+        job_id = await self.submit(GLIDER, "iterate", 10)
+        await worker.work("a", block=0, max_jobs=1)
+
+        job = await jobs.load(self.client, job_id)
+        self.assertEqual(job["status"], jobs.DONE)
+        self.assertEqual(job["generation"], "10")
+        result = codec.decode(await jobs.load_state(self.client, job_id))
+        self.assertEqual(result["generation"], 10)
+        stored, version = await storage.load(self.client, "board")
+        self.assertEqual(codec.decode(stored), result)
+        self.assertEqual(version, 1)
+
+    async def test_final(self):
+        await self.submit(BLINKER, "final", 100)
+        await worker.run_job("job")
+        job = await jobs.load(self.client, "job")
+        self.assertEqual(job["status"], jobs.DONE)
+        self.assertEqual(codec.decode(await jobs.load_state(self.client, "job"))["period"], 2)
+
+        await self.submit(GLIDER, "final", 2)
+        await worker.run_job("job")
+        job = await jobs.load(self.client, "job")
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertIn("final state", job["error"])
+
+        await jobs.submit(self.client, "orphan", "missing", "iterate", 1)
+        await worker.run_job("orphan")
+        self.assertEqual((await jobs.load(self.client, "orphan"))["error"], "Board not found")
+
+    @patch("worker.CHECKPOINT_INTERVAL", 4)
+    async def test_checkpoint_ttl(self):
+        # an R-pentomino doesn't settle for over a thousand generations
+        job_id = await self.submit({(1, 0), (2, 0), (0, 1), (1, 1), (1, 2)}, "final", 12)
+        with patch.object(worker.board_store, "ttl", 60):
+            await worker.run_job(job_id)
+        self.assertEqual((await jobs.load(self.client, job_id))["status"], jobs.FAILED)
+        # the board was never written back, but its checkpoints still expire
+        for generation in (4, 8, 12):
+            self.assertEqual(self.client.ttls[storage.checkpoint_key("board", generation).encode()], 60)
+        self.assertEqual(self.client.ttls[storage.checkpoints_key("board").encode()], 60)
+
+    async def test_quota(self):
+        job_id = await self.submit(GLIDER, "iterate", 4)
+        with patch.object(worker.board_store, "max_cells", 4):
+            await worker.run_job(job_id)
+        job = await jobs.load(self.client, job_id)
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertIn("live cells", job["error"])
+        stored, version = await storage.load(self.client, "board")
+        self.assertEqual(version, 0)
+
+    async def test_resume(self):
+        job_id = await self.submit(GLIDER, "iterate", 12)
+
+        async def crash():
+            raise SystemExit
+        # the worker dies after its first chunk
+        with self.assertRaises(SystemExit):
+            await worker.run_job(job_id, heartbeat=crash)
+        job = await jobs.load(self.client, job_id)
+        self.assertEqual((job["status"], job["generation"]), (jobs.RUNNING, "4"))
+
+        chunks = []
+        async def count():
+            chunks.append(1)
+        await worker.run_job(job_id, heartbeat=count)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual((await jobs.load(self.client, job_id))["status"], jobs.DONE)
+
+    async def test_board_changed(self):
+        job_id = await self.submit(GLIDER, "iterate", 8)
+
+        writes = []
+        async def interfere():
+            # another request writes the board while the job runs
+            stored, version = await storage.load(self.client, "board")
+            writes.append(await storage.compare_and_set(self.client, "board", stored, version))
+        with patch("worker.MAX_WRITE_ATTEMPTS", 2):
+            await worker.run_job(job_id, heartbeat=interfere)
+        job = await jobs.load(self.client, job_id)
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertIn("concurrently", job["error"])
+        # two chunks per attempt
+        self.assertEqual(writes, [True] * 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/local/bin/python3
+
+import unittest
+import httpx
+import main
+from unittest.mock import patch
+from benchmarks.fake_valkey import FakeValkey
+from benchmarks.load_test import LoadTest, parse_mix, percentile
+from lib import storage
+
+class TestFakeValkey(unittest.IsolatedAsyncioTestCase):
+    async def test_compare_and_set(self):
+        client = FakeValkey()
+        self.assertTrue(await storage.compare_and_set(client, "a", b"one", 0))
+        self.assertFalse(await storage.compare_and_set(client, "a", b"two", 0))
+        self.assertEqual(await storage.load(client, "a"), (b"one", 1))
+        self.assertEqual(await storage.load_many(client, ["a", "b"]), [(b"one", 1), (None, 0)])
+
+    async def test_checkpoints(self):
+        client = FakeValkey()
+        evicted = await storage.save_checkpoints(client, "a", [(0, b"g0"), (10, b"g10"), (20, b"g20"), (30, b"g30")], 2)
+        # the oldest and newest two are kept
+        self.assertEqual(evicted, 1)
+        self.assertEqual(await storage.load_checkpoint(client, "a", 15), b"g0")
+        self.assertEqual(await storage.load_checkpoint(client, "a", 25), b"g20")
+        self.assertIsNone(await client.get(storage.checkpoint_key("a", 10)))
+
+    async def test_pipeline(self):
+        client = FakeValkey()
+        pipe = client.pipeline(transaction=False)
+        pipe.mset({"a": b"1", "b": "2"})
+        storage.queue_compare_and_set(pipe, "a", b"3", 0)
+        self.assertEqual(await pipe.execute(), [True, 1])
+        self.assertEqual(await client.mget("a", "b"), [b"3", b"2"])
+        self.assertEqual(client.commands, 2)
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    def test_helpers(self):
+        self.assertEqual(parse_mix("next=3,final"), {"create": 0, "next": 3, "iterate": 0, "final": 1})
+        with self.assertRaises(ValueError):
+            parse_mix("bogus=1")
+        with self.assertRaises(ValueError):
+            parse_mix("next=0")
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0)
+
+    async def test_in_process(self):
+        with patch("main.v", FakeValkey()):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                load_test = LoadTest(client, parse_mix("create=1,next=1,iterate=1,final=1"),
+                                     board_size=8, density=0.3, iterations=5, final_iterations=20)
+                elapsed = await load_test.run(concurrency=4, duration=60, requests=40, boards=4)
+
+        report = load_test.report(elapsed)
+        self.assertEqual(report["total"]["errors"], 0)
+        self.assertEqual(report["total"]["requests"], 40)
+        self.assertLessEqual(report["total"]["p50_ms"], report["total"]["p99_ms"])
+        self.assertGreaterEqual(len(load_test.board_ids), 4)
+
+if __name__ == '__main__':
+    unittest.main()
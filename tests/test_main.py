@@ -1,8 +1,18 @@
 #!/usr/local/bin/python3
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
 import unittest
-from unittest.mock import patch
-from main import app, MAX_ALLOWED_ITERATIONS
+from unittest.mock import AsyncMock, MagicMock, patch
+from main import app, board_store, BOARD_MEDIA_TYPE, CHECKPOINT_INTERVAL, MAX_ALLOWED_ITERATIONS, MAX_BATCH_SIZE, MAX_JOB_ITERATIONS, MAX_REGION_AREA, MAX_WRITE_ATTEMPTS
+import worker
+from benchmarks.fake_valkey import FakeValkey
+from lib import codec, compression, storage
+from lib.board import Board
+from lib.board_cache import BoardCache
+from lib.executor import BoardExecutor, ExecutorBusy
+from lib.evolution_cache import EvolutionCache
 from fastapi.testclient import TestClient
 
 
@@ -16,7 +26,7 @@ class TestApp(unittest.TestCase):
         self.assertIn("Field required", response.json().get("detail", [{}])[0].get("msg", ""))
     
     # mock valkey for testing purposes
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     # mock the Board class to avoid testing its logic here
     @patch('main.Board')
     def test_create_board_valid(self, mock_board_class, mock_valkey):
@@ -33,19 +43,22 @@ class TestApp(unittest.TestCase):
         mock_valkey.set.assert_called_once()
         self.assertIsInstance(board_id, str)
 
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     @patch('main.Board')
     @patch('main._retrieve_board')
     def test_get_next_state_calls_run_iterations(self, mock_retrieve, mock_board_class, mock_valkey):
         client = TestClient(app)
 
         board_id = "test-board-id"
-        mock_retrieve.return_value = {"coordinates": [(0, 0)], "is_finished": False}
+        mock_retrieve.return_value = ({"coordinates": [(0, 0)], "is_finished": False}, 0, None)
+        mock_valkey.eval.return_value = 1
 
         mock_board_instance = mock_board_class.return_value
         mock_board_instance.run_iterations.return_value = True
         mock_board_instance.to_dict.return_value = {"coordinates": [(0, 0)]}
         mock_board_instance.is_finished = False
+        mock_board_instance.generation = 0
+        mock_board_instance.bounding_box.return_value = (0, 0, 0, 0)
 
         response = client.get(f"/boards/{board_id}/next")
         self.assertEqual(response.status_code, 200)
@@ -55,10 +68,11 @@ class TestApp(unittest.TestCase):
         self.assertIn("coordinates", called_kwargs)
         self.assertEqual(called_kwargs["coordinates"], [(0, 0)])
         self.assertEqual(called_kwargs["max_iterations"], MAX_ALLOWED_ITERATIONS)
-        mock_board_instance.run_iterations.assert_called_once_with(1)
+        mock_board_instance.run_iterations.assert_called_once_with(1, stop_on_cycle=False, checkpoint_interval=CHECKPOINT_INTERVAL,
+                                                                        checkpoint_retention=board_store.checkpoint_retention)
 
 
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     @patch('main.Board')
     def test_get_state_invalid_num_iters(self, mock_board_class, mock_valkey):
         client = TestClient(app)
@@ -68,7 +82,7 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("num_iters must be non-negative", response.json().get("detail", ""))
     
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     @patch('main.Board')
     def test_get_final_state_exceeds_limit(self, mock_board_class, mock_valkey):
         client = TestClient(app)
@@ -78,7 +92,7 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("num_iters exceeds limit", response.json().get("detail", ""))
     
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     @patch('main.Board')
     def test_get_final_state_invalid_max_iterations(self, mock_board_class, mock_valkey):
         client = TestClient(app)
@@ -88,18 +102,478 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("num_iters must be non-negative", response.json().get("detail", ""))
 
-    @patch('main.v')
+    @patch('main.v', new_callable=AsyncMock)
     @patch('main.Board')
     def test_get_state_board_not_found(self, mock_board_class, mock_valkey):
         client = TestClient(app)
 
         board_id = "nonexistent-board-id"
-        mock_valkey.get.return_value = None
+        mock_valkey.mget.return_value = [None, None]
 
         response = client.get(f"/boards/{board_id}/iterate/5")
         self.assertEqual(response.status_code, 400)
         self.assertIn("Board not found", response.json().get("detail", ""))
-        mock_valkey.get.assert_called_once_with(board_id)
+        mock_valkey.mget.assert_called_once_with(board_id, f"{board_id}:version")
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_get_final_state_periodic_board(self, mock_valkey):
+        client = TestClient(app)
+
+        # blinker never stops changing, but is final once its cycle is found
+        mock_valkey.mget.return_value = [json.dumps({"coordinates": [(0, 0), (1, 0), (2, 0)], "is_finished": False}), None]
+        mock_valkey.eval.return_value = 1
+
+        response = client.get("/boards/test-board-id/final/100")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["period"], 2)
+        self.assertEqual(response.json()["displacement"], [0, 0])
+        self.assertFalse(response.json()["is_finished"])
+
+        stored = codec.decode(mock_valkey.eval.call_args.args[5])
+        self.assertEqual(stored["period"], 2)
+
+    @patch('main.v', new_callable=AsyncMock)
+    @patch('main.executor.run_iterations', side_effect=ExecutorBusy("busy"))
+    def test_executor_busy(self, mock_run, mock_valkey):
+        client = TestClient(app)
+
+        mock_valkey.mget.return_value = [json.dumps({"coordinates": [(0, 0)], "is_finished": False}), None]
+        response = client.get("/boards/test-board-id/next")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        mock_valkey.eval.assert_not_called()
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_concurrent_write_retries(self, mock_valkey):
+        client = TestClient(app)
+
+        blinker = json.dumps({"coordinates": [(0, 0), (1, 0), (2, 0)], "is_finished": False})
+        # someone else advanced the board between our read and write
+        mock_valkey.mget.side_effect = [[blinker, b"3"], [blinker, b"4"]]
+        mock_valkey.eval.side_effect = [0, 1]
+
+        response = client.get("/boards/test-board-id/next")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_valkey.eval.call_count, 2)
+        # the retry compares against the newly read version
+        self.assertEqual(mock_valkey.eval.call_args.args[4], "4")
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_concurrent_write_gives_up(self, mock_valkey):
+        client = TestClient(app)
+
+        mock_valkey.mget.return_value = [json.dumps({"coordinates": [(0, 0), (1, 0), (2, 0)], "is_finished": False}), b"1"]
+        mock_valkey.eval.return_value = 0
+
+        response = client.get("/boards/test-board-id/next")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(mock_valkey.eval.call_count, MAX_WRITE_ATTEMPTS)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_get_generation_from_checkpoint(self, mock_valkey):
+        client = TestClient(app)
+
+        glider = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+        current = Board(coordinates=glider)
+        current.run_iterations(100)
+        checkpoint = Board(coordinates=glider)
+        checkpoint.run_iterations(64)
+
+        mock_valkey.mget.return_value = [current.to_bytes(), b"2"]
+        mock_valkey.zrevrangebyscore.return_value = [b"test-board-id:gen:64"]
+        mock_valkey.get.return_value = checkpoint.to_bytes()
+
+        response = client.get("/boards/test-board-id/generations/72")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["generation"], 72)
+        # a glider moves one cell diagonally every 4 generations
+        self.assertEqual({tuple(c) for c in response.json()["coordinates"]}, {(x + 18, y + 18) for x, y in glider})
+        mock_valkey.zrevrangebyscore.assert_called_once_with("test-board-id:checkpoints", 72, "-inf", start=0, num=1)
+        # reads never modify the stored board
+        mock_valkey.eval.assert_not_called()
+        mock_valkey.set.assert_not_called()
+
+        # generations ahead of the current state start from the current state
+        response = client.get("/boards/test-board-id/generations/104")
+        self.assertEqual({tuple(c) for c in response.json()["coordinates"]}, {(x + 26, y + 26) for x, y in glider})
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_get_generation_unavailable(self, mock_valkey):
+        client = TestClient(app)
+
+        current = Board(coordinates={(0, 0), (0, 1), (0, 2)}, generation=500)
+        mock_valkey.mget.return_value = [current.to_bytes(), b"1"]
+        mock_valkey.zrevrangebyscore.return_value = []
+
+        response = client.get("/boards/test-board-id/generations/10")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("no longer available", response.json()["detail"])
+
+        response = client.get("/boards/test-board-id/generations/-1")
+        self.assertEqual(response.status_code, 400)
+
+    @patch('main.v', new_callable=AsyncMock)
+    @patch('main.board_cache', new_callable=lambda: BoardCache(max_boards=10))
+    def test_hot_board_cache(self, mock_cache, mock_valkey):
+        client = TestClient(app)
+
+        mock_valkey.mget.return_value = [codec.encode({(0, 0), (1, 0), (2, 0)}), b"0"]
+        mock_valkey.eval.return_value = 1
+
+        self.assertEqual(client.get("/boards/hot-board/next").status_code, 200)
+        self.assertIn("hot-board", mock_cache)
+        self.assertEqual(mock_valkey.mget.call_count, 1)
+
+        # unchanged version: served from memory without fetching the board
+        mock_valkey.get.return_value = b"1"
+        response = client.get("/boards/hot-board/next")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({tuple(c) for c in response.json()["coordinates"]}, {(0, 0), (1, 0), (2, 0)})
+        self.assertEqual(mock_valkey.mget.call_count, 1)
+        mock_valkey.get.assert_called_with("hot-board:version")
+
+        # another worker wrote the board: fetch it again
+        mock_valkey.get.return_value = b"5"
+        mock_valkey.mget.return_value = [codec.encode({(0, 0), (0, 1), (1, 0), (1, 1)}), b"5"]
+        response = client.get("/boards/hot-board/next")
+        self.assertEqual(mock_valkey.mget.call_count, 2)
+        self.assertEqual(len(response.json()["coordinates"]), 4)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_stream_generations(self, mock_valkey):
+        client = TestClient(app)
+
+        mock_valkey.mget.return_value = [codec.encode({(0, 0), (0, 1), (0, 2)}), b"0"]
+
+        response = client.get("/boards/test-board-id/stream?limit=3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        frames = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([frame["generation"] for frame in frames], [0, 1, 2, 3])
+        self.assertEqual({tuple(c) for c in frames[1]["coordinates"]}, {(-1, 1), (0, 1), (1, 1)})
+        # streaming never writes the board back
+        mock_valkey.eval.assert_not_called()
+
+        response = client.get("/boards/test-board-id/stream?limit=2&deltas=true&format=sse")
+        self.assertEqual(response.headers["content-type"], "text/event-stream; charset=utf-8")
+        events = [json.loads(line[len("data: "):]) for line in response.text.split("\n\n") if line]
+        self.assertEqual(len(events), 3)
+        self.assertEqual({tuple(c) for c in events[1]["born"]}, {(-1, 1), (1, 1)})
+        self.assertEqual({tuple(c) for c in events[1]["died"]}, {(0, 0), (0, 2)})
+
+        # in process mode frames are stepped on a thread, not sent to the pool
+        with patch('main.executor', BoardExecutor(mode="process", workers=1)) as executor:
+            response = client.get("/boards/test-board-id/stream?limit=2")
+            self.assertEqual(len(response.text.splitlines()), 3)
+            self.assertIsNone(executor._pool)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_stream_stops_when_finished(self, mock_valkey):
+        client = TestClient(app)
+
+        mock_valkey.mget.return_value = [codec.encode({(0, 0), (0, 1)}), b"0"]
+        response = client.get("/boards/test-board-id/stream?limit=50")
+        frames = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(frames), 2)
+        self.assertTrue(frames[-1]["is_finished"])
+
+        self.assertEqual(client.get("/boards/test-board-id/stream?limit=-1").status_code, 400)
+        self.assertEqual(client.get("/boards/test-board-id/stream?format=xml").status_code, 400)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_create_boards_batch(self, mock_valkey):
+        client = TestClient(app)
+
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        mock_valkey.pipeline = MagicMock(return_value=pipe)
+
+        response = client.post("/boards/batch", json={"boards": [{"coordinates": [(0, 0)]}, {"coordinates": []}]})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 2)
+        board_ids = [result["board_id"] for result in results]
+        self.assertTrue(all(board_ids))
+
+        # one round trip for every board
+        pipe.execute.assert_awaited_once()
+        stored = pipe.mset.call_args.args[0]
+        self.assertEqual(set(stored), set(board_ids))
+        self.assertEqual(codec.decode(stored[board_ids[0]])["coordinates"], {(0, 0)})
+
+        too_many = {"boards": [{"coordinates": []}] * (MAX_BATCH_SIZE + 1)}
+        self.assertEqual(client.post("/boards/batch", json=too_many).status_code, 400)
+
+        # cells too far out to store or step as 64 bit integers
+        results = client.post("/boards/batch", json={"boards": [{"coordinates": [(2 ** 63, 0)]}]}).json()["results"]
+        self.assertIn("Coordinates", results[0]["error"])
+        self.assertEqual(client.post("/boards/", json={"coordinates": [(0, -2 ** 63 - 1)]}).status_code, 400)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_iterate_boards_batch(self, mock_valkey):
+        client = TestClient(app)
+
+        pipe = MagicMock()
+        # first write succeeds, second loses a race
+        pipe.execute = AsyncMock(return_value=[1, 0])
+        mock_valkey.pipeline = MagicMock(return_value=pipe)
+        blinker = codec.encode({(0, 0), (0, 1), (0, 2)})
+        block = codec.encode({(0, 0), (0, 1), (1, 0), (1, 1)})
+        mock_valkey.mget.return_value = [blinker, b"1", None, None, block, b"7"]
+
+        response = client.post("/boards/batch/iterate", json={"board_ids": ["a", "missing", "b"], "num_iters": 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+
+        mock_valkey.mget.assert_awaited_once_with("a", "a:version", "missing", "missing:version", "b", "b:version")
+        self.assertEqual({tuple(c) for c in results[0]["board"]["coordinates"]}, {(-1, 1), (0, 1), (1, 1)})
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(results[1], {"board_id": "missing", "board": None, "error": "Board not found"})
+        self.assertIn("modified concurrently", results[2]["error"])
+
+        pipe.execute.assert_awaited_once()
+        self.assertEqual(pipe.eval.call_count, 2)
+        self.assertEqual(pipe.eval.call_args_list[1].args[4], "7")
+
+        response = client.post("/boards/batch/iterate", json={"board_ids": ["a"], "num_iters": -1})
+        self.assertEqual(response.status_code, 400)
+
+        # any other failure is reported for that board only
+        pipe.execute = AsyncMock(return_value=[1])
+        mock_valkey.mget.return_value = [b"GOLB", b"1", blinker, b"1"]
+        results = client.post("/boards/batch/iterate", json={"board_ids": ["corrupt", "a"], "num_iters": 1}).json()["results"]
+        self.assertEqual(results[0]["error"], "Truncated binary board")
+        self.assertIsNone(results[1]["error"])
+        mock_valkey.mget.return_value = [blinker, b"1"]
+        with patch('main._simulate', side_effect=RuntimeError("boom")), self.assertLogs("main", "ERROR"):
+            response = client.post("/boards/batch/iterate", json={"board_ids": ["a"], "num_iters": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["error"], "Internal error")
+
+        # a batch larger than the executor's queue waits for slots rather than failing
+        executor = BoardExecutor(mode="process", workers=1, max_pending=2)
+        executor._get_pool = lambda: thread_pool
+        pipe.execute = AsyncMock(return_value=[1] * 6)
+        mock_valkey.mget.return_value = [blinker, b"1"] * 6
+        with ThreadPoolExecutor(max_workers=1) as thread_pool, patch('main.executor', executor), \
+             patch('main.evolution_cache', EvolutionCache(max_entries=0)):
+            results = client.post("/boards/batch/iterate", json={"board_ids": list("abcdef"), "num_iters": 1}).json()["results"]
+        self.assertEqual([result["error"] for result in results], [None] * 6)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_response_formats(self, mock_valkey):
+        client = TestClient(app)
+
+        glider = {(1, 2), (2, 3), (3, 1), (3, 2), (3, 3)}
+        mock_valkey.mget.return_value = [codec.encode(glider, generation=4), b"1"]
+        mock_valkey.zrevrangebyscore.return_value = []
+
+        response = client.get("/boards/test-board-id/generations/4")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        body = response.json()
+        self.assertEqual({tuple(cell) for cell in body.pop("coordinates")}, glider)
+        self.assertEqual(body, {"is_finished": False, "period": None, "displacement": None, "generation": 4})
+
+        response = client.get("/boards/test-board-id/generations/4", headers={"Accept": BOARD_MEDIA_TYPE})
+        self.assertEqual(response.headers["content-type"], BOARD_MEDIA_TYPE)
+        decoded = codec.decode(response.content)
+        self.assertEqual(decoded["coordinates"], glider)
+        self.assertEqual(decoded["generation"], 4)
+
+        # media types are matched whole and weighed by their q-values
+        for accept, media_type in ((f"{BOARD_MEDIA_TYPE};q=0", "application/json"),
+                                   (f"application/json, {BOARD_MEDIA_TYPE}; q=0.5", "application/json"),
+                                   (f"application/json;q=0.4, {BOARD_MEDIA_TYPE};q=0.5", BOARD_MEDIA_TYPE),
+                                   (f"*/*, {BOARD_MEDIA_TYPE}", BOARD_MEDIA_TYPE),
+                                   (f"{BOARD_MEDIA_TYPE}-v2", "application/json"),
+                                   ("*/*", "application/json")):
+            response = client.get("/boards/test-board-id/generations/4", headers={"Accept": accept})
+            self.assertEqual(response.headers["content-type"], media_type, accept)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_import_board(self, mock_valkey):
+        client = TestClient(app)
+        glider = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+
+        response = client.post("/boards/import", content=b"x = 3, y = 3\nbo$2bo$3o!\n")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("board_id", response.json())
+        stored_id, stored = mock_valkey.set.call_args.args
+        self.assertEqual(stored_id, response.json()["board_id"])
+        self.assertEqual(codec.decode(stored)["coordinates"], glider)
+
+        response = client.post("/boards/import?format=packed", content=codec.encode(glider, generation=9))
+        self.assertEqual(response.status_code, 200)
+        decoded = codec.decode(mock_valkey.set.call_args.args[1])
+        self.assertEqual(decoded["coordinates"], glider)
+        self.assertEqual(decoded["generation"], 0)
+
+        self.assertEqual(client.post("/boards/import", content=b"3o!").status_code, 400)
+        self.assertEqual(client.post("/boards/import", content=f"x = 1, y = 1\n{2 ** 63}bo!".encode()).status_code, 400)
+        self.assertEqual(client.post("/boards/import?format=packed", content=b"GOLB").status_code, 400)
+        self.assertEqual(client.post("/boards/import?format=json", content=b"").status_code, 400)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_export_board(self, mock_valkey):
+        client = TestClient(app)
+        glider = {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}
+        stored = codec.encode(glider, generation=3)
+
+        mock_valkey.mget.return_value = [stored, b"1"]
+        response = client.get("/boards/test-board-id/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertEqual(response.text, "#C generation 3\nx = 3, y = 3, rule = B3/S23\nbo$2bo$3o!\n")
+
+        response = client.get("/boards/test-board-id/export?format=packed")
+        self.assertEqual(response.content, stored)
+
+        # boards stored in the legacy JSON format are exported the same way
+        mock_valkey.mget.return_value = [json.dumps({"coordinates": list(glider)}), b"1"]
+        self.assertEqual(codec.decode(client.get("/boards/test-board-id/export?format=packed").content)["coordinates"], glider)
+
+        mock_valkey.mget.return_value = [None, None]
+        self.assertEqual(client.get("/boards/missing/export").status_code, 400)
+
+    @patch('main.v', new_callable=FakeValkey)
+    @patch.object(board_store, 'storage_format', "tiled")
+    def test_tiled_storage(self, fake_valkey):
+        client = TestClient(app)
+        # a blinker far from the origin and a block, in different tiles
+        blinker = {(1000, -1000), (1000, -999), (1000, -998)}
+        block = {(0, 0), (0, 1), (1, 0), (1, 1)}
+
+        board_id = client.post("/boards/", json={"coordinates": list(blinker | block)}).json()["board_id"]
+        stored = fake_valkey._hashes[storage.tiles_key(board_id).encode()]
+        self.assertEqual(len(stored), 2)
+        block_tile = stored[b"0,0"]
+
+        response = client.get(f"/boards/{board_id}/next")
+        self.assertEqual(response.status_code, 200)
+        flipped = {(999, -999), (1000, -999), (1001, -999)}
+        self.assertEqual({tuple(cell) for cell in response.json()["coordinates"]}, flipped | block)
+        self.assertIs(stored[b"0,0"], block_tile)
+
+        response = client.get(f"/boards/{board_id}/region?x=998&y=-1000&width=4&height=3")
+        self.assertEqual(response.json(), {"x": 998, "y": -1000, "width": 4, "height": 3, "generation": 1,
+                                           "is_finished": False, "coordinates": [[999, -999], [1000, -999], [1001, -999]]})
+        response = client.get(f"/boards/{board_id}/region?x=0&y=0&width=3&height=2&dense=true")
+        self.assertEqual(response.json()["grid"], [[1, 1], [1, 1], [0, 0]])
+
+        export = client.get(f"/boards/{board_id}/export?format=packed")
+        self.assertEqual(codec.decode(export.content)["coordinates"], flipped | block)
+
+        ids = [result["board_id"] for result in client.post("/boards/batch", json={"boards": [{"coordinates": list(blinker)}]}).json()["results"]]
+        results = client.post("/boards/batch/iterate", json={"board_ids": ids + [board_id], "num_iters": 2}).json()["results"]
+        self.assertEqual({tuple(cell) for cell in results[0]["board"]["coordinates"]}, blinker)
+        self.assertEqual(results[1]["board"]["generation"], 3)
+
+        # boards stay readable, and writable, after switching to whole boards
+        with patch.object(board_store, 'storage_format', "binary"):
+            response = client.get(f"/boards/{board_id}/next")
+            self.assertEqual(response.json()["generation"], 4)
+            self.assertNotIn(storage.tiles_key(board_id).encode(), fake_valkey._hashes)
+            response = client.get(f"/boards/{board_id}/region?x=0&y=0&width=2&height=2")
+            self.assertEqual(len(response.json()["coordinates"]), 4)
+        self.assertEqual(client.get(f"/boards/{board_id}/next").json()["generation"], 5)
+
+        self.assertEqual(client.get(f"/boards/{board_id}/region?x=0&y=0&width=0&height=2").status_code, 400)
+        self.assertEqual(client.get(f"/boards/{board_id}/region?x=0&y=0&width=1&height={MAX_REGION_AREA + 1}").status_code, 400)
+        self.assertEqual(client.get("/boards/missing/region?x=0&y=0&width=1&height=1").status_code, 400)
+
+    @patch('main.v', new_callable=FakeValkey)
+    @patch.object(board_store, 'ttl', 60)
+    @patch.object(board_store, 'compress_min_size', 0)
+    @patch.object(board_store, 'max_cells', 150)
+    def test_storage_lifecycle(self, fake_valkey):
+        client = TestClient(app)
+        line = [(0, y) for y in range(40)]
+        board_id = client.post("/boards/", json={"coordinates": line}).json()["board_id"]
+        stored = fake_valkey._values[board_id.encode()]
+        self.assertTrue(compression.is_compressed(stored))
+        self.assertEqual(fake_valkey.ttls[board_id.encode()], 60)
+        self.assertEqual(fake_valkey.ttls[storage.checkpoint_key(board_id, 0).encode()], 60)
+
+        # writing the board clears its TTL, so it's set again
+        fake_valkey.ttls.clear()
+        response = client.get(f"/boards/{board_id}/next")
+        self.assertEqual(len(response.json()["coordinates"]), 38 * 3)
+        for key in (board_id, storage.version_key(board_id), storage.checkpoints_key(board_id)):
+            self.assertEqual(fake_valkey.ttls[key.encode()], 60)
+        # and reads alone push it back
+        fake_valkey.ttls.clear()
+        self.assertEqual(client.get(f"/boards/{board_id}/region?x=0&y=0&width=1&height=1").status_code, 200)
+        self.assertEqual(fake_valkey.ttls[board_id.encode()], 60)
+
+        # over the cell quota, whether created that way or grown into it
+        too_many = [(x, 0) for x in range(151)]
+        self.assertEqual(client.post("/boards/", json={"coordinates": too_many}).status_code, 400)
+        results = client.post("/boards/batch", json={"boards": [{"coordinates": line}, {"coordinates": too_many}]}).json()["results"]
+        self.assertIn("board_id", results[0])
+        self.assertIn("live cells", results[1]["error"])
+        self.assertEqual(len(client.get(f"/boards/{board_id}/next").json()["coordinates"]), 78)
+        # the next generation has 220 cells
+        response = client.get(f"/boards/{board_id}/next")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(client.get(f"/boards/{board_id}/iterate/0").json()["generation"], 2)
+        results = client.post("/boards/batch/iterate", json={"board_ids": [board_id], "num_iters": 1}).json()["results"]
+        self.assertIn("live cells", results[0]["error"])
+
+        with patch.object(board_store, 'max_bytes', 10):
+            self.assertEqual(client.post("/boards/", json={"coordinates": line}).status_code, 400)
+
+    @patch('main.v', new_callable=FakeValkey)
+    def test_jobs(self, fake_valkey):
+        client = TestClient(app)
+        board_id = client.post("/boards/", json={"coordinates": [(0, 0), (0, 1), (0, 2)]}).json()["board_id"]
+
+        response = client.post(f"/boards/{board_id}/jobs", json={"iterations": MAX_ALLOWED_ITERATIONS + 1})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        status = client.get(f"/jobs/{job_id}").json()
+        self.assertEqual(status, {"job_id": job_id, "board_id": board_id, "kind": "iterate", "iterations": MAX_ALLOWED_ITERATIONS + 1,
+                                  "status": "queued", "generation": None, "target_generation": None, "error": None, "board": None})
+
+        with patch('worker.v', fake_valkey):
+            asyncio.run(worker.work("test", block=0, max_jobs=1))
+        status = client.get(f"/jobs/{job_id}?wait=5").json()
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(status["generation"], MAX_ALLOWED_ITERATIONS + 1)
+        self.assertEqual(status["board"]["generation"], MAX_ALLOWED_ITERATIONS + 1)
+        self.assertEqual({tuple(cell) for cell in status["board"]["coordinates"]}, {(-1, 1), (0, 1), (1, 1)})
+        self.assertEqual(client.get(f"/boards/{board_id}/iterate/0").json()["generation"], MAX_ALLOWED_ITERATIONS + 1)
+
+        self.assertEqual(client.post(f"/boards/{board_id}/jobs", json={"iterations": -1}).status_code, 400)
+        self.assertEqual(client.post(f"/boards/{board_id}/jobs", json={"iterations": MAX_JOB_ITERATIONS + 1}).status_code, 400)
+        self.assertEqual(client.post(f"/boards/{board_id}/jobs", json={"kind": "other", "iterations": 1}).status_code, 422)
+        self.assertEqual(client.post("/boards/missing/jobs", json={"iterations": 1}).status_code, 400)
+        self.assertEqual(client.get("/jobs/missing").status_code, 400)
+        self.assertEqual(client.get(f"/jobs/{job_id}?wait=-1").status_code, 400)
+
+    @patch('main.v', new_callable=AsyncMock)
+    def test_metrics(self, mock_valkey):
+        client = TestClient(app)
+
+        blinker = codec.encode({(0, 0), (0, 1), (0, 2)})
+        mock_valkey.mget.return_value = [blinker, b"1"]
+        mock_valkey.eval.return_value = 1
+        self.assertEqual(client.get("/boards/test-board-id/next").status_code, 200)
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        text = response.text
+        for stage in ("valkey_read", "decode", "construct", "serialize", "valkey_write", "encode", "response"):
+            self.assertIn(f'gol_stage_duration_seconds_count{{stage="{stage}"}}', text)
+        self.assertIn('gol_request_duration_seconds_count{method="GET",route="/boards/{board_id}/next",status="200"}', text)
+        self.assertIn('gol_generations_total{source=', text)
+        self.assertIn("gol_board_population_count", text)
+        self.assertIn('gol_valkey_pool_connections{state="in_use"}', text)
+        self.assertIn("gol_single_flight_in_flight 0", text)
+        # every sample is a name, optional labels and a number
+        for line in text.splitlines():
+            if line and not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1].replace("+Inf", "inf"))
 
 if __name__ == '__main__':
     unittest.main()
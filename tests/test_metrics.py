@@ -0,0 +1,47 @@
+#!/usr/local/bin/python3
+
+import unittest
+from lib import metrics
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_gauge(self):
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter("requests_total", "Requests", ("route",)))
+        counter.inc(route="/a")
+        counter.inc(2, route='say "hi"')
+        self.assertEqual(counter.value(route="/a"), 1)
+        with self.assertRaises(ValueError):
+            counter.inc(-1, route="/a")
+        with self.assertRaises(ValueError):
+            counter.inc(path="/a")
+
+        registry.register(metrics.Gauge("pool_size", "Pool size", callback=lambda: 7))
+        with self.assertRaises(ValueError):
+            registry.register(metrics.Gauge("pool_size", "Duplicate"))
+
+        text = registry.render()
+        self.assertIn("# TYPE requests_total counter\n", text)
+        self.assertIn('requests_total{route="/a"} 1\n', text)
+        self.assertIn('requests_total{route="say \\"hi\\""} 2\n', text)
+        self.assertIn("# TYPE pool_size gauge\npool_size 7\n", text)
+
+    def test_histogram(self):
+        histogram = metrics.Histogram("size", "Sizes", ("kind",), buckets=(1, 10))
+        for value in (0.5, 5, 5, 50):
+            histogram.observe(value, kind="a")
+        with histogram.time(kind="b"):
+            pass
+
+        self.assertEqual(histogram.count(kind="a"), 4)
+        self.assertEqual(histogram.count(kind="b"), 1)
+        lines = histogram.render()
+        self.assertEqual(lines[:5], [
+            'size_bucket{kind="a",le="1"} 1',
+            'size_bucket{kind="a",le="10"} 3',
+            'size_bucket{kind="a",le="+Inf"} 4',
+            'size_sum{kind="a"} 60.5',
+            'size_count{kind="a"} 4',
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/local/bin/python3
+
+import random
+import unittest
+import numpy as np
+from lib import dense, parallel
+from lib.board import Board
+
+class TestParallel(unittest.TestCase):
+    def test_step_stripe(self):
+        rng = np.random.default_rng(3)
+        grid = (rng.random((30, 20)) < 0.4).astype(np.uint8)
+        expected, _, _ = dense.step(grid, 0, 0)
+        result = np.zeros_like(grid)
+        for start, end in ((0, 7), (7, 8), (8, 30)):
+            parallel.step_stripe(grid, result, start, end)
+        # dense.step pads by one cell, the stripes keep the original shape
+        np.testing.assert_array_equal(result, expected[1:-1, 1:-1])
+
+    def test_matches_dense_engine(self):
+        rng = random.Random(11)
+        # more workers than rows at first, and runs spanning several epochs
+        for workers, iterations in ((3, 150), (5, 40)):
+            coordinates = {(rng.randint(-20, 20), rng.randint(-20, 20)) for _ in range(500)}
+            results = []
+            for engine in ("dense", "parallel"):
+                board = Board(coordinates=coordinates, engine=engine, workers=workers)
+                completed = board.run_iterations(iterations)
+                results.append((completed, board.is_finished, board.generation, board.period, board._coords))
+            self.assertEqual(results[0], results[1])
+
+    def test_finishing_and_cycles(self):
+        block = Board(coordinates={(0, 0), (0, 1), (1, 0), (1, 1)}, engine="parallel", workers=2)
+        self.assertFalse(block.run_iterations(10))
+        self.assertTrue(block.is_finished)
+
+        dies = Board(coordinates={(0, 0)}, engine="parallel", workers=2)
+        self.assertFalse(dies.run_iterations(10))
+        self.assertEqual(dies.generation, 10)
+        self.assertEqual(dies._coords, set())
+
+        glider = Board(coordinates={(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)}, engine="parallel", workers=2)
+        self.assertFalse(glider.run_iterations(100, stop_on_cycle=True))
+        self.assertEqual((glider.period, glider.displacement), (4, (1, 1)))
+
+    def test_shared_runner(self):
+        with parallel.shared_runner(2) as runner:
+            pids = [process.pid for process in runner._processes]
+        # later runs, including every auto reselection, reuse the same workers
+        board = Board(coordinates={(0, 0), (0, 1), (0, 2)}, engine="parallel", workers=2)
+        board.run_iterations(3)
+        with parallel.shared_runner(2) as runner:
+            self.assertEqual([process.pid for process in runner._processes], pids)
+
+        # a failed run discards it
+        with self.assertRaises(RuntimeError):
+            with parallel.shared_runner(2) as runner:
+                raise RuntimeError("interrupted")
+        with parallel.shared_runner(2) as replacement:
+            self.assertIsNot(replacement, runner)
+            self.assertFalse(replacement.broken)
+
+    def test_auto_engine_selection(self):
+        rng = random.Random(5)
+        side = 1 << 11
+        coordinates = {(rng.randrange(side), rng.randrange(side)) for _ in range(side * side // 20)}
+        coordinates |= {(0, 0), (side - 1, side - 1)}
+        self.assertEqual(Board(coordinates=coordinates)._select_engine(), "dense")
+        self.assertEqual(Board(coordinates=coordinates, workers=4)._select_engine(), "parallel")
+
+    def test_worker_failure(self):
+        runner = parallel.StripeRunner(2)
+        with self.assertRaises(RuntimeError):
+            with runner:
+                runner._processes[0].terminate()
+                runner.run(np.ones((1, 3), dtype=np.uint8), 0, 0, 10)
+        with self.assertRaises(ValueError):
+            parallel.StripeRunner(0)
+
+if __name__ == '__main__':
+    unittest.main()
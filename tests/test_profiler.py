@@ -0,0 +1,28 @@
+#!/usr/local/bin/python3
+
+import time
+import unittest
+from lib.profiler import SamplingProfiler
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_report(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        self.assertTrue(profiler.running)
+        start = time.perf_counter()
+        _busy(0.1)
+        end = time.perf_counter()
+        profiler.stop()
+        self.assertFalse(profiler.running)
+
+        self.assertTrue(profiler.samples(start, end))
+        self.assertIn("test_profiler.py:_busy", profiler.report(start, end))
+        self.assertEqual(profiler.samples(end + 1, end + 2), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/local/bin/python3
+
+import random
+import unittest
+import numpy as np
+from lib import codec, rle
+
+GLIDER = """#N Glider
+#C a comment
+x = 3, y = 3, rule = B3/S23
+bob$2bo$3o!
+"""
+
+class TestRle(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(rle.parse(GLIDER), {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)})
+        # blank rows, a multi-digit run, and text after the end marker
+        self.assertEqual(rle.parse("x = 12, y = 3\no2$11bo! ignored"), {(0, 0), (2, 11)})
+        # #R positions the top left corner at (x, y), i.e. (row y, column x)
+        self.assertEqual(rle.parse("#R -5 10\nx = 1, y = 1\no!"), {(10, -5)})
+
+    def test_chunked(self):
+        text = "x = 40, y = 2, rule = B3/S23\n" + "12o3b25o$" + "40o!"
+        expected = rle.parse(text)
+        parser = rle.RleParser()
+        for char in text.encode():
+            parser.feed(bytes([char]))
+        self.assertEqual(parser.close(), expected)
+        self.assertEqual(len(expected), 77)
+
+    def test_split_anywhere(self):
+        # text after the end marker is ignored wherever the chunks break
+        text = "#C glider\nx = 3, y = 3\nbob$2bo$3o!\n#C comment\n$5o!\n"
+        expected = rle.parse(text)
+        self.assertEqual(expected, {(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)})
+        data = text.encode()
+        for split in range(len(data) + 1):
+            parser = rle.RleParser()
+            parser.feed(data[:split])
+            parser.feed(data[split:])
+            self.assertEqual(parser.close(), expected, split)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            rle.parse("bo$o!")
+        with self.assertRaises(ValueError):
+            rle.parse("x = 3, y = 3, rule = B36/S23\no!")
+        with self.assertRaises(ValueError):
+            rle.parse("x = 3, y = 3\n3o$12")
+        with self.assertRaises(ValueError):
+            rle.parse("x = 3, y = 3\n2o$o?o!")
+        with self.assertRaises(ValueError):
+            rle.parse("x = 5, y = 1\n5o!", max_cells=4)
+
+    def test_export_round_trip(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            cells = {(rng.randrange(-30, 30), rng.randrange(-200, 200)) for _ in range(rng.randrange(1, 300))}
+            array, _ = codec.decode_array(codec.encode(cells))
+            lines = list(rle.export(array, comment="test"))
+            self.assertTrue(all(len(line) <= rle.LINE_LENGTH + 1 for line in lines))
+            self.assertEqual(rle.parse("".join(lines)), cells)
+
+        self.assertEqual(rle.parse("".join(rle.export(np.zeros((0, 2), dtype=np.int64)))), set())
+        self.assertEqual("".join(rle.export(codec.decode_array(codec.encode(rle.parse(GLIDER)))[0])),
+                         "x = 3, y = 3, rule = B3/S23\nbo$2bo$3o!\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/local/bin/python3
+
+import asyncio
+import unittest
+from lib.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_result(self):
+        single_flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(single_flight.do("board", work) for _ in range(10)))
+        self.assertEqual(results, [1] * 10)
+        self.assertEqual(calls, 1)
+        self.assertFalse(single_flight.in_flight("board"))
+        self.assertEqual(single_flight.pending, 0)
+
+        # later calls run again
+        self.assertEqual(await single_flight.do("board", work), 2)
+
+    async def test_different_keys_run_separately(self):
+        single_flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(single_flight.do("a", lambda: work(1)), single_flight.do("b", lambda: work(2)))
+        self.assertEqual(results, [1, 2])
+
+    async def test_exceptions_are_shared(self):
+        single_flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        results = await asyncio.gather(*(single_flight.do("board", fail) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertIs(results[0], results[1])
+
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        single_flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(single_flight.do("board", work))
+        second = asyncio.ensure_future(single_flight.do("board", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "done")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+#!/usr/local/bin/python3
+
+import random
+import unittest
+import numpy as np
+from lib import codec, tiles
+
+class TestTiles(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(1)
+        # a dense patch stored as a bitmap, scattered cells stored as offsets,
+        # and negative coordinates on tile boundaries
+        cells = {(x, y) for x in range(100, 164) for y in range(0, 64) if rng.random() < 0.5}
+        cells |= {(rng.randrange(-1000, 1000), rng.randrange(-1000, 1000)) for _ in range(500)}
+        cells |= {(-1, -1), (-64, -65), (63, 64)}
+
+        split = tiles.split(cells)
+        self.assertIn("-1,-1", split)
+        self.assertEqual(len(split["1,0"]), tiles.BITMAP_BYTES)
+        self.assertLess(len(split["-1,-1"]), tiles.BITMAP_BYTES)
+        self.assertEqual(codec.to_set(tiles.merge(split)), cells)
+        # names may come back from valkey as bytes
+        self.assertEqual(codec.to_set(tiles.merge({name.encode(): value for name, value in split.items()})), cells)
+
+        self.assertEqual(tiles.split(set()), {})
+        self.assertEqual(len(tiles.merge({})), 0)
+
+    def test_diff(self):
+        before = tiles.split({(0, 0), (100, 100), (200, 200)})
+        after = tiles.split({(0, 0), (100, 101), (300, 300)})
+        changed, removed = tiles.diff(before, after)
+        self.assertEqual(set(changed), {"1,1", "4,4"})
+        self.assertEqual(removed, ["3,3"])
+
+    def test_region(self):
+        self.assertEqual(tiles.names(0, 0, 64, 64), ["0,0"])
+        self.assertEqual(tiles.names(-1, 63, 2, 2), ["-1,0", "-1,1", "0,0", "0,1"])
+
+        cells = np.array([(0, 0), (5, 5), (9, 9), (-3, 5)])
+        self.assertEqual(tiles.crop(cells, -3, 0, 9, 10).tolist(), [[0, 0], [5, 5], [-3, 5]])
@@ -0,0 +1,145 @@
+#!/usr/local/bin/python3
+
+''' Runs the jobs queued by POST /boards/{board_id}/jobs.
+
+    Start any number of workers alongside the API, with the same
+    environment:
+        python worker.py
+
+    Each worker takes one job at a time off the lib.jobs queue. It runs the
+    board JOB_CHUNK_ITERATIONS generations at a time, saving its progress
+    after each chunk, and writes the result back like the synchronous
+    endpoints do. If a worker dies, another one picks its job up after
+    JOB_CLAIM_IDLE seconds and continues from the last saved progress.
+'''
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import valkey.asyncio as valkey
+from lib import codec, jobs, settings
+from lib.board import Board
+from lib.board_store import BoardNotFound, QuotaExceeded
+from lib.settings import BOARD_ENGINE, BOARD_PARALLEL_WORKERS, CHECKPOINT_INTERVAL, MAX_WRITE_ATTEMPTS, board_store
+
+# generations run between progress saves. a job is only taken over by
+# another worker if one chunk takes longer than JOB_CLAIM_IDLE seconds
+JOB_CHUNK_ITERATIONS = int(os.getenv("JOB_CHUNK_ITERATIONS", "1000"))
+JOB_CLAIM_IDLE = float(os.getenv("JOB_CLAIM_IDLE", "60"))
+# finished jobs and their results are kept for JOB_TTL seconds
+JOB_TTL = int(os.getenv("JOB_TTL", "86400"))
+
+pool = settings.connection_pool()
+v = valkey.Valkey(connection_pool=pool)
+
+logger = logging.getLogger(__name__)
+
+
+async def run_job(job_id: str, heartbeat=None):
+    ''' Run a job to completion, continuing from its saved progress if
+        another worker started it. heartbeat, if given, is awaited after
+        every chunk.
+    '''
+    job = await jobs.load(v, job_id)
+    if job is None or job["status"] in jobs.FINISHED:
+        return
+
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        try:
+            board_dict, version, stored_tiles = await board_store.retrieve(v, job["board_id"])
+        except BoardNotFound as bnf:
+            await jobs.finish(v, job_id, JOB_TTL, status=jobs.FAILED, error=str(bnf))
+            return
+
+        # saved progress only applies if the board hasn't changed since
+        state = await jobs.load_state(v, job_id) if job.get("version") == str(version) else None
+        if state is not None:
+            board_dict = codec.decode(state)
+            target = int(job["target_generation"])
+        else:
+            generation = board_dict.get("generation", 0)
+            target = generation + int(job["iterations"])
+            job.update(version=str(version), target_generation=str(target))
+            await jobs.update(v, job_id, status=jobs.RUNNING, version=version,
+                              generation=generation, target_generation=target)
+
+        board = Board(**board_dict, max_iterations=JOB_CHUNK_ITERATIONS, engine=BOARD_ENGINE,
+                      workers=BOARD_PARALLEL_WORKERS)
+        # final jobs stop as soon as the board is known to repeat
+        stop_on_cycle = job["kind"] == "final"
+        completed = True
+        while completed and board.generation < target:
+            completed = board.run_iterations(min(JOB_CHUNK_ITERATIONS, target - board.generation), stop_on_cycle=stop_on_cycle,
+                                             checkpoint_interval=CHECKPOINT_INTERVAL or None,
+                                             checkpoint_retention=board_store.checkpoint_retention)
+            await jobs.save_progress(v, job_id, board.generation, board.to_bytes())
+            if board.checkpoints:
+                await board_store.save_checkpoints(v, job["board_id"], board.checkpoints)
+                board.checkpoints = []
+            if heartbeat is not None:
+                await heartbeat()
+
+        # a finished board no longer changes, so it is equally valid at the target
+        if board.is_finished:
+            board.generation = target
+
+        if job["kind"] == "final" and not board.is_finished and not board.is_periodic:
+            await jobs.finish(v, job_id, JOB_TTL, status=jobs.FAILED, generation=board.generation,
+                              error="Board did not reach final state within requested iterations")
+            return
+
+        # like the synchronous endpoints, only store the result if nobody
+        # changed the board meanwhile, and otherwise start over from theirs
+        try:
+            stored = await board_store.queue_write(v, job["board_id"], board, version, stored_tiles)
+        except QuotaExceeded as qe:
+            await jobs.finish(v, job_id, JOB_TTL, status=jobs.FAILED, generation=board.generation, error=str(qe))
+            return
+        if stored:
+            # the write only sets the TTL of what it wrote, and the job may
+            # have run for longer than the TTL of everything else
+            await board_store.touch(v, [job["board_id"]])
+            await jobs.finish(v, job_id, JOB_TTL, state=board.to_bytes(), status=jobs.DONE, generation=board.generation)
+            return
+        logger.info("Board %s changed while job %s ran, restarting", job["board_id"], job_id)
+
+    await jobs.finish(v, job_id, JOB_TTL, status=jobs.FAILED,
+                      error="Board is being modified concurrently, please retry")
+
+
+async def work(consumer: str, block: float = 5, max_jobs: int | None = None):
+    ''' Take jobs off the queue and run them, forever or until max_jobs
+        jobs have been handled.
+    '''
+    await jobs.create_group(v)
+    handled = 0
+    while max_jobs is None or handled < max_jobs:
+        claimed = await jobs.claim(v, consumer, JOB_CLAIM_IDLE, block)
+        if claimed is None:
+            continue
+        message_id, job_id = claimed
+        try:
+            await run_job(job_id, heartbeat=lambda: jobs.heartbeat(v, consumer, message_id))
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            await jobs.finish(v, job_id, JOB_TTL, status=jobs.FAILED, error="Internal error")
+        await jobs.ack(v, message_id)
+        handled += 1
+
+
+async def run():
+    try:
+        await work(f"{socket.gethostname()}-{os.getpid()}")
+    finally:
+        await v.aclose()
+        await pool.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        sys.exit(0)